@@ -1,50 +1,133 @@
-import os
-import json
-from dotenv import load_dotenv
-from langchain_groq import ChatGroq
-from langchain_core.messages import SystemMessage
+import logging
+from typing import Callable, Tuple
+from langchain_core.messages import SystemMessage, AIMessage
 from graphs.state import AgentState
 from prompts.conversation_prompt import conversation_prompt
+from utils.llm import get_llm
+from utils.json_stream import StreamingFieldParser
+from utils.json_extract import extract_json, JSONExtractionError
+from utils.conversation_memory import ConversationContext, build_context
+from utils.packed_catalog import get_search_catalog
+from utils.tokens import estimate_tokens
+from utils.tracing import traced
+from models import ConversationReply
 
-load_dotenv()
-groq_api_key = os.getenv("GROQ_API_KEY")
+logger = logging.getLogger("conversation_agent")
 
-def conversation_agent(state: AgentState):
+
+def _budget_hint(state: AgentState) -> str:
+    """What matching packages cost, while the user is deciding on a budget"""
+    if state.get('current_state') != 'budget':
+        return ''
+    try:
+        return get_search_catalog().budget_hint(state)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not load the catalog for budget hints: {e}")
+        return ''
+
+
+def _conversation_messages(state: AgentState) -> Tuple[list, ConversationContext]:
     """
-    Primary Conversation Manager that parses stages and handles off-topics.
+    System prompt for the current state followed by the recent turns.
+    Older turns reach the LLM only through the rolling summary in the prompt.
     """
-    # 1. Initialize the LLM
-    llm = ChatGroq(model_name="llama-3.3-70b-versatile", groq_api_key=groq_api_key)
-    
-    # 2. Get the system prompt based on current state
-    system_prompt = conversation_prompt(state)
-    
-    # 3. Prepare messages for the LLM
-    messages = [SystemMessage(content=system_prompt)] + state.get('messages', [])
-    
-    # 4. Invoke LLM
-    response = llm.invoke(messages)
-    content = response.content.strip()
-    
-    # 5. Robust JSON parsing
-    if "```json" in content:
-        content = content.split("```json")[1].split("```")[0].strip()
-    elif "```" in content:
-        content = content.split("```")[1].split("```")[0].strip()
-        
+    state = {**state, 'budget_hint': _budget_hint(state)}
+    # Size the prompt without the summary, then fit summary and turns under the ceiling
+    base_tokens = estimate_tokens(conversation_prompt({**state, 'conversation_summary': ''}))
+    context = build_context(state, system_tokens=base_tokens)
+
+    # Get the system prompt based on current state
+    system_prompt = conversation_prompt({**state, 'conversation_summary': context.prompt_summary})
+    return [SystemMessage(content=system_prompt)] + context.messages, context
+
+
+def _conversation_result(state: AgentState, content: str, context: ConversationContext) -> dict:
+    """Parses the LLM reply into the stage and message updates"""
+    content = content.strip()
+
     try:
-        data = json.loads(content)
+        data = extract_json(content, ConversationReply)
         new_state = data.get("current_state", state.get("current_state", "greeting"))
         ai_message = data.get("message", "I'm here to help with your travel plans!")
-    except Exception as e:
-        print(f"Error parsing conversation JSON: {e}")
+    except JSONExtractionError as e:
+        logger.warning(f"Error parsing conversation JSON: {e}")
         # Fallback
         new_state = state.get("current_state", "greeting")
         ai_message = content # Use raw content if JSON fails
-    
-    # 6. Return updated state and message
-    from langchain_core.messages import AIMessage
+
     return {
         "messages": [AIMessage(content=ai_message)],
-        "current_state": new_state
+        "current_state": new_state,
+        "conversation_summary": context.summary,
+        "summarized_messages": context.summarized_messages,
     }
+
+
+@traced("agent.conversation")
+def conversation_agent(state: AgentState):
+    """
+    Primary Conversation Manager that parses stages and handles off-topics.
+    """
+    # 1. Get the shared LLM client
+    llm = get_llm()
+
+    # 2. Invoke LLM with the system prompt and the bounded conversation memory
+    messages, context = _conversation_messages(state)
+    response = llm.invoke(messages)
+
+    # 3. Return updated state, message and memory
+    return _conversation_result(state, response.content, context)
+
+
+@traced("agent.conversation")
+async def aconversation_agent(state: AgentState):
+    """Async variant of conversation_agent"""
+    llm = get_llm()
+    messages, context = _conversation_messages(state)
+    response = await llm.ainvoke(messages)
+    return _conversation_result(state, response.content, context)
+
+
+@traced("agent.conversation")
+def stream_conversation_agent(state: AgentState, on_message: Callable[[str], None]):
+    """
+    Streaming variant of conversation_agent.
+
+    `on_message` receives the reply text piece by piece as soon as the
+    "message" field starts streaming, instead of after the full completion.
+    Returns the same updates as conversation_agent.
+    """
+    llm = get_llm()
+    parser = StreamingFieldParser("message")
+    chunks = []
+    messages, context = _conversation_messages(state)
+    for chunk in llm.stream(messages):
+        chunks.append(chunk.content)
+        text = parser.feed(chunk.content)
+        if text:
+            on_message(text)
+
+    result = _conversation_result(state, "".join(chunks), context)
+    if not parser.started:
+        # Not the expected envelope; hand over the parsed/fallback reply at once
+        on_message(result["messages"][0].content)
+    return result
+
+
+@traced("agent.conversation")
+async def astream_conversation_agent(state: AgentState, on_message: Callable[[str], None]):
+    """Async variant of stream_conversation_agent"""
+    llm = get_llm()
+    parser = StreamingFieldParser("message")
+    chunks = []
+    messages, context = _conversation_messages(state)
+    async for chunk in llm.astream(messages):
+        chunks.append(chunk.content)
+        text = parser.feed(chunk.content)
+        if text:
+            on_message(text)
+
+    result = _conversation_result(state, "".join(chunks), context)
+    if not parser.started:
+        on_message(result["messages"][0].content)
+    return result
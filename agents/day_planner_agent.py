@@ -1,62 +1,109 @@
 import os
-import json
 import logging
-from langchain_groq import ChatGroq
+from typing import Callable
 from langchain_core.messages import AIMessage
-from prompts.day_planner_prompts import day_planner_prompt
+from prompts.day_planner_prompts import itinerary_polish_prompt
 from graphs.state import AgentState
+from utils.llm import get_llm
+from utils.packed_catalog import get_search_catalog
+from utils.tracing import traced
+from utils.itinerary import (
+    alternative_rounds,
+    get_polished,
+    next_alternative_round,
+    polish_key,
+    render_itinerary,
+    schedule_polish,
+)
 from dotenv import load_dotenv
 
 load_dotenv()
 
 logger = logging.getLogger("day_planner_agent")
 
+# Opt-in LLM polishing of the rendered itinerary (runs in the background)
+POLISH_ITINERARY = os.getenv("ITINERARY_POLISH", "").lower() in ("1", "true", "yes")
+
+
+def has_selected_package(state: AgentState) -> bool:
+    """Whether there is a package to plan (workflow predicate)"""
+    return bool(state.get("selected_package"))
+
+
+@traced("agent.day_planner")
 def day_planner_agent(state: AgentState) -> AgentState:
     """
     Agent responsible for preparing the day-by-day itinerary.
+
+    The itinerary is rendered directly from the package's day_plans. Each
+    session keeps a per-package cursor in `alternatives_seen`, so asking for the
+    next alternative is a dict lookup. LLM polishing is opt-in and never blocks.
     """
     try:
-        api_key = os.getenv("GROQ_API_KEY")
-        if not api_key:
-            raise ValueError("GROQ_API_KEY not found")
-
-        llm = ChatGroq(
-            model_name="llama-3.3-70b-versatile",
-            temperature=0.2,
-            groq_api_key=api_key
-        )
-
-        prompt_text = day_planner_prompt(state)
-        response = llm.invoke(prompt_text)
-        
-        logger.info(f"Day Planner Raw Response: {response.content}")
-
-        try:
-            content = response.content.strip()
-            if content.startswith("```json"):
-                content = content[7:-3].strip()
-            elif content.startswith("```"):
-                content = content[3:-3].strip()
-            
-            parsed_data = json.loads(content)
-            
-            # Store the plan in the state
-            state["day_plan"] = parsed_data.get("itinerary", [])
-            
-            # Check if alternatives are exhausted
-            if state.get("use_alternative_plan") and not parsed_data.get("alternatives_available"):
-                msg = "I've suggested all possible alternatives for this package."
+        package = state.get("selected_package") or {}
+        package_id = package.get("package_id")
+        if not package.get("day_plans") and package_id is not None:
+            # LLM-ranked selections may only carry the id; use the catalog entry
+            package = get_search_catalog().get(package_id) or package
+        if not package.get("day_plans"):
+            logger.debug(f"No day plans to render for package {package_id}")
+            return state
+        use_alternative = bool(state.get("use_alternative_plan"))
+
+        round_index = 0
+        if use_alternative:
+            seen = dict(state.get("alternatives_seen") or {})
+            if seen.get(package_id, 0) >= alternative_rounds(package):
+                state["messages"].append(AIMessage(content="I've suggested all possible alternatives for this package."))
+                return state
+            round_index = next_alternative_round(seen, package_id)
+            state["alternatives_seen"] = seen
+
+        parsed_data = render_itinerary(package, use_alternative, round_index)
+        itinerary = parsed_data["itinerary"]
+
+        # Use a finished background polish if there is one; otherwise start one
+        if state.get("polish_itinerary", POLISH_ITINERARY):
+            prompt = itinerary_polish_prompt(package, itinerary)
+            key = polish_key(package_id, "alternative" if use_alternative else "primary", round_index, prompt)
+            polished = get_polished(key)
+            if polished is not None:
+                itinerary = polished
             else:
-                msg = parsed_data.get("message", "Your itinerary is ready!")
+                schedule_polish(key, itinerary, get_llm(temperature=0.2), prompt)
 
-            state["messages"].append(AIMessage(content=msg))
+        # Store the plan in the state
+        state["day_plan"] = itinerary
 
-        except json.JSONDecodeError:
-            logger.error("Failed to parse Day Planner LLM response")
-            state["messages"].append(AIMessage(content="Error generating the itinerary."))
+        # Check if alternatives are exhausted
+        if use_alternative and not parsed_data.get("alternatives_available"):
+            msg = "I've suggested all possible alternatives for this package."
+        else:
+            msg = parsed_data.get("message", "Your itinerary is ready!")
 
+        state["messages"].append(AIMessage(content=msg))
         return state
 
     except Exception as e:
         logger.error(f"Day Planner Error: {e}")
         return state
+
+
+async def aday_planner_agent(state: AgentState) -> AgentState:
+    """
+    Async variant of day_planner_agent. Rendering is local and polishing is
+    already in the background, so there is no LLM call to await.
+    """
+    return day_planner_agent(state)
+
+
+def stream_day_planner_agent(state: AgentState, on_message: Callable[[str], None]) -> AgentState:
+    """
+    Streaming variant of day_planner_agent. The itinerary envelope is rendered
+    locally, so the whole message is handed to `on_message` as soon as it exists.
+    """
+    before = len(state.get("messages", []))
+    state = day_planner_agent(state)
+    for msg in state.get("messages", [])[before:]:
+        on_message(msg.content)
+    return state
@@ -1,42 +1,45 @@
-import os
 import json
 import logging
+import threading
 from typing import Optional
-from langchain_groq import ChatGroq
-from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from dotenv import load_dotenv
 
 from graphs.state import AgentState
 from prompts.info_collector_prompt import get_info_collector_prompt
 from models import ExtractedPreferences
+from utils.llm import get_llm
+from utils.packed_catalog import get_search_catalog
+from utils.preference_rules import extract_preferences_rules
+from utils.tracing import annotate, traced
 
 load_dotenv()
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
-# Initialize LLM and chain (module-level, loaded once)
-logger.info("Initializing InfoCollectorAgent")
-groq_api_key = os.getenv("GROQ_API_KEY")
-if not groq_api_key:
-    raise ValueError("GROQ_API_KEY environment variable is not set")
-logger.info("Groq API key loaded successfully")
+# Extraction chain, built on first use (importing the agent stays cheap and
+# does not need GROQ_API_KEY)
+_chain = None
+_chain_lock = threading.Lock()
 
-_llm = ChatGroq(
-    groq_api_key=groq_api_key,
-    model="llama-3.3-70b-versatile",
-    temperature=0.1,
-)
 
-_structured_llm = _llm.with_structured_output(ExtractedPreferences)
+def _get_chain():
+    """Returns the structured extraction chain, building it once"""
+    global _chain
+    if _chain is None:
+        with _chain_lock:
+            if _chain is None:
+                from langchain_core.prompts import ChatPromptTemplate
 
-_prompt = ChatPromptTemplate.from_messages([
-    ("system", get_info_collector_prompt()),
-    ("human", "{input}")
-])
-
-_chain = _prompt | _structured_llm
+                logger.info("Initializing InfoCollectorAgent")
+                structured_llm = get_llm(temperature=0.1, cached=True).with_structured_output(ExtractedPreferences)
+                prompt = ChatPromptTemplate.from_messages([
+                    ("system", get_info_collector_prompt()),
+                    ("human", "{input}")
+                ])
+                _chain = prompt | structured_llm
+    return _chain
 
 
 def _build_context(state: AgentState) -> str:
@@ -69,12 +72,65 @@ Extract any NEW or UPDATED preferences from the latest user message."""
     return context
 
 
+def _latest_user_message(state: AgentState) -> Optional[str]:
+    """Content of the most recent human message, if any"""
+    for msg in reversed(state.get("messages", [])):
+        if isinstance(msg, HumanMessage):
+            return msg.content if isinstance(msg.content, str) else None
+    return None
+
+
+def _extract_preferences_fast(state: AgentState) -> Optional[ExtractedPreferences]:
+    """Rule-based extraction; None when the rules can't explain the message"""
+    message = _latest_user_message(state)
+    if not message:
+        return None
+    try:
+        catalog = get_search_catalog()
+        destinations, match_destination = catalog.destination_names.values(), catalog.match_destination
+    except Exception as e:
+        logger.warning(f"Catalog unavailable for rule-based extraction: {e}")
+        destinations, match_destination = [], None
+    return extract_preferences_rules(message, destinations, match_destination)
+
+
 def _extract_preferences(state: AgentState) -> ExtractedPreferences:
     """Extract preferences from conversation"""
+    # Short, explicit messages ("7 days", "budget 30k") skip the LLM round trip
+    extracted = _extract_preferences_fast(state)
+    if extracted is not None:
+        logger.info("Extraction handled by local rules")
+        annotate(extraction="rules")
+        return extracted
+
     context = _build_context(state)
+    annotate(extraction="llm")
     
     try:
-        extracted = _chain.invoke({"input": context})
+        extracted = _get_chain().invoke({"input": context})
+        logger.info(f"Extraction successful - Confidence: {extracted.confidence}")
+        return extracted
+    except Exception as e:
+        logger.error(f"Extraction failed: {e}")
+        return ExtractedPreferences(
+            confidence="low",
+            notes=f"Extraction error: {str(e)}"
+        )
+
+
+async def _aextract_preferences(state: AgentState) -> ExtractedPreferences:
+    """Async variant of _extract_preferences"""
+    extracted = _extract_preferences_fast(state)
+    if extracted is not None:
+        logger.info("Extraction handled by local rules")
+        annotate(extraction="rules")
+        return extracted
+
+    context = _build_context(state)
+    annotate(extraction="llm")
+
+    try:
+        extracted = await _get_chain().ainvoke({"input": context})
         logger.info(f"Extraction successful - Confidence: {extracted.confidence}")
         return extracted
     except Exception as e:
@@ -85,6 +141,7 @@ def _extract_preferences(state: AgentState) -> ExtractedPreferences:
         )
 
 
+@traced("agent.info_collector")
 def info_collector_agent(state: AgentState) -> AgentState:
     """
     Info Collector Agent - Extracts and updates user preferences from conversation.
@@ -98,9 +155,22 @@ def info_collector_agent(state: AgentState) -> AgentState:
     logger.info("InfoCollectorAgent invoked")
     
     extracted = _extract_preferences(state)
-    
+    return _apply_extracted(state, extracted)
+
+
+@traced("agent.info_collector")
+async def ainfo_collector_agent(state: AgentState) -> AgentState:
+    """Async variant of info_collector_agent"""
+    logger.info("InfoCollectorAgent invoked")
+
+    extracted = await _aextract_preferences(state)
+    return _apply_extracted(state, extracted)
+
+
+def _apply_extracted(state: AgentState, extracted: ExtractedPreferences) -> AgentState:
+    """Merges extracted preferences into a new state"""
     # ⭐ DEBUG LOG - See what was extracted
-    logger.info(f"Extracted activities: {extracted.activities}")
+    logger.debug(f"Extracted activities: {extracted.activities}")
     
     # Build updates dict (only non-null values)
     updates = {}
@@ -1,62 +1,109 @@
-import os
-import json
 import logging
 # from langgraph.graph import StateGraph, END, START
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-from langchain_groq import ChatGroq
 from prompts.ranking_agent_prompts import ranking_agent_prompt
 from graphs.state import AgentState
+from utils.llm import get_llm
+from utils.json_extract import extract_json, JSONExtractionError
+from models import RankingReply
+from utils.ranking import rank_packages_locally, is_decisive, RANKING_LLM_MARGIN
+from utils.prompt_packages import merge_candidates
+from utils.tracing import annotate, traced
 from dotenv import load_dotenv
 
 load_dotenv()
-os.environ["LANGCHAIN_API_KEY"]=os.getenv("LANGCHAIN_API_KEY")
-os.environ["LANGCHAIN_TRACING_V2"]="true"
-os.environ["LANGCHAIN_PROJECT"]="ranking_agent"
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("ranking_agent")
 
+
+def _apply_ranking(state: AgentState, parsed_data: dict, candidates: list) -> None:
+    """Stores a ranking ({"ranked_packages": [...]}) and the selected package in state"""
+    ranked_packages_data = parsed_data.get("ranked_packages", [])
+    
+    state["ranked_packages"] = ranked_packages_data
+    
+    if ranked_packages_data:
+        top_pkg_id = ranked_packages_data[0].get("package_id")
+        selected = next((p for p in candidates if p.get("package_id") == top_pkg_id), {})
+        state["selected_package"] = selected
+    
+    state["messages"].append(AIMessage(content=f"Ranked packages. Top match: {state.get('selected_package', {}).get('destination', 'None')}"))
+
+
+def _ranking_candidates(state: AgentState) -> list:
+    return state.get("packages") or state.get("research_results") or []
+
+
+def has_candidates(state: AgentState) -> bool:
+    """Whether there is anything to rank (workflow predicate)"""
+    return bool(_ranking_candidates(state))
+
+
+def _rank_locally(state: AgentState, candidates: list) -> bool:
+    """Ranks from matcher scores; returns False when the LLM should break a close call"""
+    local_ranking = rank_packages_locally(state, candidates)
+    decisive = is_decisive(local_ranking, RANKING_LLM_MARGIN)
+    annotate(decided_by="matcher" if decisive else "llm", candidates=len(candidates))
+    if decisive:
+        logger.debug("Ranking decided locally from matcher scores")
+        _apply_ranking(state, local_ranking, candidates)
+    return decisive
+
+
+def _apply_llm_ranking(state: AgentState, content: str, candidates: list) -> None:
+    logger.debug(f"Raw Response: {content}")
+
+    try:
+        parsed_data = extract_json(content, RankingReply)
+        # The prompt lists research results and packages together; select from both
+        candidates = merge_candidates(candidates, state.get("research_results"), state.get("packages"))
+        _apply_ranking(state, parsed_data, candidates)
+
+    except JSONExtractionError as e:
+        logger.error(f"Failed to parse LLM response: {e}")
+        state["ranked_packages"] = []
+        state["messages"].append(AIMessage(content="Error ranking packages."))
+
+
+@traced("agent.ranking")
 def ranking_agent(state: AgentState) -> AgentState:
     try:
-        api_key = os.getenv("GROQ_API_KEY")
-        if not api_key:
-            raise ValueError("GROQ_API_KEY not found")
+        candidates = _ranking_candidates(state)
+        if not candidates:
+            logger.debug("No candidates to rank")
+            return state
+
+        # 1. Rank locally from matcher scores; the LLM only breaks close calls
+        if _rank_locally(state, candidates):
+            return state
 
-        llm = ChatGroq(
-            model_name="llama-3.3-70b-versatile",
-            temperature=0.2,
-            groq_api_key=api_key
-        )
+        llm = get_llm(temperature=0.2, cached=True)
 
         prompt_text = ranking_agent_prompt(state)
         response = llm.invoke(prompt_text)
-        
-        logger.info(f"Raw Response: {response.content}")
-
-        try:
-            content = response.content.strip()
-            if content.startswith("```json"):
-                content = content[7:-3].strip()
-            elif content.startswith("```"):
-                content = content[3:-3].strip()
-            
-            parsed_data = json.loads(content)
-            ranked_packages_data = parsed_data.get("ranked_packages", [])
-            
-            state["ranked_packages"] = ranked_packages_data
-            
-            if ranked_packages_data:
-                top_pkg_id = ranked_packages_data[0].get("package_id")
-                full_packages = state.get("packages", [])
-                selected = next((p for p in full_packages if p.get("package_id") == top_pkg_id), {})
-                state["selected_package"] = selected
-            
-            state["messages"].append(AIMessage(content=f"Ranked packages. Top match: {state.get('selected_package', {}).get('destination', 'None')}"))
-
-        except json.JSONDecodeError:
-            logger.error("Failed to parse LLM response")
-            state["ranked_packages"] = []
-            state["messages"].append(AIMessage(content="Error ranking packages."))
+        _apply_llm_ranking(state, response.content, candidates)
+
+        return state
+
+    except Exception as e:
+        logger.error(f"Error: {e}")
+        return state
+
+
+@traced("agent.ranking")
+async def aranking_agent(state: AgentState) -> AgentState:
+    """Async variant of ranking_agent"""
+    try:
+        candidates = _ranking_candidates(state)
+        if not candidates:
+            logger.debug("No candidates to rank")
+            return state
+        if _rank_locally(state, candidates):
+            return state
+
+        llm = get_llm(temperature=0.2, cached=True)
+        response = await llm.ainvoke(ranking_agent_prompt(state))
+        _apply_llm_ranking(state, response.content, candidates)
 
         return state
 
@@ -1,69 +1,174 @@
-import json
-import os
-from dotenv import load_dotenv
-from langchain_groq import ChatGroq
+import asyncio
+import logging
+from concurrent.futures import Executor
+from typing import Any, Optional, Tuple
 from langchain_core.messages import SystemMessage, HumanMessage
 from graphs.state import AgentState
 from prompts.researcher_prompt import researcher_prompt
 from utils.matcher import get_most_similar_packages
+from utils.catalog import DEFAULT_PACKAGE_FILE
+from utils.packed_catalog import get_search_catalog
+from utils.llm import get_llm
+from utils.json_extract import extract_json, JSONExtractionError
+from utils.match_cache import get_match_cache, match_key
+from utils.tracing import annotate, traced
+from models import ResearchReply
 
-load_dotenv()
-groq_api_key = os.getenv("GROQ_API_KEY")
+logger = logging.getLogger("researcher_agent")
 
 
-def researcher_agent(state: AgentState):
-    """This agent researches the packages based on the user preferences or finds similar ones"""
-    
-    # 1. Load all packages if not already in state
+# Packages the matcher hands to the LLM
+MATCH_LIMIT = 10
+
+
+def _search_packages(state: AgentState) -> Tuple[Any, Optional[int]]:
+    """The packages to match against, and their catalog version (None for packages passed in state)"""
+    # Use the packages in state, or the process-wide catalog (loaded once;
+    # the compiled, memory-mapped one when it is up to date)
     all_packages = state.get('package', [])
-    if not all_packages:
-        # Load from local dataset/Packages.json
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        package_file = os.path.join(base_dir, "dataset", "Packages.json")
-        try:
-            with open(package_file, 'r') as f:
-                all_packages = json.load(f)
-        except Exception as e:
-            print(f"Error loading packages from {package_file}: {e}")
-            all_packages = []
-
-    # 2. Find most similar packages using our matching function
+    if all_packages:
+        return all_packages, None
+    try:
+        catalog = get_search_catalog()
+    except Exception as e:
+        logger.error(f"Error loading packages from {DEFAULT_PACKAGE_FILE}: {e}")
+        return [], None
+    return catalog, catalog.version
+
+
+def _find_similar_packages(state: AgentState) -> Tuple[list, Optional[int]]:
+    """Matcher step: the packages most similar to the user's preferences, and the catalog version searched"""
+    all_packages, version = _search_packages(state)
     # This handles the "match user preferences not exactly found" requirement
-    similar_packages = get_most_similar_packages(state, all_packages, limit=10)
-    
+    return get_most_similar_packages(state, all_packages, limit=MATCH_LIMIT), version
+
+
+def _cache_key(state: AgentState, version: Optional[int]) -> Optional[str]:
+    """Match cache key of the state's preferences; None when not cached (cache off, packages in state)"""
+    if version is None or get_match_cache() is None:
+        return None
+    return match_key(state, version, MATCH_LIMIT)
+
+
+def _cached_match(state: AgentState) -> Tuple[Optional[str], Optional[dict]]:
+    """Cache key of the state's preferences against the current catalog, and its entry if there is one"""
+    _, version = _search_packages(state)
+    key = _cache_key(state, version)
+    if key is None:
+        return None, None
+    entry = get_match_cache().get(key)
+    annotate(match_cache="miss" if entry is None else ("hit" if "research_results" in entry else "matches"))
+    return key, entry
+
+
+def _store_match(key: Optional[str], similar_packages: list, research_results: Optional[list]) -> None:
+    """Caches the matches, and the LLM's selection when its reply parsed"""
+    if key is None:
+        return
+    entry = {"similar_packages": similar_packages}
+    if research_results is not None:
+        entry["research_results"] = research_results
+    get_match_cache().put(key, entry)
+
+
+def _research_messages(state: AgentState, similar_packages: list) -> list:
     # Create a temporary state for the prompt with filtered packages
     temp_state = state.copy()
     temp_state['package'] = similar_packages
 
-    # 3. Use LLM to refine the selection and format the output
-    llm = ChatGroq(model_name="llama-3.3-70b-versatile", groq_api_key=groq_api_key)
-    
     # Get the prompt string from our prompt function
     prompt_str = str(researcher_prompt(temp_state))
-    
-    # Invoke the LLM
-    response = llm.invoke([
+    return [
         SystemMessage(content=prompt_str),
         HumanMessage(content="Suggest the best packages from the list, prioritizing similarity where an exact match isn't found.")
-    ])
-    
-    content = response.content.strip()
-
-    
-    # Robust JSON extraction from content
-    if "```json" in content:
-        content = content.split("```json")[1].split("```")[0].strip()
-    elif "```" in content:
-        content = content.split("```")[1].split("```")[0].strip()
-        
+    ]
+
+
+def _selected_packages(content: str, similar_packages: list) -> Optional[list]:
+    """The packages the LLM selected, or None when its reply does not parse"""
     try:
-        packages = json.loads(content)
-        # Ensure it's a list
-        if not isinstance(packages, list):
-            packages = [packages] if isinstance(packages, dict) else []
-    except Exception as e:
-        print(f"Error parsing researcher JSON: {e}")
-        # Fallback to the top 3 similar packages found by the matcher
-        packages = similar_packages[:3]
+        selected = extract_json(content, ResearchReply)
+    except JSONExtractionError as e:
+        logger.warning(f"Error parsing researcher JSON: {e}")
+        return None
+    # Ensure it's a list
+    if not isinstance(selected, list):
+        selected = [selected]
+    # The prompt only shows compact rows, so map the ids back to full packages
+    by_id = {pkg.get('package_id'): pkg for pkg in similar_packages}
+    packages = []
+    for item in selected:
+        package_id = item.get('package_id') if isinstance(item, dict) else item
+        if package_id in by_id:
+            packages.append(by_id[package_id])
+        elif isinstance(item, dict):
+            packages.append(item)
+    return packages
+
+
+def _research_reply(selected: Optional[list], similar_packages: list) -> dict:
+    # Fallback to the top 3 similar packages found by the matcher
+    return {"research_results": similar_packages[:3] if selected is None else selected}
+
+
+def _research_result(content: str, similar_packages: list) -> dict:
+    return _research_reply(_selected_packages(content, similar_packages), similar_packages)
+
+
+@traced("agent.researcher")
+def researcher_agent(state: AgentState):
+    """This agent researches the packages based on the user preferences or finds similar ones"""
+    # 1. Unchanged preferences and catalog: reuse the last result, LLM selection included
+    key, entry = _cached_match(state)
+    if entry is not None and "research_results" in entry:
+        return {"research_results": entry["research_results"]}
+
+    # 2. Find the most similar packages, unless only the LLM step is missing
+    if entry is not None:
+        similar_packages = entry["similar_packages"]
+    else:
+        similar_packages, version = _find_similar_packages(state)
+        key = _cache_key(state, version)
+
+    # 3. Use LLM to refine the selection and format the output
+    llm = get_llm(cached=True)
+    response = llm.invoke(_research_messages(state, similar_packages))
+
+    selected = _selected_packages(response.content, similar_packages)
+    _store_match(key, similar_packages, selected)
+    return _research_reply(selected, similar_packages)
+
+
+# State keys the matcher reads; only these are shipped to a process pool
+_MATCH_KEYS = ('package', 'package_type', 'destination', 'budget', 'duration_days', 'duration',
+               'traveler_type', 'activities', 'activity')
+
+
+@traced("agent.researcher")
+async def aresearcher_agent(state: AgentState, executor: Optional[Executor] = None):
+    """
+    Async variant of researcher_agent; matching runs off the event loop, in a
+    thread by default or in `executor` (e.g. a ProcessPoolExecutor) when given.
+    """
+    key, entry = await asyncio.to_thread(_cached_match, state)
+    if entry is not None and "research_results" in entry:
+        return {"research_results": entry["research_results"]}
+
+    if entry is not None:
+        similar_packages = entry["similar_packages"]
+    else:
+        if executor is None:
+            similar_packages, version = await asyncio.to_thread(_find_similar_packages, state)
+        else:
+            preferences = {key: state[key] for key in _MATCH_KEYS if key in state}
+            loop = asyncio.get_running_loop()
+            similar_packages, version = await loop.run_in_executor(executor, _find_similar_packages, preferences)
+        # The version actually searched, in case the catalog changed since the lookup
+        key = _cache_key(state, version)
+
+    llm = get_llm(cached=True)
+    response = await llm.ainvoke(_research_messages(state, similar_packages))
 
-    return {"research_results": packages}
+    selected = _selected_packages(response.content, similar_packages)
+    await asyncio.to_thread(_store_match, key, similar_packages, selected)
+    return _research_reply(selected, similar_packages)
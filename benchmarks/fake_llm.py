@@ -0,0 +1,85 @@
+"""
+A deterministic stand-in for the chat model, for benchmarks.
+
+Replies are built from the prompt alone (no randomness, no network), in the
+envelope each agent asks for, so parsing and post-processing run as usual.
+"""
+import json
+import re
+from typing import Any, Iterator, List
+
+from langchain_core.runnables import Runnable, RunnableLambda
+
+from models import ExtractedPreferences
+
+_PACKAGE_ID_RE = re.compile(r"\b(?:PKG|SYN)\d+\b")
+
+
+class FakeMessage:
+    def __init__(self, content: str):
+        self.content = content
+
+
+def _prompt_text(prompt: Any) -> str:
+    if isinstance(prompt, str):
+        return prompt
+    if isinstance(prompt, dict):
+        return json.dumps(prompt, default=str)
+    return "\n".join(str(getattr(m, "content", m)) for m in prompt)
+
+
+def fake_reply(prompt: Any) -> str:
+    """The reply the fake model gives for a prompt"""
+    text = _prompt_text(prompt)
+    package_ids = list(dict.fromkeys(_PACKAGE_ID_RE.findall(text)))
+    if '"ranked_packages"' in text:
+        ranked = [{"package_id": pid, "score": 90 - i, "reasoning": "Good match."} for i, pid in enumerate(package_ids[:5])]
+        body = {"ranked_packages": ranked,
+                "top_recommendations": [{"package_id": r["package_id"], "explanation": "Best fit."} for r in ranked[:3]]}
+        return f"```json\n{json.dumps(body)}\n```"
+    if '"itinerary"' in text:
+        days = [{"day": i + 1, "plan": "Sightseeing", "activities_detail": "Explore."} for i in range(3)]
+        return json.dumps({"itinerary": days, "alternatives_available": True, "message": "Here is your plan."})
+    if "current_state" in text:
+        return json.dumps({"current_state": "destination", "message": "Which destination are you considering?"})
+    return json.dumps([{"package_id": pid} for pid in package_ids[:3]])
+
+
+def fake_extraction(prompt: Any) -> ExtractedPreferences:
+    """The structured reply the fake model gives (a fixed extraction)"""
+    return ExtractedPreferences(destination="Goa", budget=30000, confidence="high")
+
+
+async def _afake_extraction(prompt: Any) -> ExtractedPreferences:
+    return fake_extraction(prompt)
+
+
+class FakeChatModel:
+    """Duck-typed like the chat models utils.llm.get_llm returns"""
+
+    def invoke(self, prompt: Any) -> FakeMessage:
+        return FakeMessage(fake_reply(prompt))
+
+    async def ainvoke(self, prompt: Any) -> FakeMessage:
+        return self.invoke(prompt)
+
+    def stream(self, prompt: Any) -> Iterator[FakeMessage]:
+        reply = fake_reply(prompt)
+        for i in range(0, len(reply), 8):
+            yield FakeMessage(reply[i:i + 8])
+
+    async def astream(self, prompt: Any):
+        for chunk in self.stream(prompt):
+            yield chunk
+
+    def with_structured_output(self, schema: Any, **kwargs) -> Runnable:
+        """A runnable, like the real one, so that `prompt | structured_llm` chains"""
+        return RunnableLambda(fake_extraction, afunc=_afake_extraction, name="fake_structured_output")
+
+
+def patch_llm(modules: List[Any]) -> FakeChatModel:
+    """Points get_llm in each of `modules` at one shared fake model"""
+    model = FakeChatModel()
+    for module in modules:
+        module.get_llm = lambda *args, **kwargs: model
+    return model
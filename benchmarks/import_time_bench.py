@@ -0,0 +1,128 @@
+"""
+Measures cold import time of the agent modules and the workflow, each in a
+fresh interpreter, and checks it against a budget.
+
+Usage: python benchmarks/import_time_bench.py [--budget-ms MS] [--runs N] [--top K]
+Prints one JSON object and exits with status 1 when any module's median
+import time is over budget (or the import fails). Children run without
+GROQ_API_KEY / LANGCHAIN_API_KEY: importing must not need credentials.
+
+A module whose import fails because a project module is missing from the
+tree (e.g. graphs.state) is listed under "not_measured" instead; with
+--strict that fails the check too.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    "utils.llm",
+    "agents.info_collector_agent",
+    "agents.conversation_agent",
+    "agents.researcher_agent",
+    "agents.ranking_agent",
+    "agents.day_planner_agent",
+    "graphs.workflow",
+]
+
+# Default cold-start budget per module, in milliseconds
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "600"))
+
+# Top-level packages of this project; a missing module under one is a tree problem, not a slow import
+PROJECT_PACKAGES = ("agents", "graphs", "prompts", "utils", "models")
+
+_MISSING_RE = re.compile(r"ModuleNotFoundError: No module named '([\w.]+)'")
+
+_CHILD = "import time; t = time.perf_counter(); import {module}; print((time.perf_counter() - t) * 1000)"
+
+
+def _child_env() -> dict:
+    env = dict(os.environ)
+    for key in ("GROQ_API_KEY", "LANGCHAIN_API_KEY", "LLM_BASE_URL"):
+        env.pop(key, None)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")]))
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def measure(module: str, runs: int) -> dict:
+    """Median import time of `module` over `runs` fresh interpreters"""
+    timings = []
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-c", _CHILD.format(module=module)],
+            capture_output=True, text=True, cwd=ROOT, env=_child_env(),
+        )
+        if proc.returncode != 0:
+            return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed"}
+        timings.append(float(proc.stdout.strip().splitlines()[-1]))
+    return {"median_ms": round(statistics.median(timings), 1), "max_ms": round(max(timings), 1)}
+
+
+def slowest_imports(module: str, top: int) -> list:
+    """The `top` slowest imports (cumulative) under `module`, from -X importtime"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=ROOT, env=_child_env(),
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            _, cumulative, name = line.split("|")
+            rows.append((int(cumulative), name.strip()))
+        except ValueError:
+            continue
+    rows.sort(reverse=True)
+    return [{"module": name, "cumulative_ms": round(us / 1000, 1)} for us, name in rows[1:top + 1]]
+
+
+def _missing_project_module(error: str) -> str:
+    """The project module an import error names as missing, or "" """
+    m = _MISSING_RE.search(error)
+    return m.group(1) if m and m.group(1).split(".")[0] in PROJECT_PACKAGES else ""
+
+
+def run(budget_ms: float, runs: int, top: int, strict: bool = False) -> dict:
+    results = {}
+    not_measured = {}
+    for module in MODULES:
+        row = measure(module, runs)
+        missing = _missing_project_module(row.get("error", ""))
+        if missing:
+            not_measured[module] = f"{missing} is missing from this tree"
+            continue
+        row["within_budget"] = "median_ms" in row and row["median_ms"] <= budget_ms
+        if top:
+            row["slowest"] = slowest_imports(module, top)
+        results[module] = row
+    return {
+        "budget_ms": budget_ms,
+        "runs": runs,
+        "modules": results,
+        "not_measured": not_measured,
+        "ok": all(row["within_budget"] for row in results.values()) and not (strict and not_measured),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=0, help="also list the K slowest imports per module")
+    parser.add_argument("--strict", action="store_true", help="fail when a module could not be measured")
+    args = parser.parse_args()
+    report = run(args.budget_ms, args.runs, args.top, args.strict)
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmarks LLM JSON extraction: the old per-agent fence splitting vs
+utils.json_extract, on clean and defective replies.
+
+Usage: python benchmarks/json_extract_bench.py [--iterations N]
+Prints one JSON object with timings (microseconds per reply) and success rates.
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.json_extract import extract_json, JSONExtractionError  # noqa: E402
+
+_RANKED = {
+    "ranked_packages": [
+        {"package_id": f"PKG{i:03d}", "score": 95 - i, "reasoning": "Matches destination, budget and duration."}
+        for i in range(10)
+    ],
+    "top_recommendations": [{"package_id": "PKG000", "explanation": "Best overall fit."}],
+}
+_BODY = json.dumps(_RANKED, indent=2)
+
+SAMPLES = {
+    "clean": _BODY,
+    "fenced": f"```json\n{_BODY}\n```",
+    "preamble": f"Here are the ranked packages:\n```json\n{_BODY}\n```\nLet me know if you need more!",
+    "trailing_comma": _BODY.replace("\n  ]", ",\n  ]"),
+    "single_quotes": _BODY.replace('"', "'"),
+    "truncated": _BODY[: len(_BODY) * 2 // 3],
+}
+
+
+def split_fences(content: str):
+    """The parsing the agents used before utils.json_extract"""
+    content = content.strip()
+    if "```json" in content:
+        content = content.split("```json")[1].split("```")[0].strip()
+    elif "```" in content:
+        content = content.split("```")[1].split("```")[0].strip()
+    return json.loads(content)
+
+
+def _succeeds(parse, text: str) -> bool:
+    try:
+        parse(text)
+        return True
+    except (ValueError, JSONExtractionError):
+        return False
+
+
+def run(iterations: int) -> dict:
+    results = {}
+    for name, text in SAMPLES.items():
+        row = {"chars": len(text)}
+        for label, parse in (("split_fences", split_fences), ("extract_json", extract_json)):
+            ok = _succeeds(parse, text)
+            row[f"{label}_ok"] = ok
+            if ok:
+                seconds = timeit.timeit(lambda: parse(text), number=iterations)
+                row[f"{label}_us"] = round(seconds / iterations * 1e6, 2)
+        results[name] = row
+    return {
+        "iterations": iterations,
+        "samples": results,
+        "split_fences_success": sum(r["split_fences_ok"] for r in results.values()),
+        "extract_json_success": sum(r["extract_json_ok"] for r in results.values()),
+        "total": len(results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.iterations), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Reports prompt size for the researcher and ranking package sections: repr()
+of the full package dicts (as the prompts used to embed them) vs the compact
+table from utils.prompt_packages.
+
+Usage: python benchmarks/prompt_tokens_bench.py [--limit N] [--budget TOKENS]
+Prints one JSON object; token counts are estimates (~4 characters per token).
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.catalog_manager import get_catalog  # noqa: E402
+from utils.matcher import get_most_similar_packages  # noqa: E402
+from utils.prompt_packages import RANKING_FIELDS, RESEARCHER_FIELDS, serialize_packages  # noqa: E402
+
+PREFERENCES = [
+    {"destination": "Goa", "package_type": "beach", "budget": 40000, "duration_days": 4, "traveler_type": "couple"},
+    {"package_type": "hills", "budget": 25000, "traveler_type": "solo", "activities": ["trekking"]},
+    {"destination": "Kerala", "duration_days": 5, "traveler_type": "family_4"},
+]
+
+
+def run(limit: int, budget: int) -> dict:
+    catalog = get_catalog()
+    rows = []
+    for preferences in PREFERENCES:
+        similar = get_most_similar_packages(preferences, catalog, limit=limit)
+        researcher = serialize_packages(similar, RESEARCHER_FIELDS, preferences, token_budget=budget)
+        # The ranking prompt used to embed both research_results and all of state['packages']
+        ranking = serialize_packages(similar, RANKING_FIELDS, preferences, token_budget=budget)
+        ranking_baseline = ranking.baseline_tokens + researcher.baseline_tokens
+        rows.append({
+            "preferences": preferences,
+            "candidates": len(similar),
+            "researcher": {"repr_tokens": researcher.baseline_tokens, "table_tokens": researcher.tokens,
+                           "saved_tokens": researcher.saved_tokens, "dropped": researcher.dropped},
+            "ranking": {"repr_tokens": ranking_baseline, "table_tokens": ranking.tokens,
+                        "saved_tokens": max(0, ranking_baseline - ranking.tokens), "dropped": ranking.dropped},
+        })
+    return {
+        "catalog_size": len(catalog),
+        "token_budget": budget,
+        "full_catalog_repr_tokens": (len(repr(list(catalog))) + 3) // 4,
+        "runs": rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--budget", type=int, default=1500)
+    args = parser.parse_args()
+    print(json.dumps(run(args.limit, args.budget), indent=2))
+
+
+if __name__ == "__main__":
+    main()
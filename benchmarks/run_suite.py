@@ -0,0 +1,324 @@
+"""
+Benchmark suite: matcher, prompt builders and JSON post-processing on
+synthetic catalogs, with the LLM replaced by a deterministic fake.
+
+Usage:
+    python benchmarks/run_suite.py -o bench.json
+    python benchmarks/run_suite.py --sizes 40,10000 --repeat 3 -o new.json --compare bench.json
+
+Results are JSON: one entry per (benchmark, catalog size) with min/median/mean
+milliseconds per call. --compare reports entries whose median got slower than
+--threshold times the baseline, and exits with status 1 if there are any.
+A benchmark whose agent logs a warning or error (its fallback path) stops
+the suite with FallbackError instead of being timed.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_llm import fake_reply, patch_llm  # noqa: E402
+from benchmarks.synthetic import generate_catalog  # noqa: E402
+from utils.catalog import PackageCatalog  # noqa: E402
+from utils.activity_vectors import ActivityMatrix  # noqa: E402
+from utils.json_extract import extract_json  # noqa: E402
+from utils.match_cache import MatchCache, match_key  # noqa: E402
+from utils.matcher import calculate_similarity_score, get_most_similar_packages  # noqa: E402
+from utils.packed_catalog import PackedCatalog, compile_catalog  # noqa: E402
+from utils.scoring import ScoringEngine  # noqa: E402
+
+SCHEMA_VERSION = 1
+DEFAULT_SIZES = "40,10000,100000,1000000"
+
+PREFERENCES = [
+    {"destination": "Goa", "package_type": "beach", "budget": 40000, "duration_days": 4,
+     "traveler_type": "couple", "activities": ["water sports"]},
+    {"package_type": "hills", "budget": 25000, "duration_days": 5, "traveler_type": "solo", "activities": ["trekking"]},
+    {"destination": "Atlantis", "package_type": "heritage", "budget": 60000, "traveler_type": "family_4"},
+]
+
+# Packages scored per call in the calculate_similarity_score benchmark
+SCORE_SAMPLE = 2000
+
+# Packages repriced / added per call in the catalog.updated benchmarks
+UPDATE_SAMPLE = 20
+
+# Packages in the distinct-plans activity matrix case (every plan text hashed anew)
+DISTINCT_PLANS_SAMPLE = 20_000
+
+# Loggers of the benchmarked agents. They report their fallback paths (LLM
+# errors, unparsable replies) as warnings or errors, which would otherwise
+# be timed as if they were the real path
+AGENT_LOGGERS = ("conversation_agent", "ranking_agent", "researcher_agent", "agents.info_collector_agent")
+
+
+class FallbackError(RuntimeError):
+    """Raised when a benchmark ran into an agent's fallback path"""
+
+
+class _FallbackRecorder(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.records: List[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+
+_fallbacks = _FallbackRecorder()
+for _name in AGENT_LOGGERS:
+    logging.getLogger(_name).addHandler(_fallbacks)
+
+
+def _calibrate(fn: Callable[[], Any], target_s: float = 0.02, cap: int = 10000) -> int:
+    """Calls per timing sample, so that fast operations are measurable"""
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    return 1 if elapsed >= target_s else min(cap, max(1, int(target_s / max(elapsed, 1e-7))))
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    """min/median/mean milliseconds per call over `repeat` samples"""
+    number = _calibrate(fn)
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - started) / number * 1000)
+    return {
+        "repeat": repeat,
+        "number": number,
+        "min_ms": round(min(samples), 4),
+        "median_ms": round(statistics.median(samples), 4),
+        "mean_ms": round(statistics.fmean(samples), 4),
+    }
+
+
+def _repeat_for(size: int, repeat: int) -> int:
+    if size >= 1_000_000:
+        return 1
+    if size >= 100_000:
+        return min(repeat, 3)
+    return repeat
+
+
+def _agent_modules():
+    """The agent and prompt modules; they need graphs.state, which may be absent"""
+    import agents.conversation_agent as conversation_agent
+    import agents.info_collector_agent as info_collector_agent
+    import agents.ranking_agent as ranking_agent
+    import agents.researcher_agent as researcher_agent
+    import prompts.conversation_prompt as conversation_prompt
+    import prompts.day_planner_prompts as day_planner_prompts
+    import prompts.info_collector_prompt as info_collector_prompt
+    import prompts.ranking_agent_prompts as ranking_agent_prompts
+    import prompts.researcher_prompt as researcher_prompt
+    return {
+        "conversation_agent": conversation_agent,
+        "info_collector_agent": info_collector_agent,
+        "ranking_agent": ranking_agent,
+        "researcher_agent": researcher_agent,
+        "conversation_prompt": conversation_prompt,
+        "day_planner_prompts": day_planner_prompts,
+        "info_collector_prompt": info_collector_prompt,
+        "ranking_agent_prompts": ranking_agent_prompts,
+        "researcher_prompt": researcher_prompt,
+    }
+
+
+def run_size(size: int, seed: int, repeat: int, results: List[Dict[str, Any]], skipped: List[Dict[str, Any]]) -> None:
+    packages = generate_catalog(size, seed)
+    repeat = _repeat_for(size, repeat)
+
+    def record(name: str, fn: Callable[[], Any], times: int = repeat):
+        row = {"benchmark": name, "size": size}
+        _fallbacks.records.clear()
+        row.update(measure(fn, times))
+        if _fallbacks.records:
+            first = _fallbacks.records[0]
+            raise FallbackError(f"{name} @ {size} ran into a fallback path: {first.name}: {first.getMessage()}")
+        results.append(row)
+        print(f"  {name:<52} {row['median_ms']:>12.4f} ms", file=sys.stderr)
+
+    print(f"catalog size {size}", file=sys.stderr)
+    preferences = PREFERENCES[0]
+
+    # Matching
+    record("catalog.build", lambda: PackageCatalog(packages), times=1 if size >= 100_000 else repeat)
+    catalog = PackageCatalog(packages)
+    sample = packages[:SCORE_SAMPLE]
+    record(f"matcher.calculate_similarity_score[x{len(sample)}]",
+           lambda: [calculate_similarity_score(preferences, pkg) for pkg in sample])
+    for i, prefs in enumerate(PREFERENCES):
+        record(f"matcher.get_most_similar_packages[list,prefs{i}]", lambda: get_most_similar_packages(prefs, packages, 10))
+        record(f"matcher.get_most_similar_packages[catalog,prefs{i}]", lambda: get_most_similar_packages(prefs, catalog, 10))
+    record("activity_matrix.build", lambda: ActivityMatrix.from_records(catalog.records), times=1 if size >= 100_000 else repeat)
+    catalog.activity_matrix.semantic_hits("hiking")
+    record("activity_matrix.semantic_hits", lambda: catalog.activity_matrix.package_scores("hiking"))
+    # Shared day dicts collapse to a few hundred plan texts; here every package has its own
+    distinct_size = min(size, DISTINCT_PLANS_SAMPLE)
+    distinct = PackageCatalog(generate_catalog(distinct_size, seed, distinct_plans=True))
+    record(f"activity_matrix.build[distinct_plans,x{distinct_size}]",
+           lambda: ActivityMatrix.from_records(distinct.records), times=1)
+    distinct.activity_matrix.semantic_hits("hiking")
+    record(f"activity_matrix.semantic_hits[distinct_plans,x{distinct_size}]",
+           lambda: distinct.activity_matrix.package_scores("hiking"))
+    engine = ScoringEngine(catalog)
+    record("scoring.top_k", lambda: engine.top_k(preferences, 10))
+    catalog.budget_hint(preferences)   # sorts the price key
+    record("catalog.budget_hint", lambda: catalog.budget_hint(preferences))
+
+    # Incremental updates on a catalog with its price tiers and activity matrix built
+    step = max(1, size // UPDATE_SAMPLE)
+    repriced = {pkg["package_id"]: dict(pkg, price={key: value + 100 for key, value in pkg["price"].items()})
+                for pkg in packages[::step]}
+    added = {f"NEW{i}": dict(pkg, package_id=f"NEW{i}") for i, pkg in enumerate(packages[::step])}
+    record(f"catalog.updated[price x{len(repriced)}]", lambda: catalog.updated(repriced))
+    record(f"catalog.updated[add x{len(added)}]", lambda: catalog.updated(added))
+
+    # Researcher match cache hit (memory level): key plus lookup, instead of the matcher and LLM
+    match_cache = MatchCache(path=None)
+    match_cache.put(match_key(preferences, 0, 10), {"similar_packages": get_most_similar_packages(preferences, catalog, 10)})
+    record("match_cache.get", lambda: match_cache.get(match_key(preferences, 0, 10)))
+
+    # Compiled catalog: open is a memory map; scoring reads the mapped columns
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "catalog.pcat")
+        record("packed.compile", lambda: compile_catalog(packages, path), times=1)
+        record("packed.open", lambda: PackedCatalog.open(path))
+        packed = PackedCatalog.open(path)
+        for i, prefs in enumerate(PREFERENCES):
+            get_most_similar_packages(prefs, packed, 10)   # builds the lazy activity index
+            record(f"matcher.get_most_similar_packages[packed,prefs{i}]",
+                   lambda: get_most_similar_packages(prefs, packed, 10))
+        packed.budget_hint(preferences)
+        record("packed.budget_hint", lambda: packed.budget_hint(preferences))
+        del packed
+
+    # Prompt builders and post-processing run on the matcher's output
+    similar = get_most_similar_packages(preferences, catalog, 10)
+    candidates = get_most_similar_packages(preferences, catalog, 50)
+    state = dict(preferences, messages=[], package=similar, research_results=similar,
+                 packages=candidates, selected_package=similar[0] if similar else {}, current_state="budget")
+
+    ranking_text = fake_reply('"ranked_packages" ' + " ".join(pkg["package_id"] for pkg in similar))
+    record("json.extract_json[ranking]", lambda: extract_json(ranking_text))
+
+    try:
+        modules = _agent_modules()
+    except ImportError as e:
+        skipped.append({"benchmark": "prompts.*, agents.*", "size": size, "reason": f"ImportError: {e}"})
+        return
+    patch_llm([modules["conversation_agent"], modules["ranking_agent"], modules["researcher_agent"],
+               modules["info_collector_agent"]])
+    modules["info_collector_agent"]._chain = None   # rebuilt on the fake model
+
+    record("prompts.researcher_prompt", lambda: modules["researcher_prompt"].researcher_prompt(state))
+    record("prompts.ranking_agent_prompt", lambda: modules["ranking_agent_prompts"].ranking_agent_prompt(state))
+    record("prompts.conversation_prompt", lambda: modules["conversation_prompt"].conversation_prompt(state))
+    record("prompts.day_planner_prompt", lambda: modules["day_planner_prompts"].day_planner_prompt(state))
+    itinerary = [{"day": i + 1, "plan": day.get("primary_plan", "")} for i, day in enumerate(state["selected_package"].get("day_plans", []))]
+    record("prompts.itinerary_polish_prompt",
+           lambda: modules["day_planner_prompts"].itinerary_polish_prompt(state["selected_package"], itinerary))
+    record("prompts.get_info_collector_prompt", lambda: modules["info_collector_prompt"].get_info_collector_prompt())
+
+    research_reply = fake_reply(modules["researcher_prompt"].researcher_prompt(state))
+    ranking_reply = fake_reply(modules["ranking_agent_prompts"].ranking_agent_prompt(state))
+    conversation_reply = fake_reply("current_state")
+    record("postprocess.conversation_result",
+           lambda: modules["conversation_agent"]._conversation_result(
+               state, conversation_reply, modules["conversation_agent"].build_context(state)))
+    record("postprocess.research_result", lambda: modules["researcher_agent"]._research_result(research_reply, similar))
+    record("postprocess.llm_ranking",
+           lambda: modules["ranking_agent"]._apply_llm_ranking(dict(state, messages=[]), ranking_reply, candidates))
+
+    # Whole researcher step: matching, prompt, fake LLM, parsing
+    research_state = dict(preferences, messages=[], package=catalog)
+    record("agents.researcher_agent", lambda: modules["researcher_agent"].researcher_agent(research_state))
+
+    # Preference extraction through the structured-output chain (too vague for the rules)
+    from langchain_core.messages import HumanMessage
+
+    extraction_state = dict(messages=[HumanMessage(content="somewhere warm where the kids can play, nothing fancy")])
+    record("agents.info_collector_agent[llm]",
+           lambda: modules["info_collector_agent"].info_collector_agent(dict(extraction_state)))
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Entries whose median is more than `threshold` times the baseline's"""
+    base = {(row["benchmark"], row["size"]): row for row in baseline.get("results", [])}
+    regressions = []
+    for row in current["results"]:
+        old = base.get((row["benchmark"], row["size"]))
+        if not old or not old["median_ms"]:
+            continue
+        ratio = row["median_ms"] / old["median_ms"]
+        if ratio > threshold:
+            regressions.append({"benchmark": row["benchmark"], "size": row["size"], "baseline_ms": old["median_ms"],
+                                "current_ms": row["median_ms"], "ratio": round(ratio, 2)})
+    return regressions
+
+
+def run(sizes: List[int], seed: int, repeat: int) -> Dict[str, Any]:
+    results: List[Dict[str, Any]] = []
+    skipped: List[Dict[str, Any]] = []
+    for size in sizes:
+        run_size(size, seed, repeat, results, skipped)
+    return {
+        "schema_version": SCHEMA_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": seed,
+        "sizes": sizes,
+        "results": results,
+        "skipped": skipped,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"comma-separated catalog sizes (default: {DEFAULT_SIZES})")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="write results here instead of stdout")
+    parser.add_argument("--compare", help="baseline results file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio reported as a regression")
+    args = parser.parse_args(argv)
+
+    # Keep the response and match caches out of the measurements
+    os.environ.setdefault("LLM_CACHE_DISABLED", "1")
+    os.environ.setdefault("MATCH_CACHE_DISABLED", "1")
+
+    report = run([int(size) for size in args.sizes.split(",") if size], args.seed, args.repeat)
+    status = 0
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            report["regressions"] = compare(report, json.load(f), args.threshold)
+        status = 1 if report["regressions"] else 0
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    for row in report.get("regressions", []):
+        print(f"REGRESSION {row['benchmark']} @ {row['size']}: {row['baseline_ms']} -> {row['current_ms']} ms "
+              f"(x{row['ratio']})", file=sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+Synthetic package catalogs with the schema of dataset/Packages.json.
+
+Usage: python benchmarks/synthetic.py SIZE -o catalog.json [--seed N]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.catalog import DEFAULT_PACKAGE_FILE  # noqa: E402
+
+# Share of packages placed in one of the real destinations; the rest go to
+# generated ones, so larger catalogs also have more distinct destinations
+REAL_DESTINATION_SHARE = 0.5
+
+
+def _load_templates(source: str) -> List[Dict[str, Any]]:
+    with open(source, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _place_name(n: int) -> str:
+    """A made-up word per n ("ba", "ca", ...), so its hashed features are new too"""
+    letters = "bcdfghjklmnpqrstvwz"
+    word = ""
+    while True:
+        n, digit = divmod(n, len(letters))
+        word += letters[digit] + "aeiou"[n % 5]
+        if not n:
+            return word.capitalize()
+
+
+def _distinct_day(day: Dict[str, Any], n: int) -> Dict[str, Any]:
+    place = _place_name(n)
+    return dict(day, primary_plan=f"{day['primary_plan']} near {place}",
+                alternative_plans=[f"{plan} at {place}" for plan in day.get("alternative_plans", [])])
+
+
+def generate_catalog(size: int, seed: int = 0, source: str = DEFAULT_PACKAGE_FILE,
+                     distinct_plans: bool = False) -> List[Dict[str, Any]]:
+    """
+    `size` packages derived from the real ones: destination, type, duration and
+    prices vary; day plans are drawn from the templates' days. Day plan dicts
+    are shared between packages to keep million-package catalogs in memory,
+    unless `distinct_plans` is set: then every day names its own made-up place,
+    so no two packages have the same plan texts (the activity matrix's worst case).
+    Deterministic for a given (size, seed, source, distinct_plans).
+    """
+    rng = random.Random(seed)
+    templates = _load_templates(source)
+    destinations = sorted({pkg["destination"] for pkg in templates})
+    package_types = sorted({pkg["package_type"] for pkg in templates})
+    seasons = sorted({pkg["best_season"] for pkg in templates})
+    days_by_type: Dict[str, List[Dict[str, Any]]] = {}
+    for pkg in templates:
+        days_by_type.setdefault(pkg["package_type"], []).extend(pkg["day_plans"])
+    synthetic_destinations = max(1, size // 20)
+
+    catalog = []
+    for i in range(size):
+        template = templates[rng.randrange(len(templates))]
+        package_type = template["package_type"] if rng.random() < 0.8 else rng.choice(package_types)
+        if rng.random() < REAL_DESTINATION_SHARE:
+            destination = rng.choice(destinations)
+        else:
+            destination = f"Destination {rng.randrange(synthetic_destinations)}"
+        duration = max(1, min(12, template["duration_days"] + rng.randint(-2, 3)))
+        scale = rng.uniform(0.6, 1.8)
+        price = {key: int(round(value * scale * duration / template["duration_days"], -2))
+                 for key, value in template["price"].items()}
+        day_pool = days_by_type[package_type]
+        catalog.append({
+            "package_id": f"SYN{i:07d}",
+            "package_type": package_type,
+            "destination": destination,
+            "duration_days": duration,
+            "price": price,
+            "best_season": rng.choice(seasons),
+            "day_plans": [day_pool[rng.randrange(len(day_pool))] for _ in range(duration)],
+        })
+        if distinct_plans:
+            catalog[-1]["day_plans"] = [_distinct_day(day, i * 16 + d) for d, day in enumerate(catalog[-1]["day_plans"])]
+    return catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("size", type=int)
+    parser.add_argument("-o", "--output", required=True)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--distinct-plans", action="store_true", help="give every package its own plan texts")
+    args = parser.parse_args()
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(generate_catalog(args.size, args.seed, distinct_plans=args.distinct_plans), f)
+
+
+if __name__ == "__main__":
+    main()
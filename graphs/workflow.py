@@ -0,0 +1,123 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from graphs.state import AgentState
+from agents.info_collector_agent import ainfo_collector_agent
+from agents.researcher_agent import aresearcher_agent
+from agents.conversation_agent import aconversation_agent
+from agents.ranking_agent import aranking_agent, has_candidates
+from agents.day_planner_agent import aday_planner_agent, has_selected_package
+from utils.tracing import get_tracer
+
+logger = logging.getLogger(__name__)
+
+
+class Node(NamedTuple):
+    """
+    A workflow step: an async agent and the steps it has to wait for. With
+    `when`, the agent only runs if it holds for the state its dependencies
+    left; otherwise the step finishes at once without changes.
+    """
+    name: str
+    agent: Callable[[AgentState], Awaitable[Dict[str, Any]]]
+    depends_on: Tuple[str, ...] = ()
+    when: Optional[Callable[[AgentState], bool]] = None
+
+
+# Research and the conversation reply only need the extracted preferences,
+# so they run concurrently. Ranking and planning are skipped on turns that
+# leave them nothing to rank or plan.
+DEFAULT_NODES: Tuple[Node, ...] = (
+    Node("info_collector", ainfo_collector_agent),
+    Node("researcher", aresearcher_agent, ("info_collector",)),
+    Node("conversation", aconversation_agent, ("info_collector",)),
+    Node("ranking", aranking_agent, ("researcher",), when=has_candidates),
+    Node("day_planner", aday_planner_agent, ("ranking",), when=has_selected_package),
+)
+
+
+def _snapshot(state: AgentState) -> AgentState:
+    """Copy handed to a node, so concurrent nodes never see each other's writes"""
+    snapshot = dict(state)
+    snapshot["messages"] = list(state.get("messages", []))
+    return snapshot
+
+
+def _merge(state: AgentState, snapshot: AgentState, update: Optional[Dict[str, Any]]) -> None:
+    """
+    Folds a node's return value into the shared state.
+
+    Agents either return only the keys they changed or the whole (mutated)
+    state, so only values that differ from the node's snapshot are applied.
+    Messages are appended: a returned list that starts with the snapshot's
+    messages contributes only what comes after them.
+    """
+    if not update:
+        return
+    for key, value in update.items():
+        if key == "messages":
+            before = snapshot.get("messages", [])
+            new_messages = list(value or [])
+            if len(new_messages) >= len(before) and all(a is b for a, b in zip(new_messages, before)):
+                new_messages = new_messages[len(before):]
+            state.setdefault("messages", []).extend(new_messages)
+        elif key not in snapshot or value is not snapshot[key]:
+            state[key] = value
+
+
+async def run_workflow(state: AgentState, nodes: Sequence[Node] = DEFAULT_NODES) -> AgentState:
+    """
+    Runs one session turn through the agent graph.
+
+    Every node starts as soon as all the nodes it depends on have finished,
+    so independent nodes run concurrently on the event loop. The turn is
+    traced as one `workflow.run` span with the agents' spans under it.
+    """
+    state = dict(state)
+    state["messages"] = list(state.get("messages", []))
+
+    names = {node.name for node in nodes}
+    for node in nodes:
+        missing = set(node.depends_on) - names
+        if missing:
+            raise ValueError(f"Node '{node.name}' depends on unknown nodes: {sorted(missing)}")
+
+    done: Dict[str, asyncio.Event] = {node.name: asyncio.Event() for node in nodes}
+
+    async def run_node(node: Node):
+        for dependency in node.depends_on:
+            await done[dependency].wait()
+        if node.when is not None and not node.when(state):
+            logger.debug(f"Workflow node '{node.name}' skipped")
+            done[node.name].set()
+            return
+        snapshot = _snapshot(state)
+        # Agents may mutate their snapshot in place, so diff against a copy
+        before = _snapshot(snapshot)
+        try:
+            update = await node.agent(snapshot)
+            _merge(state, before, update)
+        except Exception as e:
+            logger.error(f"Workflow node '{node.name}' failed: {e}")
+        finally:
+            done[node.name].set()
+
+    with get_tracer().span("workflow.run", "workflow", nodes=[node.name for node in nodes]):
+        await asyncio.gather(*(run_node(node) for node in nodes))
+    return state
+
+
+async def run_sessions(
+    states: Sequence[AgentState],
+    nodes: Sequence[Node] = DEFAULT_NODES,
+    concurrency: int = 100,
+) -> List[AgentState]:
+    """Runs many sessions on one event loop, at most `concurrency` at a time"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(state: AgentState) -> AgentState:
+        async with semaphore:
+            return await run_workflow(state, nodes)
+
+    return await asyncio.gather(*(run_one(state) for state in states))
@@ -0,0 +1,241 @@
+"""
+Batch travel planning.
+
+Reads a JSONL file of requests and runs each one through
+extraction -> research -> ranking -> day planning, writing one JSON result
+per line. Each input line is either free text or pre-extracted preferences:
+
+    {"id": "lead-1", "message": "Beach trip to Goa for a couple, 4 days, 40k"}
+    {"id": "lead-2", "messages": [{"role": "user", "content": "..."}]}
+    {"id": "lead-3", "preferences": {"destination": "Manali", "budget": 30000}}
+
+Usage:
+    python main.py leads.jsonl -o results.jsonl --concurrency 32 --workers 4
+    python main.py leads.jsonl -o results.jsonl --resume
+"""
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from graphs.state import AgentState
+from graphs.workflow import Node, run_workflow
+from agents.info_collector_agent import ainfo_collector_agent
+from agents.researcher_agent import aresearcher_agent
+from agents.ranking_agent import aranking_agent, has_candidates
+from agents.day_planner_agent import aday_planner_agent, has_selected_package
+from utils.packed_catalog import get_search_catalog
+
+logger = logging.getLogger("batch")
+
+_ROLES = {"user": HumanMessage, "human": HumanMessage, "assistant": AIMessage, "ai": AIMessage, "system": SystemMessage}
+_PREFERENCE_KEYS = ("package_type", "destination", "budget", "duration_days", "traveler_type", "activities")
+
+
+def batch_nodes(executor: Optional[Executor], extract: bool) -> Tuple[Node, ...]:
+    """The batch pipeline: no conversation reply, matching in `executor` if given"""
+    research = functools.partial(aresearcher_agent, executor=executor)
+    nodes = [
+        Node("researcher", research, ("info_collector",) if extract else ()),
+        Node("ranking", aranking_agent, ("researcher",), when=has_candidates),
+        Node("day_planner", aday_planner_agent, ("ranking",), when=has_selected_package),
+    ]
+    if extract:
+        nodes.insert(0, Node("info_collector", ainfo_collector_agent))
+    return tuple(nodes)
+
+
+def read_requests(path: str, done: Set[str]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yields (id, request) for every input line not already in `done`"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    request = {"_invalid": f"Line {line_no} is not a JSON object"}
+            except json.JSONDecodeError as e:
+                request = {"_invalid": f"Invalid JSON on line {line_no}: {e}"}
+            request_id = str(request.get("id", f"line-{line_no}"))
+            if request_id not in done:
+                yield request_id, request
+
+
+def completed_ids(path: str) -> Set[str]:
+    """
+    Ids already written to an output file (the checkpoint). A partially
+    written last line from an interrupted run is cut off, so appending
+    resumes on a clean line.
+    """
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "rb+") as f:
+        data = f.read()
+        complete = data.rfind(b"\n") + 1
+        if complete < len(data):
+            f.truncate(complete)
+    for line in data[:complete].decode("utf-8").splitlines():
+        try:
+            done.add(str(json.loads(line)["id"]))
+        except (json.JSONDecodeError, KeyError, TypeError):
+            continue
+    return done
+
+
+def initial_state(request: Dict[str, Any]) -> Tuple[AgentState, bool]:
+    """State for a request, and whether it still needs preference extraction"""
+    state: AgentState = {"messages": []}
+    preferences = request.get("preferences") or {}
+    for key in _PREFERENCE_KEYS:
+        if preferences.get(key) is not None:
+            state[key] = preferences[key]
+
+    if request.get("message"):
+        state["messages"].append(HumanMessage(content=str(request["message"])))
+    for msg in request.get("messages") or []:
+        message_class = _ROLES.get(str(msg.get("role", "user")).lower(), HumanMessage)
+        state["messages"].append(message_class(content=str(msg.get("content", ""))))
+
+    return state, bool(state["messages"])
+
+
+def result_record(request_id: str, state: AgentState, latency: float) -> Dict[str, Any]:
+    """The JSON-serializable part of a finished state"""
+    selected = state.get("selected_package") or {}
+    day_plan = state.get("day_plan")
+    return {
+        "id": request_id,
+        "status": "ok" if day_plan else "incomplete",
+        "preferences": {key: state.get(key) for key in _PREFERENCE_KEYS if state.get(key) is not None},
+        "research_results": [pkg.get("package_id") for pkg in state.get("research_results") or [] if isinstance(pkg, dict)],
+        "ranked_packages": state.get("ranked_packages") or [],
+        "selected_package": {
+            "package_id": selected.get("package_id"),
+            "destination": selected.get("destination"),
+            "package_type": selected.get("package_type"),
+            "duration_days": selected.get("duration_days"),
+        } if selected else None,
+        "day_plan": day_plan,
+        "latency_ms": round(latency * 1000, 1),
+    }
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(statuses: Dict[str, int], latencies: List[float], elapsed: float, skipped: int) -> Dict[str, Any]:
+    processed = sum(statuses.values())
+    return {
+        "processed": processed,
+        "skipped_from_checkpoint": skipped,
+        "statuses": statuses,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_per_s": round(processed / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 1),
+            "p95": round(percentile(latencies, 95) * 1000, 1),
+            "p99": round(percentile(latencies, 99) * 1000, 1),
+            "max": round(max(latencies, default=0) * 1000, 1),
+        },
+    }
+
+
+async def run_batch(
+    input_path: str,
+    output_path: str,
+    concurrency: int = 16,
+    executor: Optional[Executor] = None,
+    resume: bool = False,
+) -> Dict[str, Any]:
+    """
+    Processes every request in `input_path`, appending results to `output_path`
+    as they finish. With `resume`, ids already in the output are skipped.
+    Returns the throughput/latency summary.
+    """
+    done = completed_ids(output_path) if resume else set()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    statuses: Dict[str, int] = {}
+    latencies: List[float] = []
+    nodes = {True: batch_nodes(executor, extract=True), False: batch_nodes(executor, extract=False)}
+
+    with open(output_path, "a" if resume else "w", encoding="utf-8") as out:
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                request_id, request = item
+                started = time.perf_counter()
+                try:
+                    if "_invalid" in request:
+                        raise ValueError(request["_invalid"])
+                    state, extract = initial_state(request)
+                    state = await run_workflow(state, nodes[extract])
+                    record = result_record(request_id, state, time.perf_counter() - started)
+                except Exception as e:
+                    logger.error(f"Request {request_id} failed: {e}")
+                    record = {"id": request_id, "status": "error", "error": str(e),
+                              "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+                latencies.append(time.perf_counter() - started)
+                statuses[record["status"]] = statuses.get(record["status"], 0) + 1
+                # One flushed line per request is the checkpoint
+                out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+                out.flush()
+
+        started = time.perf_counter()
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        for item in read_requests(input_path, done):
+            await queue.put(item)
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+
+    return summarize(statuses, latencies, time.perf_counter() - started, len(done))
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Batch travel planning over a JSONL file of requests")
+    parser.add_argument("input", help="JSONL file with one request per line")
+    parser.add_argument("-o", "--output", default="results.jsonl", help="JSONL file for results (default: results.jsonl)")
+    parser.add_argument("-c", "--concurrency", type=int, default=16, help="requests in flight at once (default: 16)")
+    parser.add_argument("-w", "--workers", type=int, default=0,
+                        help="processes for package matching; 0 runs it in threads (default: 0)")
+    parser.add_argument("--resume", action="store_true", help="skip requests whose id is already in the output")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    executor = None
+    if args.workers > 0:
+        # Each worker loads the catalog once, up front (a compiled catalog is
+        # memory-mapped, so the workers share its pages)
+        executor = ProcessPoolExecutor(max_workers=args.workers, initializer=get_search_catalog)
+    try:
+        summary = asyncio.run(run_batch(args.input, args.output, args.concurrency, executor, args.resume))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    print(json.dumps(summary, indent=2), file=sys.stderr)
+    return 0 if not summary["statuses"].get("error") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,8 @@
 # models.py
 
-from typing import Optional, List
+import sys
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional, Tuple, Union
 from pydantic import BaseModel, Field
 
 
@@ -36,4 +38,305 @@ class ExtractedPreferences(BaseModel):
     notes: Optional[str] = Field(
         None,
         description="Extraction notes or ambiguities"
-    )
\ No newline at end of file
+    )
+
+# Reply envelopes: the fields an agent cannot do without are required, so
+# any other JSON (even {}) fails validation and takes the agent's fallback
+
+class ConversationReply(BaseModel):
+    """Envelope the conversation agent asks the LLM for"""
+    current_state: Optional[str] = None
+    message: str
+
+
+class RankedPackage(BaseModel):
+    """One entry of the ranking agent's ranked_packages list"""
+    package_id: Union[str, int]
+    score: Optional[float] = None
+    reasoning: Optional[str] = None
+
+
+class RankingReply(BaseModel):
+    """Envelope the ranking agent asks the LLM for"""
+    ranked_packages: List[RankedPackage]
+    top_recommendations: List[Dict[str, Any]] = Field(default_factory=list)
+
+
+class ItineraryDay(BaseModel):
+    """One day of a day planner itinerary"""
+    day: Optional[int] = None
+    plan: Optional[str] = None
+    activities_detail: Optional[str] = None
+
+
+class ItineraryReply(BaseModel):
+    """Envelope the day planner (and itinerary polishing) asks the LLM for"""
+    itinerary: List[ItineraryDay] = Field(default_factory=list)
+    alternatives_available: Optional[bool] = None
+    message: Optional[str] = None
+
+
+class ResearchPick(BaseModel):
+    """One package the researcher selected; other fields are kept as sent"""
+    package_id: Union[str, int]
+
+
+# The researcher returns a list of selected packages (objects with at least a
+# package_id, or bare ids), or a single package object
+ResearchReply = Union[List[Union[ResearchPick, str]], ResearchPick]
+
+
+# Typed catalog packages
+#
+# Packages.json entries are loaded once into these frozen, slotted records:
+# strings that repeat across packages (destination, type, season, price tier
+# names) are interned, prices are parsed to floats, and the normalized
+# destination/type the matcher compares are computed up front. `to_dict`
+# gives back the JSON form exactly: values that don't fit the typed fields
+# (a price given as text, an unknown key, ...) are kept verbatim.
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _match_key(value: Any) -> str:
+    """Same normalization as utils.catalog.normalize_text"""
+    return sys.intern(str(value or '').lower().strip())
+
+
+def _to_float(value: Any) -> Optional[float]:
+    """Price as a float; None when absent, NaN when present but unusable"""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return float("nan")
+
+
+def _json_number(value: float) -> Union[int, float]:
+    return int(value) if value.is_integer() else value
+
+
+def _same(a: Any, b: Any) -> bool:
+    """Equality that also tells 5 from 5.0 and True from 1"""
+    if a is b:
+        return True
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(_same(a[k], b[k]) for k in a)
+    if isinstance(a, list):
+        return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def _keep_differences(record: Any, data: Dict[str, Any]) -> Any:
+    """`record` with whatever its JSON form can't reproduce of `data` kept verbatim"""
+    rebuilt = record.to_dict()
+    verbatim = {key: value for key, value in data.items() if key not in rebuilt or not _same(rebuilt[key], value)}
+    absent = tuple(key for key in rebuilt if key not in data)
+    if verbatim or absent:
+        return replace(record, verbatim=verbatim or None, absent=absent)
+    return record
+
+
+def _exact_number(value: Any) -> bool:
+    """True when `value` survives the float round trip with its type (5 stays int, 5.5 float)"""
+    return type(value) is int or (type(value) is float and not value.is_integer())
+
+
+def _restore(rebuilt: Dict[str, Any], verbatim: Optional[Dict[str, Any]], absent: Tuple[str, ...]) -> Dict[str, Any]:
+    for key in absent:
+        rebuilt.pop(key, None)
+    if verbatim:
+        rebuilt.update(verbatim)
+    return rebuilt
+
+
+@dataclass(frozen=True, slots=True)
+class DayPlan:
+    """One entry of a package's day_plans"""
+    day: Optional[int] = None
+    primary_plan: str = ""
+    alternative_plans: Tuple[str, ...] = ()
+    verbatim: Optional[Dict[str, Any]] = field(default=None, repr=False, compare=False)
+    absent: Tuple[str, ...] = field(default=(), repr=False, compare=False)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DayPlan":
+        day = data.get("day")
+        primary = data.get("primary_plan")
+        alternatives = data.get("alternative_plans")
+        plan = cls(
+            day=day if isinstance(day, int) and not isinstance(day, bool) else None,
+            primary_plan=primary if isinstance(primary, str) else "",
+            alternative_plans=tuple(alternatives) if isinstance(alternatives, list)
+            and all(isinstance(a, str) for a in alternatives) else (),
+        )
+        # Usual shape: nothing to keep verbatim, skip the comparison
+        if (len(data) == 3 and type(day) is int and type(primary) is str and type(alternatives) is list
+                and len(plan.alternative_plans) == len(alternatives)):
+            return plan
+        return _keep_differences(plan, data)
+
+    def to_dict(self) -> Dict[str, Any]:
+        rebuilt = {"day": self.day, "primary_plan": self.primary_plan, "alternative_plans": list(self.alternative_plans)}
+        return _restore(rebuilt, self.verbatim, self.absent)
+
+    def activity_text(self) -> str:
+        """This day's part of utils.catalog.package_activity_text"""
+        return " " + self.primary_plan.lower() + " " + " ".join(a.lower() for a in self.alternative_plans)
+
+    def plan_texts(self) -> List[str]:
+        """This day's part of utils.activity_vectors.plan_texts"""
+        texts = [self.primary_plan.lower()] + [a.lower() for a in self.alternative_plans]
+        return [text for text in texts if text]
+
+
+@dataclass(frozen=True, slots=True)
+class PriceTiers:
+    """
+    A package's prices per traveler tier. Packages.json prices solo, couple
+    and family_4; other tiers go to `other`. A package priced with a single
+    number has it in `flat`, which then applies to every traveler type.
+    """
+    solo: Optional[float] = None
+    couple: Optional[float] = None
+    family_4: Optional[float] = None
+    other: Optional[Dict[str, Optional[float]]] = None
+    flat: Optional[float] = None
+
+    @classmethod
+    def from_json(cls, value: Any) -> "PriceTiers":
+        if isinstance(value, (int, float)):
+            return cls(flat=float(value))
+        if not isinstance(value, dict):
+            return cls()
+        other = {_intern(key): _to_float(price) for key, price in value.items()
+                 if key not in ("solo", "couple", "family_4")}
+        return cls(
+            solo=_to_float(value.get("solo")),
+            couple=_to_float(value.get("couple")),
+            family_4=_to_float(value.get("family_4")),
+            other=other or None,
+        )
+
+    def to_json(self) -> Union[Dict[str, Union[int, float]], int, float]:
+        if self.flat is not None:
+            return _json_number(self.flat)
+        tiers = {key: _json_number(price) for key, price in
+                 (("solo", self.solo), ("couple", self.couple), ("family_4", self.family_4)) if price is not None}
+        if self.other:
+            tiers.update((key, _json_number(price)) for key, price in self.other.items() if price is not None)
+        return tiers
+
+    def items(self) -> List[Tuple[str, float]]:
+        """(price key, price) pairs; a flat price is keyed '*'"""
+        if self.flat is not None:
+            return [("*", self.flat)]
+        pairs = [(key, price) for key, price in
+                 (("solo", self.solo), ("couple", self.couple), ("family_4", self.family_4)) if price is not None]
+        if self.other:
+            pairs.extend((key, price) for key, price in self.other.items() if price is not None)
+        return pairs
+
+    def tier(self, price_key: str) -> Optional[float]:
+        if price_key == "solo":
+            return self.solo
+        if price_key == "couple":
+            return self.couple
+        if price_key == "family_4":
+            return self.family_4
+        return self.other.get(price_key) if self.other else None
+
+    def get(self, price_key: str) -> Optional[float]:
+        """
+        Price for a resolved price key (see utils.catalog.resolve_price_key),
+        falling back to the solo fare. NaN when the price can't be used.
+        """
+        if self.flat is not None:
+            return self.flat
+        price = self.tier(price_key)
+        return self.solo if price is None else price
+
+
+@dataclass(frozen=True, slots=True)
+class Package:
+    """A catalog package; `to_dict()` is its Packages.json form"""
+    package_id: Any
+    package_type: Optional[str] = None
+    destination: Optional[str] = None
+    duration_days: Optional[int] = None
+    price: PriceTiers = PriceTiers()
+    best_season: Optional[str] = None
+    day_plans: Tuple[DayPlan, ...] = ()
+    # Normalized destination / type, as the matcher compares them
+    destination_key: str = field(default="", repr=False, compare=False)
+    type_key: str = field(default="", repr=False, compare=False)
+    verbatim: Optional[Dict[str, Any]] = field(default=None, repr=False, compare=False)
+    absent: Tuple[str, ...] = field(default=(), repr=False, compare=False)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], shared_days: Optional[Dict[int, Tuple[Any, DayPlan]]] = None) -> "Package":
+        """
+        Builds the record for a Packages.json entry. `shared_days` (id of a day
+        dict -> (dict, DayPlan)) lets a catalog reuse one DayPlan for day dicts
+        shared between packages.
+        """
+        try:
+            duration = int(data.get("duration_days"))
+        except (ValueError, TypeError, OverflowError):
+            duration = None
+
+        day_plans: Tuple[DayPlan, ...] = ()
+        raw_days = data.get("day_plans")
+        if isinstance(raw_days, list) and all(isinstance(day, dict) for day in raw_days):
+            plans = []
+            for day in raw_days:
+                if shared_days is None:
+                    plans.append(DayPlan.from_dict(day))
+                    continue
+                entry = shared_days.get(id(day))
+                if entry is None or entry[0] is not day:
+                    entry = shared_days[id(day)] = (day, DayPlan.from_dict(day))
+                plans.append(entry[1])
+            day_plans = tuple(plans)
+
+        destination, package_type = data.get("destination"), data.get("package_type")
+        package = cls(
+            package_id=data.get("package_id"),
+            package_type=_intern(package_type) if isinstance(package_type, str) else None,
+            destination=_intern(destination) if isinstance(destination, str) else None,
+            duration_days=duration,
+            price=PriceTiers.from_json(data.get("price")),
+            best_season=_intern(data["best_season"]) if isinstance(data.get("best_season"), str) else None,
+            day_plans=day_plans,
+            destination_key=_match_key(destination),
+            type_key=_match_key(package_type),
+        )
+        # Usual shape: nothing to keep verbatim, skip the comparison
+        price = data.get("price")
+        if (len(data) == 7 and type(package_type) is str and type(destination) is str
+                and type(data.get("duration_days")) is int and type(data.get("best_season")) is str
+                and "package_id" in data and type(price) is dict and all(map(_exact_number, price.values()))
+                and len(day_plans) == len(raw_days)
+                and all(day.verbatim is None and not day.absent for day in day_plans)):
+            return package
+        return _keep_differences(package, data)
+
+    def to_dict(self) -> Dict[str, Any]:
+        rebuilt = {
+            "package_id": self.package_id,
+            "package_type": self.package_type,
+            "destination": self.destination,
+            "duration_days": self.duration_days,
+            "price": self.price.to_json(),
+            "best_season": self.best_season,
+            "day_plans": [day.to_dict() for day in self.day_plans],
+        }
+        return _restore(rebuilt, self.verbatim, self.absent)
+
+    def activity_text(self) -> str:
+        """Same text as utils.catalog.package_activity_text(self.to_dict())"""
+        return "".join(day.activity_text() for day in self.day_plans)
@@ -1,5 +1,6 @@
 # conversation prompt
 from graphs.state import AgentState
+from utils.activity_index import preference_activities
 import json
 
 def conversation_prompt(state: AgentState):
@@ -9,6 +10,12 @@ def conversation_prompt(state: AgentState):
     dest = state.get('destination')
     budget = state.get('budget')
     duration = state.get('duration_days')
+    traveler_type = state.get('traveler_type')
+    activities = preference_activities(state)
+    # Older turns, folded by utils.conversation_memory (recent turns follow as messages)
+    summary = state.get('conversation_summary')
+    # Price overview of the matching packages, only set in the `budget` stage
+    budget_hint = state.get('budget_hint')
     
     # Results from other agents (if any)
     search_results = state.get('research_results') or []
@@ -24,6 +31,12 @@ def conversation_prompt(state: AgentState):
     - Destination: {dest or 'None'}
     - Budget: {budget or 'None'}
     - Duration: {duration or 'None'}
+    - Traveler Type: {traveler_type or 'None'}
+    - Activities: {", ".join(activities) if activities else 'None'}
+    - Typical Prices: {budget_hint or 'Not needed yet'}
+
+    Earlier in this conversation (summary):
+    {summary or 'Nothing earlier.'}
 
     Available Packages: {len(search_results)} found.
     Day Plan: {"Available" if day_plan else "Not generated"}.
@@ -41,6 +54,7 @@ def conversation_prompt(state: AgentState):
     - **Classify the Stage**: Based on the user's latest message and the history, determine the most appropriate `current_state`.
     - **Handle Off-Topic**: If the user asks something unrelated (e.g., "What is the capital of France?"), classify as `off_topics` and politely bring them back to travel planning.
     - **Guide the User**: Always prompt for the next missing piece of information based on the current stage.
+    - **Suggest Budgets**: In the `budget` stage, use Typical Prices to suggest a realistic budget, and say so if the user's budget is below what matching packages cost.
     - **Search Results**: If specialist agents have provided results, introduce them warmly.
 
     Output Format:
@@ -37,4 +37,27 @@ def day_planner_prompt(state: AgentState) -> str:
     - Make the activities sound exciting and professional.
     - 'alternatives_available' should be true if there are more options in 'alternative_plans' that haven't been used.
     """
-    return prompt
\ No newline at end of file
+    return prompt
+
+def itinerary_polish_prompt(selected_package: dict, itinerary: list) -> str:
+    prompt = f"""You are a professional travel itinerary writer.
+    Rewrite the wording of this {selected_package.get('destination', '')} itinerary so the activities sound exciting and professional.
+
+    Itinerary:
+    {itinerary}
+
+    Rules:
+    - Keep the same days, in the same order, and the same activities. Do not add or remove anything.
+    - Only rewrite the 'plan' and 'activities_detail' text.
+    - Return ONLY JSON with the structure:
+    {{
+        "itinerary": [
+            {{
+                "day": integer,
+                "plan": "string",
+                "activities_detail": "string"
+            }}
+        ]
+    }}
+    """
+    return prompt
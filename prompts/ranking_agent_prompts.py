@@ -1,13 +1,13 @@
 from graphs.state import AgentState
+from utils.prompt_packages import merge_candidates, serialize_packages, RANKING_FIELDS
 
 def ranking_agent_prompt(state:AgentState) -> str:
+    candidates = merge_candidates(state.get('research_results'), state.get('packages'))
+    packages = serialize_packages(candidates, RANKING_FIELDS, state)
     prompt = f"""Rank these travel packages based on the research results.
     
-    Research results:
-    {state.get('research_results', 'No research results available')}
-    
-    Available Packages:
-    {state.get('packages', [])}
+    Candidate Packages (research results first, one per line; "match" is the matcher score):
+    {packages.text if candidates else 'No research results available'}
     
     Provide your response in JSON format with the following structure:
     {{
@@ -1,4 +1,6 @@
 from graphs.state import AgentState
+from utils.activity_index import preference_activities
+from utils.prompt_packages import serialize_packages, RESEARCHER_FIELDS
 
 # system prompt for researcher agent
 def researcher_prompt(state: AgentState):
@@ -7,8 +9,9 @@ def researcher_prompt(state: AgentState):
     dest = state.get('destination', 'any')
     dur = state.get('duration_days') or state.get('duration', 'any')
     bud = state.get('budget', 'any')
-    act = state.get('activity', [])
+    act = preference_activities(state)
     trav_type = state.get('traveler_type', 'any')
+    packages = serialize_packages(state.get('package', []), RESEARCHER_FIELDS, state)
 
     return f"""
     You are a professional travel researcher agent. Your task is to filter available travel packages based on the user's specific preferences.
@@ -34,18 +37,18 @@ def researcher_prompt(state: AgentState):
     - Duration: {dur}
     - Traveler Type: {trav_type}
 
-    Available Packages (Most Similar):
-    {state.get('package', [])}
+    Available Packages (Most Similar, one per line; "match" is the matcher score):
+    {packages.text}
     
     Instructions:
     1. Prioritize matching the **Destination** and **Package Type**.
     2. If an exact destination match is not found, evaluate if the "similar" packages provided are good alternatives.
     3. Further filter or highlight packages that align with the **Budget**, **Duration**, and **Traveler Type**.
     4. If activities are specified, look for packages that include those activities in their day plans.
-    5. Return the final filtered list of packages in a structured JSON format.
+    5. Return the final filtered list of packages in a structured JSON format, best first.
 
     Output Format:
-    Return ONLY a JSON list of package dictionaries. No extra text.
+    Return ONLY a JSON list of objects with the selected packages' ids, e.g. [{{"package_id": "PKG01"}}]. No extra text.
     """.strip()
 
 
@@ -0,0 +1,52 @@
+import json
+import time
+import unittest
+from unittest import mock
+
+from agents import day_planner_agent as day_planner_module
+from agents.day_planner_agent import day_planner_agent
+from utils import itinerary
+
+
+class _PolishingModel:
+    def invoke(self, prompt):
+        days = prompt.count("'day':")
+        polished = [{"day": i + 1, "plan": "Polished", "activities_detail": ""} for i in range(days)]
+        return mock.Mock(content=json.dumps({"itinerary": polished}))
+
+
+def _package(plan: str) -> dict:
+    return {"package_id": "PKG01", "destination": "Goa",
+            "day_plans": [{"day": 1, "primary_plan": plan, "alternative_plans": []}]}
+
+
+def _plan(package: dict) -> list:
+    return day_planner_agent({"messages": [], "selected_package": package, "polish_itinerary": True})["day_plan"]
+
+
+def _wait_for_polish():
+    deadline = time.monotonic() + 5
+    while itinerary._pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+class PolishKeyTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(day_planner_module, "get_llm", return_value=_PolishingModel())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(itinerary._polished.clear)
+
+    def test_polish_of_old_content_is_not_served(self):
+        self.assertEqual(_plan(_package("Beach day"))[0]["plan"], "Beach day")
+        _wait_for_polish()
+        self.assertEqual(_plan(_package("Beach day"))[0]["plan"], "Polished")
+
+        # Same package id, updated day_plans: render the new content, polish it anew
+        self.assertEqual(_plan(_package("Fort visit"))[0]["plan"], "Fort visit")
+        _wait_for_polish()
+        self.assertEqual(_plan(_package("Fort visit"))[0]["plan"], "Polished")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+
+from agents.ranking_agent import _apply_llm_ranking
+from models import ConversationReply, RankingReply, ResearchReply
+from utils.json_extract import JSONExtractionError, extract_json
+
+
+class ReplySchemaTest(unittest.TestCase):
+    def test_empty_object_is_rejected(self):
+        for schema in (ConversationReply, RankingReply, ResearchReply):
+            with self.assertRaises(JSONExtractionError):
+                extract_json("{}", schema)
+
+    def test_items_without_package_id_are_rejected(self):
+        with self.assertRaises(JSONExtractionError):
+            extract_json('{"ranked_packages": [{"score": 90}]}', RankingReply)
+        with self.assertRaises(JSONExtractionError):
+            extract_json('[{"destination": "Goa"}]', ResearchReply)
+
+    def test_valid_replies_are_returned_unchanged(self):
+        self.assertEqual(extract_json('Sure! {"message": "Hi"}', ConversationReply), {"message": "Hi"})
+        picks = [{"package_id": "PKG01", "destination": "Goa"}, "PKG02"]
+        self.assertEqual(extract_json('[{"package_id": "PKG01", "destination": "Goa"}, "PKG02"]', ResearchReply), picks)
+
+    def test_ranking_takes_its_fallback_on_an_empty_object(self):
+        state = {"messages": []}
+        _apply_llm_ranking(state, "{}", [])
+        self.assertEqual(state["ranked_packages"], [])
+        self.assertEqual(state["messages"][-1].content, "Error ranking packages.")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+"""
+Replies that agents parse as data are served from the response cache.
+
+Run with: python -m unittest discover tests
+"""
+import copy
+import json
+import os
+import unittest
+from unittest import mock
+
+import langchain_groq
+from langchain_core.language_models import FakeListChatModel
+
+from agents.ranking_agent import ranking_agent
+from utils import llm, llm_cache
+
+RANKING_REPLY = json.dumps({
+    "ranked_packages": [{"package_id": "PKG02", "score": 80, "reasoning": "Closer match."},
+                        {"package_id": "PKG01", "score": 78, "reasoning": "Also fits."}],
+    "top_recommendations": [{"package_id": "PKG02", "explanation": "Best fit."}],
+})
+
+
+def _package(package_id: str) -> dict:
+    return {"package_id": package_id, "package_type": "beach", "destination": "Goa", "duration_days": 3,
+            "price": {"solo": 20000, "couple": 36000}, "best_season": "Winter",
+            "day_plans": [{"day": 1, "primary_plan": "Beach day", "alternative_plans": []}]}
+
+
+class RankingCacheTest(unittest.TestCase):
+    def setUp(self):
+        env = {"GROQ_API_KEY": "test", "LLM_CACHE_PATH": "", "LLM_CACHE_DISABLED": ""}
+        patcher = mock.patch.dict(os.environ, env)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.models = []
+        patcher = mock.patch.object(langchain_groq, "ChatGroq", self._fake_groq)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        llm.reset_clients()
+        llm_cache._cache = None
+        self.addCleanup(llm.reset_clients)
+        self.addCleanup(setattr, llm_cache, "_cache", None)
+
+    def _fake_groq(self, **params):
+        model = FakeListChatModel(responses=[RANKING_REPLY], cache=params["cache"])
+        self.models.append(model)
+        return model
+
+    def test_repeated_ranking_prompt_is_a_cache_hit(self):
+        # Two equally scored candidates: a close call, so the LLM ranks them
+        state = {"messages": [], "destination": "Goa", "package_type": "beach",
+                 "research_results": [_package("PKG01"), _package("PKG02")]}
+        first = ranking_agent(copy.deepcopy(state))
+        second = ranking_agent(copy.deepcopy(state))
+
+        stats = llm_cache.get_llm_cache().stats()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["memory_hits"], 1)
+        self.assertEqual(first["ranked_packages"], second["ranked_packages"])
+        self.assertEqual(second["selected_package"]["package_id"], "PKG02")
+
+
+if __name__ == "__main__":
+    unittest.main()
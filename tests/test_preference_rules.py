@@ -0,0 +1,47 @@
+import unittest
+
+from utils.preference_rules import extract_preferences_rules
+
+DESTINATIONS = ["Goa", "Manali", "Jaipur"]
+
+
+def extract(message: str):
+    return extract_preferences_rules(message, DESTINATIONS)
+
+
+class ActivityTest(unittest.TestCase):
+    def test_scuba_diving_is_one_activity(self):
+        prefs = extract("I want to go scuba diving and parasailing in Goa")
+        self.assertIsNotNone(prefs)
+        self.assertEqual(prefs.destination, "Goa")
+        self.assertEqual(sorted(prefs.activities), ["parasailing", "scuba diving"])
+
+    def test_spelling_variants_still_map(self):
+        prefs = extract("scuba and snorkelling")
+        self.assertEqual(sorted(prefs.activities), ["scuba diving", "snorkeling"])
+
+
+class TravelerTypeTest(unittest.TestCase):
+    def test_family_sizes(self):
+        self.assertEqual(extract("family of 4").traveler_type, "family_4")
+        self.assertEqual(extract("family of 1").traveler_type, "solo")
+        self.assertEqual(extract("family of 7").traveler_type, "group")
+
+    def test_zero_travelers_falls_back(self):
+        self.assertIsNone(extract("family of 0"))
+        self.assertIsNone(extract("0 people to Goa"))
+
+
+class DurationTest(unittest.TestCase):
+    def test_plausible_durations(self):
+        self.assertEqual(extract("7 days").duration_days, 7)
+        self.assertEqual(extract("2 weeks in Manali").duration_days, 14)
+
+    def test_implausible_durations_fall_back(self):
+        self.assertIsNone(extract("100 days"))
+        self.assertIsNone(extract("0 days in Goa"))
+        self.assertIsNone(extract("8 weeks"))
+
+
+if __name__ == "__main__":
+    unittest.main()
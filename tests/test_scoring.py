@@ -0,0 +1,29 @@
+import json
+import unittest
+
+from utils import scoring
+from utils.catalog import DEFAULT_PACKAGE_FILE
+from utils.scoring import ScoringEngine
+
+
+class ActivityPointsCacheTest(unittest.TestCase):
+    def setUp(self):
+        with open(DEFAULT_PACKAGE_FILE, "r", encoding="utf-8") as f:
+            self.engine = ScoringEngine(json.load(f))
+
+    def test_cache_is_bounded(self):
+        for i in range(scoring.ACTIVITY_POINTS_CACHE_SIZE + 50):
+            self.engine.top_k({"activities": [f"activity {i}"]}, 5)
+        self.assertEqual(len(self.engine._activity_points), scoring.ACTIVITY_POINTS_CACHE_SIZE)
+
+    def test_evicted_activity_scores_the_same(self):
+        preferences = {"destination": "Goa", "activities": ["water sports"]}
+        first = self.engine.top_k(preferences, 5)
+        for i in range(scoring.ACTIVITY_POINTS_CACHE_SIZE):
+            self.engine.top_k({"activities": [f"activity {i}"]}, 5)
+        self.assertNotIn("water sports", self.engine._activity_points)
+        self.assertEqual(self.engine.top_k(preferences, 5), first)
+
+
+if __name__ == "__main__":
+    unittest.main()
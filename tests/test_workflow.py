@@ -0,0 +1,55 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from agents import ranking_agent as ranking_module
+from agents.day_planner_agent import day_planner_agent
+from agents.ranking_agent import ranking_agent
+from graphs.workflow import DEFAULT_NODES, run_workflow
+
+
+async def _no_results(state):
+    return {"research_results": []}
+
+
+async def _no_update(state):
+    return {}
+
+
+def _nodes(**agents):
+    return tuple(node._replace(agent=agents.get(node.name, node.agent)) for node in DEFAULT_NODES)
+
+
+class NoResearchResultsTest(unittest.TestCase):
+    """A turn whose research finds nothing: nothing to rank, nothing to plan"""
+
+    def test_ranking_and_planning_are_skipped(self):
+        ranking = mock.AsyncMock(return_value={})
+        day_planner = mock.AsyncMock(return_value={})
+        nodes = _nodes(info_collector=_no_update, researcher=_no_results, conversation=_no_update,
+                       ranking=ranking, day_planner=day_planner)
+
+        state = asyncio.run(run_workflow({"messages": []}, nodes))
+
+        ranking.assert_not_awaited()
+        day_planner.assert_not_awaited()
+        self.assertEqual(state["research_results"], [])
+        self.assertEqual(state["messages"], [])
+
+    def test_real_agents_make_no_llm_call_and_no_empty_itinerary(self):
+        nodes = _nodes(info_collector=_no_update, researcher=_no_results, conversation=_no_update)
+        with mock.patch.object(ranking_module, "get_llm", side_effect=AssertionError("LLM called")):
+            state = asyncio.run(run_workflow({"messages": []}, nodes))
+        self.assertNotIn("ranked_packages", state)
+        self.assertNotIn("day_plan", state)
+        self.assertEqual(state["messages"], [])
+
+    def test_agents_called_directly_return_early(self):
+        with mock.patch.object(ranking_module, "get_llm", side_effect=AssertionError("LLM called")):
+            self.assertEqual(ranking_agent({"messages": [], "research_results": []}),
+                             {"messages": [], "research_results": []})
+        self.assertEqual(day_planner_agent({"messages": []}), {"messages": []})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+import re
+import threading
+from bisect import insort
+from collections import OrderedDict
+from typing import List, Dict, Any, Hashable, Iterable, FrozenSet, Optional, Set
+
+_WORD_RE = re.compile(r'\w+')
+
+# Number of phrase -> posting list entries kept per index
+PHRASE_CACHE_SIZE = 4096
+
+
+def preference_activities(preferences: Dict[str, Any]) -> List[str]:
+    """
+    Returns the requested activities, lowercased and de-duplicated.
+
+    The matcher historically read `activity` while the info collector writes
+    `activities`, so both keys are accepted.
+    """
+    activities: List[str] = []
+    seen = set()
+    for key in ('activity', 'activities'):
+        values = preferences.get(key) or []
+        if isinstance(values, str):
+            values = [values]
+        for act in values:
+            act = str(act).lower()
+            if act not in seen:
+                seen.add(act)
+                activities.append(act)
+    return activities
+
+
+def update_postings(postings: Dict[Hashable, List[int]], dropped: Dict[Hashable, Set[int]],
+                    inserted: Dict[Hashable, List[int]], remap: Optional[List[int]] = None) -> Dict[Hashable, List[int]]:
+    """
+    A copy of key -> sorted positions with `dropped` (old positions per key)
+    taken out and `inserted` (new positions per key) added. `remap` maps old
+    positions to new ones when packages were removed; without it positions did
+    not move, and only the lists of the touched keys are copied. Keys are left
+    in order of their first position and empty ones are dropped, as a fresh
+    build would have them.
+    """
+    if remap is None:
+        result = dict(postings)
+        for key in dropped.keys() | inserted.keys():
+            gone = dropped.get(key, ())
+            result[key] = [pos for pos in result.get(key, ()) if pos not in gone]
+    else:
+        result = {}
+        for key, positions in postings.items():
+            gone = dropped.get(key, ())
+            result[key] = [remap[pos] for pos in positions if pos not in gone]
+    for key, positions in inserted.items():
+        target = result.setdefault(key, [])
+        for pos in positions:
+            insort(target, pos)
+    return dict(sorted(((key, positions) for key, positions in result.items() if positions),
+                       key=lambda item: item[1][0]))
+
+
+class ActivityIndex:
+    """
+    Word-level inverted index over each package's activity text.
+
+    A phrase is looked up by intersecting the posting lists of its words
+    (the first word may be a suffix of a catalog word, the last one a prefix,
+    a lone word any infix) and the surviving packages are verified with a
+    substring test. Results are identical to `phrase in text`, and each
+    phrase's posting list is cached, so repeated activities are a dict lookup.
+    """
+
+    def __init__(self, texts: Iterable[str]):
+        self.texts: List[str] = list(texts)
+        self.postings: Dict[str, List[int]] = {}
+        for pos, text in enumerate(self.texts):
+            for word in set(_WORD_RE.findall(text)):
+                self.postings.setdefault(word, []).append(pos)
+        self._phrase_cache: "OrderedDict[str, FrozenSet[int]]" = OrderedDict()
+        # Lookups run from several threads; guards the LRU bookkeeping
+        self._cache_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def updated(self, texts: List[str], dropped: Iterable[int], fresh: Iterable[int],
+                remap: Optional[List[int]] = None) -> "ActivityIndex":
+        """
+        The index over `texts` (a changed catalog's) derived from this one:
+        `dropped` are old positions whose text is gone (removed or replaced),
+        `fresh` the new positions whose text is new, `remap` as in update_postings.
+        """
+        dropped_words: Dict[str, Set[int]] = {}
+        for pos in dropped:
+            for word in set(_WORD_RE.findall(self.texts[pos])):
+                dropped_words.setdefault(word, set()).add(pos)
+        inserted_words: Dict[str, List[int]] = {}
+        for pos in fresh:
+            for word in set(_WORD_RE.findall(texts[pos])):
+                inserted_words.setdefault(word, []).append(pos)
+
+        index = ActivityIndex.__new__(ActivityIndex)
+        index.texts = texts
+        index.postings = update_postings(self.postings, dropped_words, inserted_words, remap)
+        index._phrase_cache = OrderedDict()
+        index._cache_lock = threading.Lock()
+        return index
+
+    def _word_candidates(self, test) -> set:
+        result = set()
+        for word, positions in self.postings.items():
+            if test(word):
+                result.update(positions)
+        return result
+
+    def _candidates(self, phrase: str) -> Iterable[int]:
+        words = _WORD_RE.findall(phrase)
+        if not words:
+            # Only punctuation/whitespace: nothing to narrow on
+            return range(len(self.texts))
+        if len(words) == 1:
+            return self._word_candidates(lambda w: words[0] in w)
+
+        first, middle, last = words[0], words[1:-1], words[-1]
+        candidates = self._word_candidates(lambda w: w.endswith(first))
+        for word in middle:
+            candidates.intersection_update(self.postings.get(word, []))
+            if not candidates:
+                return candidates
+        candidates.intersection_update(self._word_candidates(lambda w: w.startswith(last)))
+        return candidates
+
+    def lookup(self, phrase: str) -> FrozenSet[int]:
+        """Positions of the packages whose activity text contains `phrase`"""
+        phrase = str(phrase).lower()
+        with self._cache_lock:
+            cached = self._phrase_cache.get(phrase)
+            if cached is not None:
+                self._phrase_cache.move_to_end(phrase)
+                return cached
+
+        result = frozenset(pos for pos in self._candidates(phrase) if phrase in self.texts[pos])
+        with self._cache_lock:
+            self._phrase_cache[phrase] = result
+            if len(self._phrase_cache) > PHRASE_CACHE_SIZE:
+                self._phrase_cache.popitem(last=False)
+        return result
+
+    def match_counts(self, activities: Iterable[str]) -> Dict[int, int]:
+        """Maps package position -> number of requested activities it contains"""
+        counts: Dict[int, int] = {}
+        for act in activities:
+            for pos in self.lookup(act):
+                counts[pos] = counts.get(pos, 0) + 1
+        return counts
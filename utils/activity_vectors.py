@@ -0,0 +1,533 @@
+"""
+Semantic activity matching on CPU: a hashing vectorizer (word, word-pair and
+character 4-gram features) and a precomputed sparse matrix over the distinct
+plans (primary and alternative) of a catalog's day plans.
+
+An activity's similarity to a package is its best cosine similarity to one of
+the package's plans; related terms ("trek" for "trekking") are compared too,
+at RELATED_WEIGHT. The matrix is stored by feature (CSC layout: features /
+feature_indptr / plans / weights), so scoring all plans only reads the
+entries of the query's own features, then takes a per-package max. The vectorizer is
+stateless, so every matcher path scores a phrase the same way without a shared
+fitted model; the matrix is what is expensive to build on a big catalog, and
+it is saved next to the catalog file so workers load it instead.
+
+Setting ACTIVITY_EMBEDDING_MODEL to a sentence-transformers model name (e.g.
+"all-MiniLM-L6-v2", run locally) uses dense embeddings instead of the hashed
+features, when that package is installed.
+
+Usage: python -m utils.activity_vectors [CATALOG.json|CATALOG.pcat]
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Dict, Any, Callable, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 2
+
+# Hashed feature space; collisions are rare at this size for day plan texts
+N_FEATURES = 1 << 18
+
+# Smallest similarity (0-1) that counts as a (partial) activity match
+ACTIVITY_SIMILARITY_THRESHOLD = float(os.getenv("ACTIVITY_SIMILARITY_THRESHOLD", "0.4"))
+
+# Optional local embedding model (sentence-transformers); empty uses hashing
+ACTIVITY_EMBEDDING_MODEL = os.getenv("ACTIVITY_EMBEDDING_MODEL", "")
+
+# Activities whose semantic hits are kept per matrix
+ACTIVITY_CACHE_SIZE = 256
+
+# Feature weights: whole words, adjacent word pairs, character 4-grams (per word, in total)
+WORD_WEIGHT = 1.0
+PAIR_WEIGHT = 0.5
+CHAR_WEIGHT = 1.0
+
+# Words that say nothing about the activity itself
+STOP_WORDS = {
+    "a", "an", "and", "the", "at", "of", "to", "in", "on", "with", "via", "for", "by",
+    "visit", "visits", "tour", "tours", "day", "days", "arrival", "departure", "local",
+    "session", "time", "activities", "activity",
+}
+
+# Related terms compared alongside an activity, their similarity scaled by
+# RELATED_WEIGHT; keys are the activities the info collector extracts
+RELATED_WEIGHT = 0.8
+ACTIVITY_RELATED: Dict[str, List[str]] = {
+    "snorkeling": ["reef", "coral", "scuba diving", "glass boat", "island hopping"],
+    "scuba diving": ["snorkeling", "reef", "coral", "underwater"],
+    "water sports": ["kayaking", "surfing", "jet skiing", "parasailing", "snorkeling", "banana boat"],
+    "beach activities": ["beach hopping", "beach walk", "water sports", "sea bath"],
+    "trekking": ["trek", "hiking", "nature walk", "camping"],
+    "hiking": ["trek", "trekking", "nature walk"],
+    "camping": ["tent", "bonfire", "trek"],
+    "rafting": ["river rafting", "kayaking"],
+    "kayaking": ["canoe", "boating", "rafting"],
+    "boating": ["boat ride", "cruise", "houseboat", "coracle", "shikara", "kayaking"],
+    "paragliding": ["bungee jumping", "adventure sports"],
+    "adventure sports": ["rafting", "bungee jumping", "paragliding", "cliff jumping", "skiing", "zipline"],
+    "temple visits": ["temple", "darshan", "aarti", "monastery"],
+    "cultural tours": ["cultural show", "heritage walk", "museum", "village", "palace"],
+    "heritage walks": ["heritage walk", "fort", "palace", "monument"],
+    "wildlife safari": ["safari", "national park", "zoo", "wildlife sanctuary"],
+    "bird watching": ["birding", "bird sanctuary", "nature walk"],
+    "photography": ["photo point", "sunrise", "sunset", "viewpoint"],
+    "shopping": ["market", "bazaar", "mall"],
+    "spa": ["massage", "ayurveda", "wellness", "yoga"],
+    "food tours": ["cafe", "street food", "local cuisine", "market"],
+    "nightlife": ["pub", "club", "bar", "party"],
+    "cycling": ["bike", "bicycle"],
+    "sightseeing": ["city tour", "viewpoint", "palace", "fort"],
+}
+
+_WORD_RE = re.compile(r'[^\W_]+')
+
+
+def _hash(feature: str) -> int:
+    return zlib.crc32(feature.encode("utf-8")) & (N_FEATURES - 1)
+
+
+def _raw_features(text: str) -> Dict[int, float]:
+    features: Dict[int, float] = {}
+    words = [word for word in _WORD_RE.findall(text.lower()) if word not in STOP_WORDS]
+    for word in words:
+        key = _hash("w:" + word)
+        features[key] = features.get(key, 0.0) + WORD_WEIGHT
+        padded = "<" + word + ">"
+        grams = [padded[i:i + 4] for i in range(max(1, len(padded) - 3))]
+        weight = CHAR_WEIGHT / math.sqrt(len(grams))
+        for gram in grams:
+            key = _hash("c:" + gram)
+            features[key] = features.get(key, 0.0) + weight
+    for first, second in zip(words, words[1:]):
+        key = _hash("p:" + first + " " + second)
+        features[key] = features.get(key, 0.0) + PAIR_WEIGHT
+    return features
+
+
+def _normalized(features: Dict[int, float]) -> Tuple[np.ndarray, np.ndarray]:
+    """Sorted (indices, values) with unit L2 norm; empty when there is nothing to compare"""
+    if not features:
+        return np.zeros(0, dtype=np.int32), np.zeros(0)
+    indices = np.fromiter(sorted(features), dtype=np.int32, count=len(features))
+    values = np.array([features[i] for i in indices.tolist()])
+    norm = np.sqrt(np.dot(values, values))
+    return indices, values / norm
+
+
+@lru_cache(maxsize=65536)
+def text_vector(text: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Sparse unit vector of a day plan text"""
+    return _normalized(_raw_features(text))
+
+
+def activity_queries(activity: str) -> List[Tuple[float, str]]:
+    """(weight, text) compared against the plans for an activity: itself, then its related terms"""
+    activity = activity.lower().strip()
+    return [(1.0, activity)] + [(RELATED_WEIGHT, term) for term in ACTIVITY_RELATED.get(activity, ())]
+
+
+def _quantize(scores):
+    # Every path rounds the same way, so sums in a different order can't
+    # move a score across the threshold
+    return np.round(scores, 6)
+
+
+class _EmbeddingModel:
+    """Dense, normalized sentence embeddings from a local sentence-transformers model"""
+
+    def __init__(self, name: str):
+        from sentence_transformers import SentenceTransformer
+        self.name = name
+        self.model = SentenceTransformer(name, device="cpu")
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        return np.asarray(self.model.encode(list(texts), normalize_embeddings=True), dtype=np.float64)
+
+
+_embedding_model: Optional[_EmbeddingModel] = None
+_embedding_checked = False
+_embedding_lock = threading.Lock()
+
+
+def get_embedding_model() -> Optional[_EmbeddingModel]:
+    """The ACTIVITY_EMBEDDING_MODEL model, or None to use hashed features"""
+    global _embedding_model, _embedding_checked
+    if not _embedding_checked:
+        with _embedding_lock:
+            if not _embedding_checked:
+                if ACTIVITY_EMBEDDING_MODEL:
+                    try:
+                        _embedding_model = _EmbeddingModel(ACTIVITY_EMBEDDING_MODEL)
+                    except Exception as e:
+                        logger.warning(f"Embedding model {ACTIVITY_EMBEDDING_MODEL!r} unavailable, "
+                                       f"using hashed features: {e}")
+                _embedding_checked = True
+    return _embedding_model
+
+
+def vectorizer_name() -> str:
+    """Identifies the vectorizer a saved matrix was built with"""
+    model = get_embedding_model()
+    if model is not None:
+        return f"embedding:{model.name}"
+    return (f"hashing:{N_FEATURES}:{WORD_WEIGHT}:{PAIR_WEIGHT}:{CHAR_WEIGHT}:"
+            f"{zlib.crc32(' '.join(sorted(STOP_WORDS)).encode())}")
+
+
+@lru_cache(maxsize=65536)
+def _embedded(text: str) -> np.ndarray:
+    return get_embedding_model().encode([text])[0]
+
+
+def _cosine(query: str, plan: str) -> float:
+    if get_embedding_model() is not None:
+        return float(np.dot(_embedded(query), _embedded(plan)))
+    q_indices, q_values = text_vector(query)
+    p_indices, p_values = text_vector(plan)
+    if not len(q_indices) or not len(p_indices):
+        return 0.0
+    weights = dict(zip(q_indices.tolist(), q_values.tolist()))
+    contributions = np.array([weights.get(i, 0.0) for i in p_indices.tolist()]) * p_values
+    # reduceat adds in the same order as the matrix does
+    return float(np.add.reduceat(contributions, [0])[0])
+
+
+@lru_cache(maxsize=65536)
+def plan_similarity(activity: str, plan: str) -> float:
+    """Similarity of an activity to one lowercased plan (rounded like the matrix scores)"""
+    return max(float(_quantize(weight * _quantize(_cosine(query, plan)))) for weight, query in activity_queries(activity))
+
+
+def plan_texts(package: Dict[str, Any]) -> List[str]:
+    """Every primary and alternative plan of a package dict, lowercased"""
+    texts = []
+    for day in package.get('day_plans', []):
+        texts.append(day.get('primary_plan', '').lower())
+        texts.extend(a.lower() for a in day.get('alternative_plans', []))
+    return [text for text in texts if text]
+
+
+def activity_similarity(activity: str, package: Dict[str, Any]) -> float:
+    """Best plan similarity of an activity in a package, 0 below ACTIVITY_SIMILARITY_THRESHOLD"""
+    score = max((plan_similarity(activity, text) for text in plan_texts(package)), default=0.0)
+    return score if score >= ACTIVITY_SIMILARITY_THRESHOLD else 0.0
+
+
+class ActivityMatrix:
+    """
+    Plan vectors of a catalog plus which plans each package has.
+
+    - hashed features: CSC columns over the distinct plan texts: for each
+      feature in `features` (sorted), the plans that have it and its weight in
+      them, plans[feature_indptr[k]:feature_indptr[k + 1]] (ascending)
+    - embeddings: a dense (plans x dim) array in `dense`
+    - packages: plan_offsets (n + 1) and plan_refs, like the compiled catalog's days
+
+    `semantic_hits(activity)` returns the packages whose best plan similarity
+    reaches ACTIVITY_SIMILARITY_THRESHOLD, with the similarity.
+    """
+
+    def __init__(self, columns: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]], n_plans: int,
+                 plan_offsets: np.ndarray, plan_refs: np.ndarray, dense: Optional[np.ndarray] = None,
+                 vectorizer: str = ""):
+        if columns is not None:
+            self.features, self.feature_indptr, self.plans, self.weights = columns
+        else:
+            self.features = self.feature_indptr = self.plans = self.weights = None
+        self.dense = dense
+        self._n_plans = len(dense) if dense is not None else int(n_plans)
+        self.plan_offsets = np.asarray(plan_offsets, dtype=np.int64)
+        self.plan_refs = np.asarray(plan_refs, dtype=np.int64)
+        self.vectorizer = vectorizer or vectorizer_name()
+        self._cache: "OrderedDict[str, Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, texts: Sequence[str], plan_offsets: Sequence[int], plan_refs: Sequence[int]) -> "ActivityMatrix":
+        """Vectorizes the distinct plan texts; plan_refs index into `texts`"""
+        model = get_embedding_model()
+        if model is not None:
+            dense = model.encode(texts) if len(texts) else np.zeros((0, 1))
+            return cls(None, 0, plan_offsets, plan_refs, dense=dense)
+        rows = [text_vector(text) for text in texts]
+        indices = np.concatenate([indices for indices, _ in rows]) if rows else np.zeros(0, dtype=np.int32)
+        data = np.concatenate([values for _, values in rows]) if rows else np.zeros(0)
+        plans = np.repeat(np.arange(len(rows), dtype=np.int32), [len(row_indices) for row_indices, _ in rows])
+        # Group by feature; the stable sort keeps each feature's plans ascending
+        order = np.argsort(indices, kind="stable")
+        features, counts = np.unique(indices[order], return_counts=True)
+        feature_indptr = np.zeros(len(features) + 1, dtype=np.int64)
+        np.cumsum(counts, out=feature_indptr[1:])
+        return cls((features.astype(np.int32), feature_indptr, plans[order], data[order]), len(rows),
+                   plan_offsets, plan_refs)
+
+    @classmethod
+    def from_days(cls, package_days: Iterable[Sequence[int]], day_plans: Sequence[Sequence[str]]) -> "ActivityMatrix":
+        """
+        Matrix over packages given as day references into `day_plans`, each
+        day's lowercased plans (see plan_texts); distinct plans are vectorized once.
+        """
+        texts: Dict[str, int] = {}
+        day_refs = [[texts.setdefault(text, len(texts)) for text in plans] for plans in day_plans]
+        offsets, refs = [0], []
+        for days in package_days:
+            for day in days:
+                refs.extend(day_refs[day])
+            offsets.append(len(refs))
+        return cls.build(list(texts), offsets, refs)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Any]) -> "ActivityMatrix":
+        """Matrix over typed packages (models.Package); day records shared between packages are read once"""
+        days: Dict[int, int] = {}
+        day_plans: List[List[str]] = []
+        package_days = []
+        for record in records:
+            refs = []
+            for day in record.day_plans:
+                ref = days.get(id(day))
+                if ref is None:
+                    ref = days[id(day)] = len(day_plans)
+                    day_plans.append(day.plan_texts())
+                refs.append(ref)
+            package_days.append(refs)
+        return cls.from_days(package_days, day_plans)
+
+    def updated(self, sources: Sequence[int], fresh: "ActivityMatrix") -> "ActivityMatrix":
+        """
+        The matrix of a changed catalog: `sources[i]` is the old position of
+        new package i, or -1 for the new and replaced packages, which `fresh`
+        covers in order. Rows are only appended (rows nothing references any
+        more stay until the next full build).
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        is_old = sources >= 0
+        old = np.where(is_old, sources, 0)
+        new = np.cumsum(~is_old) - 1
+        starts = np.where(is_old, self.plan_offsets[old], len(self.plan_refs) + fresh.plan_offsets[new.clip(0)])
+        counts = np.where(is_old, np.diff(self.plan_offsets)[old] if len(self) else 0,
+                          np.diff(fresh.plan_offsets)[new.clip(0)] if len(fresh) else 0)
+        offsets = np.zeros(len(sources) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        refs = np.concatenate([self.plan_refs, fresh.plan_refs + self.n_plans])
+        refs = refs[np.repeat(starts - offsets[:-1], counts) + np.arange(offsets[-1])]
+
+        if self.dense is not None:
+            return ActivityMatrix(None, 0, offsets, refs, dense=np.vstack([self.dense, fresh.dense]) if fresh.n_plans else self.dense,
+                                  vectorizer=self.vectorizer)
+        return ActivityMatrix(self._merged_columns(fresh), self.n_plans + fresh.n_plans, offsets, refs,
+                              vectorizer=self.vectorizer)
+
+    def _merged_columns(self, fresh: "ActivityMatrix") -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """The columns with `fresh`'s plans appended (numbered after ours), in one pass over the entries"""
+        features = np.union1d(self.features, fresh.features).astype(np.int32)
+        old_at = np.searchsorted(features, self.features)
+        fresh_at = np.searchsorted(features, fresh.features)
+        old_counts = np.diff(self.feature_indptr)
+        fresh_counts = np.diff(fresh.feature_indptr)
+        counts = np.zeros(len(features), dtype=np.int64)
+        counts[old_at] += old_counts
+        counts[fresh_at] += fresh_counts
+        feature_indptr = np.zeros(len(features) + 1, dtype=np.int64)
+        np.cumsum(counts, out=feature_indptr[1:])
+        # Each feature's old entries first, then the fresh ones (higher plan numbers)
+        old_shift = feature_indptr[old_at] - self.feature_indptr[:-1]
+        fresh_shift = feature_indptr[fresh_at] + np.bincount(old_at, old_counts, len(features))[fresh_at].astype(np.int64) \
+            - fresh.feature_indptr[:-1]
+        old_dest = np.repeat(old_shift, old_counts) + np.arange(len(self.plans))
+        fresh_dest = np.repeat(fresh_shift, fresh_counts) + np.arange(len(fresh.plans))
+        plans = np.empty(feature_indptr[-1], dtype=np.int32)
+        weights = np.empty(feature_indptr[-1])
+        plans[old_dest], plans[fresh_dest] = self.plans, fresh.plans + self.n_plans
+        weights[old_dest], weights[fresh_dest] = self.weights, fresh.weights
+        return features, feature_indptr, plans, weights
+
+    @property
+    def n_plans(self) -> int:
+        return self._n_plans
+
+    def __len__(self) -> int:
+        return len(self.plan_offsets) - 1
+
+    # Scoring
+
+    def _cosines(self, queries: Sequence[str]) -> np.ndarray:
+        """Cosine similarity of each query text to each distinct plan, shape (n_queries, n_plans)"""
+        m = len(queries)
+        if self.dense is not None:
+            if not m or not self.n_plans:
+                return np.zeros((m, self.n_plans))
+            return np.stack([_embedded(query) for query in queries]) @ self.dense.T
+
+        scores = np.zeros((m, self.n_plans))
+        for row, query in enumerate(queries):
+            q_indices, q_values = text_vector(query)
+            # Only the columns of the query's features: O(their entries), not O(matrix)
+            at = np.searchsorted(self.features, q_indices)
+            found = at < len(self.features)
+            found[found] = self.features[at[found]] == q_indices[found]
+            at, q_values = at[found], q_values[found]
+            starts = self.feature_indptr[at]
+            counts = self.feature_indptr[at + 1] - starts
+            total = int(counts.sum())
+            if not total:
+                continue
+            ends = np.cumsum(counts)
+            entries = np.repeat(starts - (ends - counts), counts) + np.arange(total)
+            # bincount adds each plan's contributions in feature order, as _cosine does
+            scores[row] = np.bincount(self.plans[entries], self.weights[entries] * np.repeat(q_values, counts),
+                                      self.n_plans)
+        return scores
+
+    def plan_scores(self, activity: str) -> np.ndarray:
+        """plan_similarity of an activity to each distinct plan"""
+        queries = activity_queries(activity)
+        weights = np.array([weight for weight, _ in queries])[:, None]
+        scores = _quantize(weights * _quantize(self._cosines([query for _, query in queries])))
+        return scores.max(axis=0) if self.n_plans else np.zeros(0)
+
+    def package_scores(self, activity: str) -> np.ndarray:
+        """Best plan similarity of an activity in each package (0 for packages without plans)"""
+        plan_scores = self.plan_scores(activity)
+        scores = np.zeros(len(self))
+        nonempty = np.flatnonzero(np.diff(self.plan_offsets) > 0)
+        if len(nonempty):
+            scores[nonempty] = np.maximum.reduceat(plan_scores[self.plan_refs], self.plan_offsets[nonempty])
+        return scores
+
+    def semantic_hits(self, activity: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(package positions, similarity) of the packages at or above the threshold, cached per activity"""
+        activity = str(activity).lower()
+        cached = self._cache.get(activity)
+        if cached is not None:
+            return cached
+        scores = self.package_scores(activity)
+        positions = np.flatnonzero(scores >= ACTIVITY_SIMILARITY_THRESHOLD)
+        result = (positions, scores[positions])
+        with self._lock:
+            self._cache[activity] = result
+            if len(self._cache) > ACTIVITY_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return result
+
+    def top_k(self, activity: str, k: int = 10) -> List[Tuple[int, float]]:
+        """The `k` packages most similar to an activity: (position, similarity), best first"""
+        positions, scores = self.semantic_hits(activity)
+        order = np.lexsort((positions, -scores))[:k]
+        return [(int(positions[i]), float(scores[i])) for i in order]
+
+    # Persistence
+
+    def save(self, path: str, source: Optional[Dict[str, Any]] = None) -> None:
+        """Writes the matrix (atomically) with the vectorizer and source it was built from"""
+        meta = {"version": FORMAT_VERSION, "vectorizer": self.vectorizer, "source": source or {}}
+        arrays = {"plan_offsets": self.plan_offsets, "plan_refs": self.plan_refs,
+                  "meta": np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8)}
+        if self.dense is not None:
+            arrays["dense"] = self.dense
+        else:
+            arrays.update(features=self.features, feature_indptr=self.feature_indptr, plans=self.plans,
+                          weights=self.weights, n_plans=np.array(self.n_plans))
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, source: Optional[Dict[str, Any]] = None) -> Optional["ActivityMatrix"]:
+        """The saved matrix, or None when it is missing or was built from something else"""
+        try:
+            with np.load(path) as npz:
+                meta = json.loads(npz["meta"].tobytes().decode("utf-8"))
+                if (meta.get("version") != FORMAT_VERSION or meta.get("vectorizer") != vectorizer_name()
+                        or (source is not None and meta.get("source") != source)):
+                    return None
+                if "dense" in npz:
+                    return cls(None, 0, npz["plan_offsets"], npz["plan_refs"], dense=npz["dense"],
+                               vectorizer=meta["vectorizer"])
+                columns = (npz["features"], npz["feature_indptr"], npz["plans"], npz["weights"])
+                return cls(columns, int(npz["n_plans"]), npz["plan_offsets"], npz["plan_refs"],
+                           vectorizer=meta["vectorizer"])
+        except (OSError, ValueError, KeyError) as e:
+            if not isinstance(e, FileNotFoundError):
+                logger.warning(f"Ignoring activity matrix {path}: {e}")
+            return None
+
+
+def matrix_path(catalog_path: str) -> str:
+    """Where the activity matrix of a catalog file is saved"""
+    return catalog_path + ".activity.npz"
+
+
+def source_fingerprint(catalog_path: str) -> Dict[str, Any]:
+    stat = os.stat(catalog_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def load_or_build(catalog_path: Optional[str], build: Callable[[], ActivityMatrix]) -> ActivityMatrix:
+    """
+    The saved matrix of a catalog file when it is current, else a new one
+    (saved for the next process when the directory is writable).
+    """
+    if catalog_path is None:
+        return build()
+    path = matrix_path(catalog_path)
+    try:
+        source = source_fingerprint(catalog_path)
+    except OSError:
+        return build()
+    matrix = ActivityMatrix.load(path, source)
+    if matrix is not None:
+        return matrix
+    matrix = build()
+    try:
+        matrix.save(path, source)
+    except OSError as e:
+        logger.warning(f"Could not save activity matrix to {path}: {e}")
+    return matrix
+
+
+def activity_points(activities: Iterable[str], literal_index: Any, matrix: ActivityMatrix,
+                    size: int) -> np.ndarray:
+    """
+    Activity points of every package: 15 for a literal hit (as before), else
+    15 x similarity for a semantic one, summed over the activities.
+    """
+    total = np.zeros(size)
+    for act in activities:
+        points = np.zeros(size)
+        positions, scores = matrix.semantic_hits(act)
+        points[positions] = np.round(15 * scores)
+        points[list(literal_index.lookup(act))] = 15.0
+        total += points
+    return total
+
+
+def main():
+    from utils.catalog import DEFAULT_PACKAGE_FILE
+
+    parser = argparse.ArgumentParser(description="Precompute the activity matrix of a catalog file")
+    parser.add_argument("catalog", nargs="?", default=DEFAULT_PACKAGE_FILE)
+    args = parser.parse_args()
+    if args.catalog.endswith(".pcat"):
+        from utils.packed_catalog import PackedCatalog
+        matrix = PackedCatalog.open(args.catalog).activity_matrix
+    else:
+        from utils.catalog import PackageCatalog
+        matrix = PackageCatalog.from_file(args.catalog).activity_matrix
+    print(f"{matrix_path(args.catalog)}: {len(matrix)} packages, {matrix.n_plans} distinct plans ({matrix.vectorizer})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,495 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+from models import DayPlan, Package, _same
+from utils.activity_index import ActivityIndex, preference_activities, update_postings
+from utils.activity_vectors import ActivityMatrix, activity_points, load_or_build
+from utils.fuzzy_match import FuzzyIndex, lookup_destination, lookup_package_type, ranked
+from utils.price_index import PriceIndex, budget_hint
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PACKAGE_FILE = os.path.join(BASE_DIR, "dataset", "Packages.json")
+
+# Destination / package type lookups kept per catalog
+MATCH_CACHE_SIZE = 1024
+
+
+def normalize_text(value: Any) -> str:
+    """Lowercases and strips a catalog/preference value the way the matcher compares it"""
+    return str(value or '').lower().strip()
+
+
+# Price tier each traveler type is priced on. Packages.json only prices solo,
+# couple and family_4, so every family size and groups use family_4.
+PRICE_TIER_POLICY: Dict[str, str] = {
+    'solo': 'solo',
+    'couple': 'couple',
+    'family_2': 'family_4',
+    'family_3': 'family_4',
+    'family_4': 'family_4',
+    'family_5': 'family_4',
+    'group': 'family_4',
+}
+
+
+def resolve_price_key(traveler_type: Any) -> str:
+    """Maps a traveler type onto the price key used in Packages.json (see PRICE_TIER_POLICY)"""
+    traveler_type = str(traveler_type or 'solo').lower()
+    price_key = PRICE_TIER_POLICY.get(traveler_type)
+    if price_key is not None:
+        return price_key
+    # Free-form types, e.g. "young couple" or "family of 3"
+    if 'couple' in traveler_type:
+        return 'couple'
+    elif 'family' in traveler_type or 'group' in traveler_type:
+        return 'family_4'
+    elif 'solo' in traveler_type:
+        return 'solo'
+    return traveler_type
+
+
+def package_activity_text(package: Dict[str, Any]) -> str:
+    """Lowercased text of every primary and alternative plan of a package"""
+    text = ""
+    for day in package.get('day_plans', []):
+        text += " " + day.get('primary_plan', '').lower()
+        text += " " + " ".join([a.lower() for a in day.get('alternative_plans', [])])
+    return text
+
+
+class PackageView(Sequence):
+    """Read-only list of package dicts, each built from its record on access"""
+
+    def __init__(self, records: List[Package]):
+        self._records = records
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [record.to_dict() for record in self._records[index]]
+        return self._records[index].to_dict()
+
+
+class PackageCatalog:
+    """
+    In-memory package catalog with inverted indexes.
+
+    Packages are stored as typed records (models.Package) in `records`;
+    `packages` is a list-like view that builds the JSON-form dict of a package
+    when it is accessed.
+
+    Indexes map a normalized value to the sorted positions of the packages in
+    `records`, so candidate lookups keep the catalog order the matcher relies on:
+    - by_id: package_id -> position
+    - by_destination: destination -> positions
+    - by_type: package_type -> positions
+    - by_duration: duration_days -> positions
+    - price_index: per price key, positions sorted by price (utils.price_index)
+    - activity_index: words of the day plans -> positions
+    - activity_matrix: day plan vectors for semantic activity matching
+      (utils.activity_vectors), built or loaded on first use
+    - destination_index / type_index: trigrams of the by_destination / by_type
+      keys, for fuzzy matching (utils.fuzzy_match), built on first use
+
+    A catalog is not modified once built; `updated` derives a changed copy
+    that shares whatever the changes don't touch.
+    """
+
+    def __init__(self, packages: Iterable[Dict[str, Any]]):
+        # Day dicts shared between packages become one shared DayPlan
+        shared_days: Dict[int, Tuple[Any, DayPlan]] = {}
+        self.records: List[Package] = [Package.from_dict(pkg, shared_days) for pkg in packages]
+        self.packages = PackageView(self.records)
+        self.by_destination: Dict[str, List[int]] = {}
+        self.by_type: Dict[str, List[int]] = {}
+        self.by_duration: Dict[int, List[int]] = {}
+        self.price_keys: set = set()
+        self.by_id: Dict[Any, int] = {}
+        # Normalized destination -> destination as written in the catalog
+        self.destination_names: Dict[str, str] = {}
+        self._build_indexes()
+        self.price_index = PriceIndex(self._price_column, self.price_keys)
+        self.activity_index = ActivityIndex(self._activity_texts())
+        # File the catalog was loaded from; its activity matrix is saved next to it
+        self.path: Optional[str] = None
+        self._activity_matrix: Optional[ActivityMatrix] = None
+        self._matrix_lock = threading.Lock()
+        self._destination_index: Optional[FuzzyIndex] = None
+        self._type_index: Optional[FuzzyIndex] = None
+        self._match_cache: "OrderedDict[Tuple[str, str], Dict[str, float]]" = OrderedDict()
+        # The catalog is shared by every request thread; guards the LRU bookkeeping
+        self._match_lock = threading.Lock()
+        # Identifies the content for caches; set by utils.catalog_manager when published
+        self.version = 0
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_PACKAGE_FILE) -> "PackageCatalog":
+        with open(path, 'r') as f:
+            catalog = cls(json.load(f))
+        catalog.path = path
+        return catalog
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.packages)
+
+    def _build_indexes(self):
+        for pos, record in enumerate(self.records):
+            self.by_id.setdefault(record.package_id, pos)
+            destination = record.destination_key
+            self.by_destination.setdefault(destination, []).append(pos)
+            if destination:
+                self.destination_names.setdefault(destination, _destination_name(record))
+            self.by_type.setdefault(record.type_key, []).append(pos)
+
+            if record.duration_days is not None:
+                self.by_duration.setdefault(record.duration_days, []).append(pos)
+
+            self.price_keys.update(_price_keys(record))
+
+    def _price_column(self, price_key: str) -> List[Optional[float]]:
+        """The price each package is matched on for a resolved price key"""
+        return [record.price.get(price_key) for record in self.records]
+
+    def _activity_texts(self) -> Iterator[str]:
+        """package_activity_text of every package, computed once per shared day"""
+        day_texts: Dict[int, str] = {}
+        for record in self.records:
+            parts = []
+            for day in record.day_plans:
+                text = day_texts.get(id(day))
+                if text is None:
+                    text = day_texts[id(day)] = day.activity_text()
+                parts.append(text)
+            yield "".join(parts)
+
+    @property
+    def activity_matrix(self) -> ActivityMatrix:
+        """Semantic activity matrix, loaded from next to the catalog file or built on first use"""
+        if self._activity_matrix is None:
+            with self._matrix_lock:
+                if self._activity_matrix is None:
+                    self._activity_matrix = load_or_build(
+                        self.path, lambda: ActivityMatrix.from_records(self.records))
+        return self._activity_matrix
+
+    def activity_points(self, activities: List[str]) -> Dict[int, float]:
+        """Activity points of the packages that have any: 15 per literal match, else 15 x similarity"""
+        if not activities:
+            return {}
+        points = activity_points(activities, self.activity_index, self.activity_matrix, len(self))
+        positions = np.flatnonzero(points)
+        return dict(zip(positions.tolist(), points[positions].tolist()))
+
+    def get(self, package_id: Any) -> Optional[Dict[str, Any]]:
+        """The package with this package_id, if any (a fresh dict)"""
+        pos = self.by_id.get(package_id)
+        return self.records[pos].to_dict() if pos is not None else None
+
+    # Incremental updates
+
+    def updated(self, changes: Dict[Any, Optional[Dict[str, Any]]]) -> "PackageCatalog":
+        """
+        A new catalog with `changes` (package_id -> package dict, or None to
+        remove it) applied; this one stays as it is for whoever still reads it.
+        Known packages are replaced in place and new ones appended in the order
+        given, so the result equals a catalog built from the changed list.
+        Records and index entries of unchanged packages are reused; without
+        removals no position moves and only the touched postings are copied.
+        Returns this catalog when nothing changes.
+        """
+        # 1. Positions removed, replaced (in place) and packages appended
+        removed, replaced, appended = set(), {}, []
+        shared_days: Dict[int, Tuple[Any, DayPlan]] = {}
+        for package_id, package in changes.items():
+            pos = self.by_id.get(package_id)
+            if package is None:
+                if pos is not None:
+                    removed.add(pos)
+                continue
+            if package.get('package_id') != package_id:
+                raise ValueError(f"Update for {package_id!r} carries package_id {package.get('package_id')!r}")
+            if pos is None:
+                appended.append(Package.from_dict(package, shared_days))
+            elif not _same(self.records[pos].to_dict(), package):
+                replaced[pos] = Package.from_dict(package, shared_days)
+        if not removed and not replaced and not appended:
+            return self
+
+        # 2. Records in their new order; remap is old -> new position when some moved
+        records = list(self.records)
+        texts = list(self.activity_index.texts)
+        for pos, record in replaced.items():
+            records[pos] = record
+            texts[pos] = _activity_text(record)
+        remap: Optional[List[int]] = None
+        if removed:
+            remap = [-1] * len(records)
+            kept = [pos for pos in range(len(records)) if pos not in removed]
+            for new, old in enumerate(kept):
+                remap[old] = new
+            records = [records[pos] for pos in kept]
+            texts = [texts[pos] for pos in kept]
+        new_position = remap.__getitem__ if remap is not None else (lambda pos: pos)
+        first_appended = len(records)
+        records.extend(appended)
+        texts.extend(_activity_text(record) for record in appended)
+        appended_positions = range(first_appended, len(records))
+
+        def postings(current: Dict[Any, List[int]], key_of) -> Dict[Any, List[int]]:
+            # (old position, new position, old key, new key); a None key is not indexed
+            moves = [(pos, None, key_of(self.records[pos]), None) for pos in removed]
+            moves += [(pos, new_position(pos), key_of(self.records[pos]), key_of(record))
+                      for pos, record in replaced.items()]
+            moves += [(None, pos, None, key_of(records[pos])) for pos in appended_positions]
+            dropped: Dict[Any, set] = {}
+            inserted: Dict[Any, List[int]] = {}
+            for old_pos, new_pos, old_key, new_key in moves:
+                if old_pos is not None and new_pos is not None and old_key == new_key:
+                    continue   # replaced, still under the same key
+                if old_pos is not None and old_key is not None:
+                    dropped.setdefault(old_key, set()).add(old_pos)
+                if new_pos is not None and new_key is not None:
+                    inserted.setdefault(new_key, []).append(new_pos)
+            return update_postings(current, dropped, inserted, remap)
+
+        catalog = PackageCatalog.__new__(PackageCatalog)
+        catalog.records = records
+        catalog.packages = PackageView(records)
+
+        # 3. Value indexes and names
+        catalog.by_destination = postings(self.by_destination, lambda r: r.destination_key)
+        catalog.by_type = postings(self.by_type, lambda r: r.type_key)
+        catalog.by_duration = postings(self.by_duration, lambda r: r.duration_days)
+        if remap is None and not appended:
+            catalog.by_id = self.by_id
+        else:
+            catalog.by_id = {}
+            for pos, record in enumerate(records):
+                catalog.by_id.setdefault(record.package_id, pos)
+        catalog.destination_names = {key: _destination_name(records[positions[0]])
+                                     for key, positions in catalog.by_destination.items() if key}
+
+        # 4. Prices: built tiers are patched unless positions moved
+        if removed or any(_price_keys(record) != _price_keys(self.records[pos]) for pos, record in replaced.items()):
+            catalog.price_keys = set()
+            for record in records:
+                catalog.price_keys.update(_price_keys(record))
+        else:
+            catalog.price_keys = set(self.price_keys)
+            for record in appended:
+                catalog.price_keys.update(_price_keys(record))
+        if remap is None:
+            catalog.price_index = self.price_index.updated(
+                catalog._price_column, catalog.price_keys, [*replaced, *appended_positions],
+                lambda pos, key: records[pos].price.get(key))
+        else:
+            catalog.price_index = PriceIndex(catalog._price_column, catalog.price_keys)
+
+        # 5. Activities: phrase index entries of changed texts, matrix rows of changed plans
+        changed_texts = [pos for pos, record in replaced.items() if texts[new_position(pos)] != self.activity_index.texts[pos]]
+        catalog.activity_index = self.activity_index.updated(
+            texts, list(removed) + changed_texts, [new_position(pos) for pos in changed_texts] + list(appended_positions),
+            remap)
+        catalog._activity_matrix = None
+        if self._activity_matrix is not None:
+            sources = [pos for pos in range(len(self.records)) if pos not in removed] + [-1] * len(appended)
+            for pos, record in replaced.items():
+                if _plan_texts(record) != _plan_texts(self.records[pos]):
+                    sources[new_position(pos)] = -1
+            if sources == list(range(len(self.records))):
+                catalog._activity_matrix = self._activity_matrix
+            else:
+                fresh = ActivityMatrix.from_records(records[new] for new, old in enumerate(sources) if old < 0)
+                catalog._activity_matrix = self._activity_matrix.updated(sources, fresh)
+        catalog.path = None
+        catalog._matrix_lock = threading.Lock()
+
+        # 6. Fuzzy indexes and their lookups stay valid while the value sets do
+        same_destinations = list(catalog.by_destination) == list(self.by_destination)
+        same_types = list(catalog.by_type) == list(self.by_type)
+        catalog._destination_index = self._destination_index if same_destinations else None
+        catalog._type_index = self._type_index if same_types else None
+        if same_destinations and same_types:
+            catalog._match_cache, catalog._match_lock = self._match_cache, self._match_lock
+        else:
+            catalog._match_cache, catalog._match_lock = OrderedDict(), threading.Lock()
+        catalog.version = self.version
+        return catalog
+
+    # Fuzzy destination / package type matching
+
+    @property
+    def destination_index(self) -> FuzzyIndex:
+        if self._destination_index is None:
+            self._destination_index = FuzzyIndex(self.by_destination)
+        return self._destination_index
+
+    @property
+    def type_index(self) -> FuzzyIndex:
+        if self._type_index is None:
+            self._type_index = FuzzyIndex(self.by_type)
+        return self._type_index
+
+    def _cached_lookup(self, field: str, preference: str) -> Dict[str, float]:
+        key = (field, preference)
+        with self._match_lock:
+            scores = self._match_cache.get(key)
+            if scores is not None:
+                self._match_cache.move_to_end(key)
+                return scores
+        if field == 'destination':
+            scores = lookup_destination(preference, self.destination_index)
+        else:
+            scores = lookup_package_type(preference, self.type_index)
+        with self._match_lock:
+            self._match_cache[key] = scores
+            if len(self._match_cache) > MATCH_CACHE_SIZE:
+                self._match_cache.popitem(last=False)
+        return scores
+
+    def destination_scores(self, destination: str) -> Dict[str, float]:
+        """Normalized destination -> similarity (0-1) to a normalized preference, for those above 0"""
+        return self._cached_lookup('destination', destination)
+
+    def type_scores(self, package_type: str) -> Dict[str, float]:
+        """Normalized package type -> similarity (0-1) to a normalized preference, for those above 0"""
+        return self._cached_lookup('package_type', package_type)
+
+    def match_destination(self, text: str, spans: bool = True) -> List[Tuple[str, float]]:
+        """Catalog destinations (as written) ranked by similarity to free text, best first"""
+        scores = lookup_destination(normalize_text(text), self.destination_index, spans)
+        return [(self.destination_names[key], score) for key, score in ranked(scores)]
+
+    # Candidate lookups
+
+    def _destination_candidates(self, destination: str) -> set:
+        result = set()
+        for dest in self.destination_scores(destination):
+            result.update(self.by_destination[dest])
+        return result
+
+    def _type_candidates(self, package_type: str) -> set:
+        result = set()
+        for ptype in self.type_scores(package_type):
+            result.update(self.by_type[ptype])
+        return result
+
+    def _duration_candidates(self, duration: int) -> set:
+        result = set()
+        for days in range(duration - 2, duration + 3):
+            result.update(self.by_duration.get(days, []))
+        return result
+
+    def _price_candidates(self, price_key: str, budget: float) -> set:
+        """Packages priced within 50% over budget for the traveler's price key"""
+        if budget != budget:
+            return set()   # NaN: no package gets budget points
+        return set(self.price_index.within(price_key, budget * 1.5))
+
+    def candidate_positions(self, preferences: Dict[str, Any]) -> List[int]:
+        """
+        Returns the sorted positions of the packages that can score above zero
+        for the preferences. Every other package would be dropped by the
+        matcher anyway.
+        """
+        positions = set()
+
+        destination = normalize_text(preferences.get('destination'))
+        if destination:
+            positions |= self._destination_candidates(destination)
+
+        package_type = normalize_text(preferences.get('package_type'))
+        if package_type:
+            positions |= self._type_candidates(package_type)
+
+        budget = preferences.get('budget')
+        if budget is not None:
+            try:
+                positions |= self._price_candidates(
+                    resolve_price_key(preferences.get('traveler_type')), float(budget)
+                )
+            except (ValueError, TypeError):
+                pass
+
+        duration = preferences.get('duration_days')
+        if duration is None:
+            duration = preferences.get('duration')
+        if duration is not None:
+            try:
+                positions |= self._duration_candidates(int(duration))
+            except (ValueError, TypeError):
+                pass
+
+        for act in preference_activities(preferences):
+            positions |= self.activity_index.lookup(act)
+            positions.update(self.activity_matrix.semantic_hits(act)[0].tolist())
+
+        return sorted(positions)
+
+    def candidates(self, preferences: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Candidate packages for the preferences, in catalog order"""
+        return [self.packages[pos] for pos in self.candidate_positions(preferences)]
+
+    # Budget suggestions
+
+    def budget_scope(self, preferences: Dict[str, Any]) -> Optional[List[int]]:
+        """
+        Positions of the packages matching the chosen destination and package
+        type, or None (the whole catalog) when neither is chosen yet.
+        """
+        destination = normalize_text(preferences.get('destination'))
+        package_type = normalize_text(preferences.get('package_type'))
+        if not destination and not package_type:
+            return None
+        positions = None
+        if destination:
+            positions = self._destination_candidates(destination)
+        if package_type:
+            types = self._type_candidates(package_type)
+            positions = types if positions is None else positions & types
+        return sorted(positions)
+
+    def cheapest_k(self, preferences: Dict[str, Any], k: int = 3) -> List[Dict[str, Any]]:
+        """The `k` cheapest packages in the budget scope, priced for the traveler type"""
+        price_key = resolve_price_key(preferences.get('traveler_type'))
+        return [self.records[pos].to_dict()
+                for _, pos in self.price_index.cheapest_k(price_key, k, self.budget_scope(preferences))]
+
+    def price_histogram(self, preferences: Dict[str, Any], bins: int = 5) -> List[Tuple[float, float, int]]:
+        """(low, high, count) price ranges of the packages in the budget scope"""
+        price_key = resolve_price_key(preferences.get('traveler_type'))
+        return self.price_index.price_histogram(price_key, bins, self.budget_scope(preferences))
+
+    def budget_hint(self, preferences: Dict[str, Any]) -> str:
+        """What packages in the budget scope cost, as one line for the conversation prompt"""
+        price_key = resolve_price_key(preferences.get('traveler_type'))
+        return budget_hint(self.price_index, price_key, preferences.get('budget'), self.budget_scope(preferences))
+
+
+def _destination_name(record: Package) -> str:
+    """Destination as written in the catalog"""
+    name = record.destination if record.destination is not None else record.to_dict().get('destination')
+    return str(name).strip()
+
+
+def _price_keys(record: Package) -> List[str]:
+    return [key for key, _ in record.price.items()] if record.price.flat is None else []
+
+
+def _activity_text(record: Package) -> str:
+    return "".join(day.activity_text() for day in record.day_plans)
+
+
+def _plan_texts(record: Package) -> List[List[str]]:
+    return [day.plan_texts() for day in record.day_plans]
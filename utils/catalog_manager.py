@@ -0,0 +1,306 @@
+"""
+Hot reloading of the package catalog.
+
+CatalogManager holds the current catalog snapshot (a PackageCatalog, never
+modified once published) and swaps in a new one when:
+- the source file changes: it is diffed against the snapshot by package_id
+  and only added, removed and changed packages are applied
+  (PackageCatalog.updated), unless the package order changed
+- the update feed gets new lines, one JSON object each, applied in order:
+    {"op": "upsert", "package": {...}}
+    {"op": "remove", "package_id": "PKG01"}
+    {"op": "price", "package_id": "PKG01", "price": {"solo": 12000}}
+
+Readers take `snapshot` once per request and keep the catalog they got.
+`version` identifies a snapshot's content: it is derived from the source
+file and the feed lines applied since, so worker processes that applied the
+same updates report the same version (for caches shared between them).
+Publishing a new catalog file should truncate the feed, since the file then
+includes those changes; until it is truncated, the feed is replayed on top
+of the new file, as in a freshly started worker.
+
+Checks run at most every CATALOG_POLL_SECONDS, in a background thread
+started by a read, so no request waits for a reload.
+"""
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
+
+from utils.catalog import DEFAULT_PACKAGE_FILE, PackageCatalog
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks of the source file and the feed; 0 disables them
+CATALOG_POLL_SECONDS = float(os.getenv("CATALOG_POLL_SECONDS", "30"))
+
+# JSON-lines feed of package updates; defaults to the catalog path with .updates.jsonl
+CATALOG_UPDATE_FEED = os.getenv("CATALOG_UPDATE_FEED", "")
+
+
+def _version(*parts: bytes) -> int:
+    """63-bit version number from content identifiers (fits an SQLite INTEGER)"""
+    return int.from_bytes(hashlib.blake2b(b"\0".join(parts), digest_size=8).digest(), "big") >> 1
+
+
+def _fingerprint(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _source_version(source: Tuple[int, int]) -> int:
+    return _version(*(str(part).encode() for part in source))
+
+
+def file_version(path: str) -> int:
+    """Version of a catalog file as written (size and modification time)"""
+    return _source_version(_fingerprint(path))
+
+
+def _fold(op: Dict[str, Any], changes: Dict[Any, Optional[Dict[str, Any]]], catalog: PackageCatalog) -> None:
+    """Adds one feed operation to `changes` (package_id -> package dict or None)"""
+    kind = op.get("op")
+    if kind == "upsert":
+        package = op["package"]
+        if not isinstance(package, dict):
+            raise ValueError("package is not an object")
+        changes[package["package_id"]] = package
+    elif kind == "remove":
+        changes[op["package_id"]] = None
+    elif kind == "price":
+        package_id = op["package_id"]
+        package = changes[package_id] if package_id in changes else catalog.get(package_id)
+        if package is None:
+            raise KeyError(f"unknown package {package_id!r}")
+        package = dict(package)
+        price = op["price"]
+        if isinstance(price, dict) and isinstance(package.get("price"), dict):
+            price = {**package["price"], **price}
+        package["price"] = price
+        changes[package_id] = package
+    else:
+        raise ValueError(f"unknown op {kind!r}")
+
+
+def diff_catalog(current: PackageCatalog, packages: list) -> PackageCatalog:
+    """
+    A catalog of `packages`, derived from `current` when that gives the same
+    package order (kept packages in the same order, new ones at the end),
+    otherwise built from scratch.
+    """
+    ids = [pkg.get("package_id") if isinstance(pkg, dict) else None for pkg in packages]
+    try:
+        unique = len(set(ids)) == len(ids) and len(current.by_id) == len(current)
+    except TypeError:
+        unique = False   # unhashable package_id
+    if unique:
+        known = [package_id for package_id in ids if package_id in current.by_id]
+        present = set(ids)
+        kept = [record.package_id for record in current.records if record.package_id in present]
+        if ids[:len(known)] == known == kept:
+            changes: Dict[Any, Optional[Dict[str, Any]]] = {
+                record.package_id: None for record in current.records if record.package_id not in present
+            }
+            changes.update(zip(ids, packages))
+            return current.updated(changes)
+    return PackageCatalog(packages)
+
+
+class CatalogManager:
+    """Current catalog snapshot of a source file plus its update feed (see the module docstring)"""
+
+    def __init__(self, path: str = DEFAULT_PACKAGE_FILE, feed_path: Optional[str] = None,
+                 poll_seconds: float = CATALOG_POLL_SECONDS):
+        self.path = path
+        # "" disables the feed
+        if feed_path is None:
+            feed_path = CATALOG_UPDATE_FEED or os.path.splitext(path)[0] + ".updates.jsonl"
+        self.feed_path = feed_path
+        self.poll_seconds = poll_seconds
+        self._snapshot: Optional[PackageCatalog] = None
+        self._source: Optional[Tuple[int, int]] = None
+        self._feed_offset = 0
+        self._last_check = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()   # one load / refresh at a time
+        self._check_lock = threading.Lock()   # guards _last_check and _refreshing
+
+    @property
+    def snapshot(self) -> PackageCatalog:
+        """The current catalog; loads it on first use, and starts a background check when one is due"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._load()
+            return self._snapshot
+        self._check_in_background()
+        return snapshot
+
+    @property
+    def version(self) -> int:
+        return self.snapshot.version
+
+    def _publish(self, catalog: PackageCatalog) -> None:
+        # A single reference assignment: readers get either the old or the new snapshot
+        self._snapshot = catalog
+        logger.info(f"Published catalog version {catalog.version} ({len(catalog)} packages)")
+
+    def _load(self) -> None:
+        source = _fingerprint(self.path)
+        catalog = PackageCatalog.from_file(self.path)
+        catalog.version = _source_version(source)
+        self._source = source
+        self._last_check = time.monotonic()
+        self._feed_offset = 0
+        self._publish(self._apply_feed(catalog))
+
+    def refresh(self) -> bool:
+        """Applies source file and feed changes now; True when a new snapshot was published"""
+        with self._lock:
+            if self._snapshot is None:
+                self._load()
+                return True
+            catalog = self._reload_source()
+            if catalog is not None:
+                # Replay the whole feed on the new file, as a freshly started
+                # worker does, so that both end up with the same content and version
+                self._feed_offset = 0
+            else:
+                catalog = self._snapshot
+            catalog = self._apply_feed(catalog)
+            if catalog is self._snapshot:
+                return False
+            self._publish(catalog)
+            return True
+
+    def apply(self, changes: Dict[Any, Optional[Dict[str, Any]]]) -> int:
+        """
+        Publishes the current snapshot with `changes` (package_id -> package
+        dict, or None to remove it) applied, for in-process updates. Returns the
+        new version. The changes are not in the feed, so a reload of the source
+        file drops them.
+        """
+        with self._lock:
+            if self._snapshot is None:
+                self._load()
+            current = self._snapshot
+            catalog = current.updated(changes)
+            if catalog is not current:
+                payload = json.dumps([[str(k), v] for k, v in changes.items()], sort_keys=True, default=str)
+                catalog.version = _version(current.version.to_bytes(8, "big"), payload.encode("utf-8"))
+                self._publish(catalog)
+            return self._snapshot.version
+
+    def _reload_source(self) -> Optional[PackageCatalog]:
+        """The catalog of the source file when it changed (not yet published), else None"""
+        try:
+            source = _fingerprint(self.path)
+        except OSError as e:
+            logger.warning(f"Catalog {self.path} unavailable, keeping version {self._snapshot.version}: {e}")
+            return None
+        if source == self._source:
+            return None
+        try:
+            with open(self.path, "r") as f:
+                packages = json.load(f)
+        except (OSError, ValueError) as e:
+            # Possibly caught mid-write; the next check tries again
+            logger.warning(f"Could not reload catalog {self.path}: {e}")
+            return None
+        catalog = diff_catalog(self._snapshot, packages)
+        if catalog is self._snapshot:
+            catalog = copy.copy(catalog)   # same content, new version: leave the published one alone
+        # Same content as the file: its saved activity matrix applies
+        catalog.path = self.path
+        catalog.version = _source_version(source)
+        self._source = source
+        return catalog
+
+    def _apply_feed(self, current: PackageCatalog) -> PackageCatalog:
+        """
+        `current` with the feed lines past the offset applied. The version
+        chains every valid line, even one that changes nothing, so it only
+        depends on the source file and the lines applied.
+        """
+        if not self.feed_path:
+            return current
+        try:
+            size = os.path.getsize(self.feed_path)
+        except OSError:
+            self._feed_offset = 0
+            return current
+        if size < self._feed_offset:
+            self._feed_offset = 0   # truncated: a new catalog file was published
+        if size == self._feed_offset:
+            return current
+        with open(self.feed_path, "rb") as f:
+            f.seek(self._feed_offset)
+            data = f.read(size - self._feed_offset)
+        end = data.rfind(b"\n") + 1   # only complete lines
+        if not end:
+            return current
+        self._feed_offset += end
+
+        version = current.version
+        changes: Dict[Any, Optional[Dict[str, Any]]] = {}
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                _fold(json.loads(line), changes, current)
+            except (ValueError, TypeError, KeyError, AttributeError) as e:
+                logger.warning(f"Skipping catalog update {line[:120]!r}: {e}")
+                continue
+            version = _version(version.to_bytes(8, "big"), line)
+        if version == current.version:
+            return current
+        catalog = current.updated(changes)
+        if catalog is current:
+            catalog = copy.copy(catalog)
+        catalog.version = version
+        return catalog
+
+    def _check_in_background(self) -> None:
+        if self.poll_seconds <= 0 or time.monotonic() - self._last_check < self.poll_seconds:
+            return
+        # Checked again under the lock: only one reader starts the refresh
+        with self._check_lock:
+            if self._refreshing or time.monotonic() - self._last_check < self.poll_seconds:
+                return
+            self._last_check = time.monotonic()
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, name="catalog-refresh", daemon=True).start()
+
+    def _background_refresh(self) -> None:
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.error(f"Catalog refresh failed, keeping version {self._snapshot.version}: {e}")
+        finally:
+            with self._check_lock:
+                self._refreshing = False
+
+
+_managers: Dict[str, CatalogManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_catalog_manager(path: str = DEFAULT_PACKAGE_FILE) -> CatalogManager:
+    """Returns the process-wide manager of the catalog at `path`"""
+    manager = _managers.get(path)
+    if manager is None:
+        with _managers_lock:
+            manager = _managers.get(path)
+            if manager is None:
+                manager = _managers[path] = CatalogManager(path)
+    return manager
+
+
+def get_catalog(path: str = DEFAULT_PACKAGE_FILE) -> PackageCatalog:
+    """Returns the current process-wide catalog snapshot, loading it on first use"""
+    return get_catalog_manager(path).snapshot
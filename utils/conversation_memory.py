@@ -0,0 +1,135 @@
+import os
+import re
+from typing import Any, Dict, List, NamedTuple, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from utils.tokens import estimate_tokens
+
+# Turns (a user message and the replies after it) sent verbatim on every call
+MEMORY_RECENT_TURNS = int(os.getenv("MEMORY_RECENT_TURNS", "6"))
+# Token ceiling for one conversation call: system prompt + summary + recent turns
+CONVERSATION_TOKEN_CEILING = int(os.getenv("CONVERSATION_TOKEN_CEILING", "3000"))
+# Cap on the rolling summary; its oldest lines are dropped beyond this
+SUMMARY_MAX_TOKENS = int(os.getenv("MEMORY_SUMMARY_MAX_TOKENS", "400"))
+
+# Characters kept from each folded message
+_USER_LINE_CHARS = 160
+_ASSISTANT_LINE_CHARS = 100
+_OMITTED = "(earlier turns omitted)"
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class ConversationContext(NamedTuple):
+    """What a conversation call sends, and the memory to store back in state"""
+    summary: str                  # running summary to store back in state
+    prompt_summary: str           # the part of it that fits this call
+    messages: List[BaseMessage]   # recent turns, verbatim
+    summarized_messages: int      # how many of state['messages'] the summary covers
+    tokens: int                   # estimated tokens of system prompt + summary + messages
+
+
+def _clip(text: str, limit: int) -> str:
+    text = _WHITESPACE_RE.sub(" ", text).strip()
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+def summary_line(message: BaseMessage) -> str:
+    """One summary line for a folded message; '' for messages that carry no dialogue"""
+    if not isinstance(message.content, str) or not message.content.strip():
+        return ""
+    if isinstance(message, HumanMessage):
+        return f"User: {_clip(message.content, _USER_LINE_CHARS)}"
+    if isinstance(message, AIMessage):
+        return f"Assistant: {_clip(message.content, _ASSISTANT_LINE_CHARS)}"
+    # System notes such as "[Preferences Updated: ...]" are covered by the
+    # structured preferences in the prompt
+    return ""
+
+
+def fold_into_summary(summary: str, messages: Sequence[BaseMessage], max_tokens: int = SUMMARY_MAX_TOKENS) -> str:
+    """
+    Appends `messages` to the running summary (never rebuilt from scratch)
+    and drops its oldest lines once it grows past `max_tokens`.
+    """
+    lines = [line for line in summary.split("\n") if line and line != _OMITTED]
+    lines.extend(line for line in map(summary_line, messages) if line)
+    trimmed = False
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+        trimmed = True
+    if trimmed or (summary.startswith(_OMITTED) and lines):
+        lines.insert(0, _OMITTED)
+    return "\n".join(lines)
+
+
+def _turn_starts(messages: Sequence[BaseMessage], start: int) -> List[int]:
+    return [i for i in range(start, len(messages)) if isinstance(messages[i], HumanMessage)]
+
+
+def _dialogue(messages: Sequence[BaseMessage]) -> List[BaseMessage]:
+    """Human and assistant messages only"""
+    return [m for m in messages if isinstance(m, (HumanMessage, AIMessage))]
+
+
+def _window_tokens(messages: Sequence[BaseMessage]) -> int:
+    return sum(estimate_tokens(m.content if isinstance(m.content, str) else str(m.content)) + 4 for m in messages)
+
+
+def build_context(
+    state: Dict[str, Any],
+    system_tokens: int = 0,
+    recent_turns: int = MEMORY_RECENT_TURNS,
+    token_ceiling: int = CONVERSATION_TOKEN_CEILING,
+) -> ConversationContext:
+    """
+    Bounded memory for one conversation call.
+
+    The last `recent_turns` turns of state['messages'] are kept verbatim;
+    everything before them is folded into state['conversation_summary'],
+    starting where the previous call stopped (state['summarized_messages']).
+    If system prompt + summary + recent turns would exceed `token_ceiling`,
+    more of the oldest turns are folded (the latest turn is always kept), then
+    less of the summary is sent (the stored summary is kept whole).
+    """
+    messages = state.get("messages", [])
+    summary = state.get("conversation_summary") or ""
+    summarized = state.get("summarized_messages") or 0
+    if summarized > len(messages):
+        # History was replaced; start over
+        summary, summarized = "", 0
+
+    # 1. Fold everything older than the last `recent_turns` turns
+    starts = _turn_starts(messages, summarized)
+    keep = max(1, recent_turns)
+    if len(starts) > keep:
+        cut = starts[-keep]
+        summary = fold_into_summary(summary, messages[summarized:cut])
+        summarized = cut
+
+    # 2. Over the ceiling: fold the oldest remaining turns one at a time
+    window = _dialogue(messages[summarized:])
+    budget = token_ceiling - system_tokens
+    while _window_tokens(window) + estimate_tokens(summary) > budget:
+        later = _turn_starts(messages, summarized + 1)
+        if not later:
+            break
+        summary = fold_into_summary(summary, messages[summarized:later[0]])
+        summarized = later[0]
+        window = _dialogue(messages[summarized:])
+
+    # 3. Still over (one long turn): send less of the summary, or none of it
+    room = max(0, budget - _window_tokens(window))
+    prompt_summary = summary
+    if estimate_tokens(prompt_summary) > room:
+        prompt_summary = fold_into_summary(summary, [], room)
+        if estimate_tokens(prompt_summary) > room:
+            prompt_summary = ""
+
+    return ConversationContext(
+        summary=summary,
+        prompt_summary=prompt_summary,
+        messages=window,
+        summarized_messages=summarized,
+        tokens=system_tokens + estimate_tokens(prompt_summary) + _window_tokens(window),
+    )
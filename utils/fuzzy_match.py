@@ -0,0 +1,206 @@
+import re
+from collections import Counter
+from functools import lru_cache
+from itertools import chain
+from typing import List, Dict, FrozenSet, Iterable, Tuple
+
+from utils.preference_rules import PACKAGE_TYPE_SYNONYMS
+
+_WORD_RE = re.compile(r'[^\W_]+')
+
+# Smallest trigram similarity (Dice coefficient, 0-1) that counts as a match
+FUZZY_THRESHOLD = 0.5
+
+# Query spans longer than this many words are only compared as a whole
+MAX_SPAN_WORDS = 3
+
+# Alternative names -> the normalized catalog destination they mean
+DESTINATION_ALIASES: Dict[str, str] = {
+    "ladakh": "leh-ladakh",
+    "leh": "leh-ladakh",
+    "leh ladakh": "leh-ladakh",
+    "mysore": "mysuru",
+    "pondy": "pondicherry",
+    "puducherry": "pondicherry",
+    "alappuzha": "alleppey",
+    "kodagu": "coorg",
+    "udhagamandalam": "ooty",
+    "ooty hills": "ooty",
+    "andamans": "andaman",
+    "andaman islands": "andaman",
+    "andaman and nicobar": "andaman",
+    "havelock": "andaman",
+    "spiti": "spiti valley",
+    "banaras": "varanasi",
+    "benares": "varanasi",
+    "kashi": "varanasi",
+    "rameswaram": "rameshwaram",
+    "tirumala": "tirupati",
+    "shillong": "meghalaya",
+    "cherrapunji": "meghalaya",
+    "simla": "shimla",
+    "darjeling": "darjeeling",
+    "madras": "chennai",
+    "bombay": "mumbai",
+    "calcutta": "kolkata",
+}
+
+# Synonyms the rule-based extractor knows -> the catalog package type
+PACKAGE_TYPE_ALIASES: Dict[str, str] = {
+    synonym: package_type
+    for package_type, synonyms in PACKAGE_TYPE_SYNONYMS.items()
+    for synonym in synonyms
+}
+
+
+def _words(text: str) -> List[str]:
+    return _WORD_RE.findall(text)
+
+
+@lru_cache(maxsize=65536)
+def trigrams(text: str) -> FrozenSet[str]:
+    """Trigrams of each word, padded like pg_trgm ("  w", " wo", ..., "rd ")"""
+    grams = set()
+    for word in _words(text):
+        padded = "  " + word + " "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+def _spans(query: str, spans: bool = True) -> List[FrozenSet[str]]:
+    """Trigram sets of the whole query and, with `spans`, of its runs of up to MAX_SPAN_WORDS words"""
+    words = _words(query)
+    if not words:
+        return []
+    result = [trigrams(" ".join(words))]
+    if spans and len(words) > 1:
+        for size in range(1, min(MAX_SPAN_WORDS, len(words) - 1) + 1):
+            for start in range(len(words) - size + 1):
+                result.append(trigrams(" ".join(words[start:start + size])))
+    return result
+
+
+def _dice(shared: int, a: int, b: int) -> float:
+    return 2 * shared / (a + b)
+
+
+@lru_cache(maxsize=65536)
+def similarity(query: str, value: str, spans: bool = True) -> float:
+    """
+    Trigram similarity (0-1) of a catalog value to the query, or to its best
+    matching run of words, so "goa beaches" is as similar to "goa" as "goa" is.
+    """
+    value_grams = trigrams(value)
+    if not value_grams:
+        return 0.0
+    best = 0.0
+    for query_grams in _spans(query, spans):
+        best = max(best, _dice(len(query_grams & value_grams), len(query_grams), len(value_grams)))
+    return best
+
+
+class FuzzyIndex:
+    """
+    Trigram index over a set of normalized catalog values (destinations or
+    package types). `search` counts shared trigrams through the posting
+    lists, so only values sharing a trigram with the query are looked at;
+    the similarities are the same as `similarity(query, value)`.
+    """
+
+    def __init__(self, values: Iterable[str]):
+        self.values: List[str] = list(dict.fromkeys(values))
+        self._sizes: List[int] = []
+        self.postings: Dict[str, List[int]] = {}
+        for i, value in enumerate(self.values):
+            grams = trigrams(value)
+            self._sizes.append(len(grams))
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(i)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def search(self, query: str, threshold: float = FUZZY_THRESHOLD, spans: bool = True) -> List[Tuple[str, float]]:
+        """(value, similarity) with similarity >= threshold, best first, ties in index order"""
+        best: Dict[int, float] = {}
+        for query_grams in _spans(query, spans):
+            shared = Counter(chain.from_iterable(self.postings.get(gram, ()) for gram in query_grams))
+            for i, count in shared.items():
+                score = _dice(count, len(query_grams), self._sizes[i])
+                if score > best.get(i, 0.0):
+                    best[i] = score
+        ranked = sorted((i for i, score in best.items() if score >= threshold), key=lambda i: (-best[i], i))
+        return [(self.values[i], best[i]) for i in ranked]
+
+
+# Scores (0-1) the matcher multiplies with its point weights
+
+def destination_similarity(preference: str, destination: str) -> float:
+    """
+    1 when the normalized preference (or its alias) is part of the destination,
+    as before; otherwise the trigram similarity if it reaches FUZZY_THRESHOLD.
+    """
+    if not preference:
+        return 0.0
+    alias = DESTINATION_ALIASES.get(preference)
+    if preference in destination or (alias and alias in destination):
+        return 1.0
+    score = similarity(preference, destination)
+    return score if score >= FUZZY_THRESHOLD else 0.0
+
+
+def package_type_similarity(preference: str, package_type: str) -> float:
+    """
+    1 for the same type (directly or through an alias), 0.5 when one contains
+    the other, or the trigram similarity when that is higher.
+    """
+    if not preference:
+        return 0.0
+    alias = PACKAGE_TYPE_ALIASES.get(preference, preference)
+    if preference == package_type or alias == package_type:
+        return 1.0
+    partial = 0.5 if (preference in package_type or package_type in preference
+                      or alias in package_type or package_type in alias) else 0.0
+    score = similarity(preference, package_type)
+    return max(partial, score) if score >= FUZZY_THRESHOLD else partial
+
+
+def lookup_destination(preference: str, index: FuzzyIndex, spans: bool = True) -> Dict[str, float]:
+    """
+    destination_similarity for every indexed destination it is above 0 for.
+    Without `spans` the fuzzy part compares the preference only as a whole.
+    """
+    if not preference:
+        return {}
+    alias = DESTINATION_ALIASES.get(preference)
+    result = {value: 1.0 for value in index.values if preference in value or (alias and alias in value)}
+    for value, score in index.search(preference, spans=spans):
+        result.setdefault(value, score)
+    return result
+
+
+def lookup_package_type(preference: str, index: FuzzyIndex) -> Dict[str, float]:
+    """package_type_similarity for every indexed package type it is above 0 for"""
+    if not preference:
+        return {}
+    alias = PACKAGE_TYPE_ALIASES.get(preference, preference)
+    result = {}
+    for value in index.values:
+        if value == preference or value == alias:
+            result[value] = 1.0
+        elif preference in value or value in preference or alias in value or value in alias:
+            result[value] = 0.5
+    for value, score in index.search(preference):
+        if score > result.get(value, 0.0):
+            result[value] = score
+    return result
+
+
+def ranked(scores: Dict[str, float]) -> List[Tuple[str, float]]:
+    """Lookup results best first, ties in lookup order"""
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+def points(weight: float, score: float) -> float:
+    """Matcher points for a similarity score, whole numbers like the exact weights"""
+    return float(round(weight * score))
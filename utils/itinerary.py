@@ -0,0 +1,120 @@
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+
+from models import ItineraryReply
+from utils.json_extract import extract_json
+
+logger = logging.getLogger(__name__)
+
+# (package_id, plan mode, alternative round, polish prompt digest) -> polished itinerary
+PolishKey = Tuple[Any, str, int, str]
+
+# Polished itineraries kept in memory (oldest dropped first)
+MAX_POLISHED = 1024
+
+_polish_executor: Optional[ThreadPoolExecutor] = None
+_polished: Dict[PolishKey, List[Dict[str, Any]]] = {}
+_pending: set = set()
+_polish_lock = threading.Lock()
+
+
+def alternative_rounds(package: Dict[str, Any]) -> int:
+    """Number of alternative itineraries a package can offer (longest alternative list)"""
+    return max((len(day.get('alternative_plans', [])) for day in package.get('day_plans', [])), default=0)
+
+
+def render_itinerary(package: Dict[str, Any], use_alternative: bool = False, round_index: int = 0) -> Dict[str, Any]:
+    """
+    Builds the day planner output from the package's day_plans, without an LLM.
+
+    PRIMARY mode uses each day's primary_plan. ALTERNATIVE mode uses the
+    `round_index`-th alternative of each day and keeps the primary plan for days
+    that have run out of alternatives. Returns the same envelope the planner
+    prompt asks for: {"itinerary", "alternatives_available", "message"}.
+    """
+    itinerary = []
+    for i, day in enumerate(package.get('day_plans', []), start=1):
+        alternatives = day.get('alternative_plans', [])
+        primary = day.get('primary_plan', '')
+        if use_alternative and round_index < len(alternatives):
+            plan = alternatives[round_index]
+            detail = f"Alternative to: {primary}."
+        else:
+            plan = primary
+            if use_alternative:
+                detail = "No more alternatives for this day; keeping the original plan."
+            elif alternatives:
+                detail = f"Other options: {', '.join(alternatives)}."
+            else:
+                detail = ""
+        itinerary.append({"day": day.get('day', i), "plan": plan, "activities_detail": detail})
+
+    next_round = round_index + 1 if use_alternative else 0
+    alternatives_available = next_round < alternative_rounds(package)
+
+    destination = package.get('destination', 'your trip')
+    days = len(itinerary)
+    if use_alternative:
+        message = f"Here's an alternative {days}-day plan for {destination}."
+    else:
+        message = f"Here's your {days}-day itinerary for {destination}."
+    if alternatives_available:
+        message += " Ask for an alternative plan if you'd like other options."
+
+    return {"itinerary": itinerary, "alternatives_available": alternatives_available, "message": message}
+
+
+def next_alternative_round(seen: Dict[Any, int], package_id: Any) -> int:
+    """Returns the alternative round to show next for a package and advances the cursor"""
+    round_index = seen.get(package_id, 0)
+    seen[package_id] = round_index + 1
+    return round_index
+
+
+# Optional LLM polishing, off the critical path
+
+def polish_key(package_id: Any, mode: str, round_index: int, prompt: str) -> PolishKey:
+    """
+    Key of a polished itinerary. The prompt digest covers the rendered
+    itinerary and destination, so a catalog update to the package's
+    day_plans never serves the polish of the old content.
+    """
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    return (package_id, mode, round_index, digest)
+
+
+def _polish(key: PolishKey, itinerary: List[Dict[str, Any]], llm, prompt: str):
+    try:
+        response = llm.invoke(prompt)
+        polished = extract_json(response.content, ItineraryReply).get("itinerary")
+        if isinstance(polished, list) and len(polished) == len(itinerary):
+            with _polish_lock:
+                _polished[key] = polished
+                while len(_polished) > MAX_POLISHED:
+                    del _polished[next(iter(_polished))]
+    except Exception as e:
+        logger.warning(f"Itinerary polishing failed: {e}")
+    finally:
+        with _polish_lock:
+            _pending.discard(key)
+
+
+def schedule_polish(key: PolishKey, itinerary: List[Dict[str, Any]], llm, prompt: str) -> None:
+    """Polishes an itinerary's wording in the background; never blocks the caller"""
+    global _polish_executor
+    with _polish_lock:
+        if key in _polished or key in _pending:
+            return
+        _pending.add(key)
+        if _polish_executor is None:
+            _polish_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="itinerary-polish")
+    _polish_executor.submit(_polish, key, itinerary, llm, prompt)
+
+
+def get_polished(key: PolishKey) -> Optional[List[Dict[str, Any]]]:
+    """The polished itinerary for a key, if a background polish has finished"""
+    with _polish_lock:
+        return _polished.get(key)
@@ -0,0 +1,200 @@
+import json
+import re
+from functools import lru_cache
+from typing import Any, Iterator, List, Optional, Tuple
+
+from pydantic import TypeAdapter, ValidationError
+
+from utils.tracing import annotate, get_tracer
+
+_decoder = json.JSONDecoder()
+_START_RE = re.compile(r"[\[{]")
+_CLOSERS = {'{': '}', '[': ']'}
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_SPECIAL_IN_STRING = {'"': re.compile(r'["\\\n]'), "'": re.compile(r"['\"\\\n]")}
+
+# How many '{' / '[' positions to try before giving up on a reply
+MAX_START_CANDIDATES = 8
+
+
+class JSONExtractionError(ValueError):
+    """Raised when no usable JSON value can be found in an LLM reply"""
+
+
+def _repair(text: str, start: int) -> Tuple[str, int]:
+    """
+    Re-emits the JSON value starting at `start` in one pass, fixing common LLM
+    defects on the way:
+    - single-quoted strings -> double-quoted
+    - trailing commas before '}' / ']'
+    - Python literals True/False/None
+    - truncated output: unterminated strings and missing closing brackets
+
+    Returns the repaired text and the index just past the value.
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    i = start
+    n = len(text)
+    while i < n:
+        ch = text[i]
+
+        if ch == '"' or ch == "'":
+            quote = ch
+            i += 1
+            buf = ['"']
+            closed = False
+            special = _SPECIAL_IN_STRING[quote]
+            while i < n:
+                # Copy plain runs in one go
+                m = special.search(text, i)
+                j = m.start() if m else n
+                if j > i:
+                    buf.append(text[i:j])
+                    i = j
+                    if i >= n:
+                        break
+                c = text[i]
+                if c == '\\' and i + 1 < n:
+                    nxt = text[i + 1]
+                    # \' is not a JSON escape
+                    buf.append("'" if nxt == "'" else c + nxt)
+                    i += 2
+                    continue
+                if c == quote:
+                    closed = True
+                    i += 1
+                    break
+                if c == '"':
+                    buf.append('\\"')
+                elif c == '\n':
+                    buf.append('\\n')
+                else:
+                    buf.append(c)
+                i += 1
+            buf.append('"')
+            out.append("".join(buf))
+            if not closed:
+                break
+            continue
+
+        if ch in '{[':
+            stack.append(_CLOSERS[ch])
+            out.append(ch)
+        elif ch in '}]':
+            # Drop a trailing comma before the closer
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ',':
+                out.pop()
+            if ch not in stack:
+                # Stray closer
+                i += 1
+                continue
+            # Close anything the model forgot to close first, e.g. [1, 2}
+            while stack[-1] != ch:
+                out.append(stack.pop())
+            stack.pop()
+            out.append(ch)
+            if not stack:
+                return "".join(out), i + 1
+        elif ch.isalpha() or ch == '_':
+            j = i
+            while j < n and (text[j].isalnum() or text[j] == '_'):
+                j += 1
+            word = text[i:j]
+            out.append(_LITERALS.get(word, word))
+            i = j
+            continue
+        else:
+            out.append(ch)
+        i += 1
+
+    # Truncated: tidy the tail and close whatever is still open
+    while out and (out[-1].isspace() or out[-1] in ',:'):
+        dangling = out.pop()
+        if dangling == ':':
+            out.append(':null')
+            break
+    out.extend(reversed(stack))
+    return "".join(out), n
+
+
+def _candidates(text: str) -> Iterator[Tuple[Any, int, int, bool]]:
+    """
+    Decodes the JSON value at each '{' / '[' in turn: (value, start, end,
+    repaired). At each position the C decoder is tried first (fast path,
+    trailing text is ignored) and the repairing scanner only when that fails.
+    """
+    if not isinstance(text, str):
+        raise JSONExtractionError(f"Expected text, got {type(text).__name__}")
+
+    for attempt, match in enumerate(_START_RE.finditer(text)):
+        if attempt >= MAX_START_CANDIDATES:
+            break
+        start = match.start()
+        try:
+            value, end = _decoder.raw_decode(text, start)
+            yield value, start, end, False
+            continue
+        except json.JSONDecodeError:
+            pass
+        # Repair from the same position before trying a later (possibly nested) one
+        repaired, end = _repair(text, start)
+        try:
+            value = json.loads(repaired)
+        except json.JSONDecodeError:
+            continue
+        yield value, start, end, True
+
+
+def find_json(text: str) -> Tuple[Any, int, int]:
+    """
+    Finds and decodes the first JSON object or array in `text`; later
+    positions are tried only when one does not decode, even after repair.
+    Returns (value, start, end).
+    """
+    for value, start, end, repaired in _candidates(text):
+        if repaired:
+            annotate(repaired=True)
+        return value, start, end
+    raise JSONExtractionError("No JSON value found in LLM response")
+
+
+@lru_cache(maxsize=None)
+def _adapter(schema: Any) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+def extract_json(text: str, schema: Optional[Any] = None) -> Any:
+    """
+    Returns the first JSON value in an LLM reply (code fences, preambles and
+    trailing chatter are ignored; common defects are repaired).
+
+    When `schema` (a pydantic model or any type pydantic understands) is given,
+    the first value that validates against it is returned, and
+    JSONExtractionError is raised when none does. The decoded value itself is
+    returned, unchanged. Each call is
+    traced as a `json.extract` span; failures end it with an error.
+    """
+    schema_name = getattr(schema, '__name__', str(schema)) if schema is not None else None
+    with get_tracer().span("json.extract", "parse", schema=schema_name,
+                           chars=len(text) if isinstance(text, str) else None):
+        if schema is None:
+            value, _, _ = find_json(text)
+            return value
+        # The first value that matches the schema: stray brackets before the
+        # payload ("Note [1]: {...}") decode too, but are skipped
+        error = None
+        for value, _, _, repaired in _candidates(text):
+            try:
+                _adapter(schema).validate_python(value)
+            except ValidationError as e:
+                error = error or e
+                continue
+            if repaired:
+                annotate(repaired=True)
+            return value
+        if error is None:
+            raise JSONExtractionError("No JSON value found in LLM response")
+        raise JSONExtractionError(f"LLM response does not match {schema_name}: {error}") from error
@@ -0,0 +1,110 @@
+from typing import List, Optional
+
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class StreamingFieldParser:
+    """
+    Incrementally extracts one top-level string field from a JSON object as
+    LLM tokens arrive, e.g. "message" from {"current_state": ..., "message": ...}.
+
+    `feed` returns the newly decoded text of that field, so callers can show it
+    while the rest of the completion is still generating. Text before the first
+    '{' (code fences, preambles) is skipped. The full completion should still be
+    parsed normally once the stream ends.
+    """
+
+    def __init__(self, field: str = "message"):
+        self.field = field
+        self.started = False    # the field's value has started streaming
+        self.finished = False   # the field's closing quote has been seen
+
+        self._depth = 0
+        self._expect_key = False
+        self._last_key: Optional[str] = None
+        self._in_string = False
+        self._string_is_key = False
+        self._capturing = False
+        self._key_chars: List[str] = []
+        self._escape = False
+        self._unicode: Optional[str] = None      # hex digits of a \uXXXX escape
+        self._high_surrogate: Optional[int] = None
+
+    def _decode_unicode(self, code: int) -> str:
+        if 0xD800 <= code <= 0xDBFF:
+            self._high_surrogate = code
+            return ""
+        if 0xDC00 <= code <= 0xDFFF and self._high_surrogate is not None:
+            code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+        self._high_surrogate = None
+        return chr(code)
+
+    def _string_char(self, ch: str) -> str:
+        """Consumes one character inside a string; returns decoded text to emit"""
+        if self._unicode is not None:
+            self._unicode += ch
+            if len(self._unicode) < 4:
+                return ""
+            try:
+                decoded = self._decode_unicode(int(self._unicode, 16))
+            except ValueError:
+                decoded = ""
+            self._unicode = None
+            return decoded
+        if self._escape:
+            self._escape = False
+            if ch == 'u':
+                self._unicode = ""
+                return ""
+            return _ESCAPES.get(ch, ch)
+        if ch == '\\':
+            self._escape = True
+            return ""
+        if ch == '"':
+            self._in_string = False
+            if self._string_is_key:
+                self._last_key = "".join(self._key_chars)
+            elif self._capturing:
+                self._capturing = False
+                self.finished = True
+            return ""
+        return ch
+
+    def feed(self, chunk: str) -> str:
+        """Consumes the next chunk of the completion; returns new text of the field"""
+        out: List[str] = []
+        for ch in chunk:
+            if self._in_string:
+                decoded = self._string_char(ch)
+                if decoded:
+                    if self._string_is_key:
+                        self._key_chars.append(decoded)
+                    elif self._capturing:
+                        out.append(decoded)
+                continue
+
+            if ch == '{':
+                self._depth += 1
+                if self._depth == 1:
+                    self._expect_key = True
+            elif ch == '[':
+                self._depth += 1
+            elif ch in '}]':
+                self._depth = max(0, self._depth - 1)
+            elif self._depth == 0:
+                continue
+            elif ch == ':' and self._depth == 1:
+                self._expect_key = False
+            elif ch == ',' and self._depth == 1:
+                self._expect_key = True
+            elif ch == '"':
+                self._in_string = True
+                self._string_is_key = self._depth == 1 and self._expect_key
+                self._key_chars = []
+                self._capturing = (
+                    self._depth == 1 and not self._expect_key
+                    and self._last_key == self.field and not self.finished
+                )
+                if self._capturing:
+                    self.started = True
+        return "".join(out)
@@ -0,0 +1,285 @@
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Any, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from utils.tokens import estimate_tokens
+from utils.tracing import get_tracer
+
+if TYPE_CHECKING:
+    import httpx
+
+load_dotenv()
+
+DEFAULT_MODEL = "llama-3.3-70b-versatile"
+
+# Connection pool shared by every chat model in the process
+MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))
+REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "60"))
+
+_lock = threading.RLock()
+_clients: Dict[Tuple, Any] = {}
+_http_client: Optional["httpx.Client"] = None
+_http_async_client: Optional["httpx.AsyncClient"] = None
+
+# httpx, the response cache and the provider SDKs are imported on first use,
+# so importing an agent does not pay for them
+
+
+def _limits() -> "httpx.Limits":
+    import httpx
+
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+
+
+def get_http_client() -> "httpx.Client":
+    """Process-wide keep-alive HTTP client used for synchronous LLM calls"""
+    global _http_client
+    if _http_client is None:
+        with _lock:
+            if _http_client is None:
+                import httpx
+
+                _http_client = httpx.Client(limits=_limits(), timeout=REQUEST_TIMEOUT)
+    return _http_client
+
+
+def get_http_async_client() -> "httpx.AsyncClient":
+    """Process-wide keep-alive HTTP client used for async LLM calls"""
+    global _http_async_client
+    if _http_async_client is None:
+        with _lock:
+            if _http_async_client is None:
+                import httpx
+
+                _http_async_client = httpx.AsyncClient(limits=_limits(), timeout=REQUEST_TIMEOUT)
+    return _http_async_client
+
+
+def _build_client(model: str, temperature: Optional[float], cached: bool, **kwargs):
+    """
+    Builds a chat model on the shared connection pool.
+
+    Uses Groq by default. When LLM_BASE_URL is set, talks to that
+    OpenAI-compatible endpoint instead (e.g. a local stand-in server).
+    """
+    params: Dict[str, Any] = dict(kwargs)
+    if temperature is not None:
+        params["temperature"] = temperature
+    # Cached models go through the shared response cache; the others never
+    # reuse a reply, even with a global LangChain cache set
+    if cached:
+        from utils.llm_cache import get_llm_cache
+
+        cache = get_llm_cache()
+        params.setdefault("cache", cache if cache is not None else False)
+    else:
+        params.setdefault("cache", False)
+
+    base_url = os.getenv("LLM_BASE_URL")
+    if base_url:
+        from langchain_openai import ChatOpenAI
+
+        return ChatOpenAI(
+            model=model,
+            base_url=base_url,
+            api_key=os.getenv("LLM_API_KEY", "not-needed"),
+            http_client=get_http_client(),
+            http_async_client=get_http_async_client(),
+            **params,
+        )
+
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
+        raise ValueError("GROQ_API_KEY not found")
+
+    from langchain_groq import ChatGroq
+
+    return ChatGroq(
+        model_name=model,
+        groq_api_key=api_key,
+        http_client=get_http_client(),
+        http_async_client=get_http_async_client(),
+        **params,
+    )
+
+
+def _prompt_text(prompt: Any) -> str:
+    if isinstance(prompt, str):
+        return prompt
+    if hasattr(prompt, "to_string"):
+        return prompt.to_string()
+    if isinstance(prompt, (list, tuple)):
+        return "\n".join(str(getattr(m, "content", m)) for m in prompt)
+    return str(prompt)
+
+
+def _completion_text(response: Any) -> str:
+    content = getattr(response, "content", None)
+    if content is not None:
+        return str(content)
+    if hasattr(response, "model_dump_json"):
+        return response.model_dump_json()
+    return str(response)
+
+
+def _record_usage(span, prompt: Any, response: Any) -> None:
+    """Token counts from the provider's usage data, estimated when there is none"""
+    usage = getattr(response, "usage_metadata", None) or {}
+    prompt_tokens, completion_tokens = usage.get("input_tokens"), usage.get("output_tokens")
+    if prompt_tokens is None or completion_tokens is None:
+        prompt_tokens = estimate_tokens(_prompt_text(prompt))
+        completion_tokens = estimate_tokens(_completion_text(response))
+        span.set("tokens_estimated", True)
+    span.set("prompt_tokens", prompt_tokens)
+    span.set("completion_tokens", completion_tokens)
+
+
+class TracedChatModel:
+    """
+    Wraps a chat model so that every invoke/ainvoke/stream/astream records an
+    `llm.call` span (model, token counts, response cache result). Anything
+    else is passed through to the wrapped model.
+    """
+
+    def __init__(self, llm: Any, model: str):
+        self._llm = llm
+        self.model = model
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._llm, name)
+
+    def invoke(self, prompt: Any, *args, **kwargs) -> Any:
+        with get_tracer().span("llm.call", "llm", model=self.model, method="invoke") as span:
+            response = self._llm.invoke(prompt, *args, **kwargs)
+            _record_usage(span, prompt, response)
+            return response
+
+    async def ainvoke(self, prompt: Any, *args, **kwargs) -> Any:
+        with get_tracer().span("llm.call", "llm", model=self.model, method="ainvoke") as span:
+            response = await self._llm.ainvoke(prompt, *args, **kwargs)
+            _record_usage(span, prompt, response)
+            return response
+
+    def _stream_span(self, method: str):
+        tracer = get_tracer()
+        if not tracer.enabled:
+            return tracer, None
+        # Not made current: the caller's code runs between chunks
+        return tracer, tracer.start("llm.call", "llm", activate=False, model=self.model, method=method)
+
+    def stream(self, prompt: Any, *args, **kwargs):
+        tracer, span = self._stream_span("stream")
+        error, usage_chunk, parts = None, None, []
+        try:
+            for chunk in self._llm.stream(prompt, *args, **kwargs):
+                if span is not None:
+                    if not parts:
+                        span.set("first_chunk_ms", round((time.perf_counter() - span._started) * 1000, 3))
+                    parts.append(str(getattr(chunk, "content", "")))
+                    if getattr(chunk, "usage_metadata", None):
+                        usage_chunk = chunk
+                yield chunk
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            if span is not None:
+                _record_usage(span, prompt, _StreamedReply("".join(parts), usage_chunk))
+                tracer.finish(span, error)
+
+    async def astream(self, prompt: Any, *args, **kwargs):
+        tracer, span = self._stream_span("astream")
+        error, usage_chunk, parts = None, None, []
+        try:
+            async for chunk in self._llm.astream(prompt, *args, **kwargs):
+                if span is not None:
+                    if not parts:
+                        span.set("first_chunk_ms", round((time.perf_counter() - span._started) * 1000, 3))
+                    parts.append(str(getattr(chunk, "content", "")))
+                    if getattr(chunk, "usage_metadata", None):
+                        usage_chunk = chunk
+                yield chunk
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            if span is not None:
+                _record_usage(span, prompt, _StreamedReply("".join(parts), usage_chunk))
+                tracer.finish(span, error)
+
+    def with_structured_output(self, schema: Any, **kwargs) -> Any:
+        """The structured model as a runnable (so it still composes with prompts), traced"""
+        from langchain_core.runnables import RunnableLambda
+
+        structured = self._llm.with_structured_output(schema, **kwargs)
+        model = self.model
+
+        def invoke(prompt: Any) -> Any:
+            with get_tracer().span("llm.call", "llm", model=model, method="structured") as span:
+                response = structured.invoke(prompt)
+                _record_usage(span, prompt, response)
+                return response
+
+        async def ainvoke(prompt: Any) -> Any:
+            with get_tracer().span("llm.call", "llm", model=model, method="structured") as span:
+                response = await structured.ainvoke(prompt)
+                _record_usage(span, prompt, response)
+                return response
+
+        return RunnableLambda(invoke, afunc=ainvoke, name=f"structured_{getattr(schema, '__name__', 'output')}")
+
+
+class _StreamedReply:
+    """Joined stream content, with the usage data some providers attach to a chunk"""
+
+    def __init__(self, content: str, usage_chunk: Any):
+        self.content = content
+        self.usage_metadata = getattr(usage_chunk, "usage_metadata", None)
+
+
+def get_llm(model: str = DEFAULT_MODEL, temperature: Optional[float] = None, cached: Optional[bool] = None, **kwargs):
+    """
+    Returns the shared chat model for (model, temperature, cached, kwargs).
+
+    Clients are built once and reused across agents and threads, so every
+    call rides on the same keep-alive connection pool. Calls are traced
+    (see utils.tracing).
+
+    Replies are served from the response cache (utils.llm_cache) only when
+    `cached`, which defaults to temperature 0: sampled replies, such as the
+    conversation's, must not repeat across sessions. Callers whose reply is
+    parsed as data rather than shown (structured output, the ranking and
+    researcher JSON) opt in.
+    """
+    if cached is None:
+        cached = temperature == 0
+    key = (model, temperature, cached, tuple(sorted(kwargs.items())))
+    llm = _clients.get(key)
+    if llm is None:
+        with _lock:
+            llm = _clients.get(key)
+            if llm is None:
+                llm = TracedChatModel(_build_client(model, temperature, cached, **kwargs), model)
+                _clients[key] = llm
+    return llm
+
+
+def reset_clients():
+    """Drops every cached chat model and closes the shared HTTP clients"""
+    global _http_client, _http_async_client
+    with _lock:
+        _clients.clear()
+        if _http_client is not None:
+            _http_client.close()
+        # The async client is only dropped; closing it needs its event loop
+        _http_client = None
+        _http_async_client = None
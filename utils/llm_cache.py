@@ -0,0 +1,191 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Sequence
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.outputs import Generation
+
+from utils.catalog import BASE_DIR
+from utils.tracing import annotate
+
+DEFAULT_CACHE_PATH = os.path.join(BASE_DIR, ".cache", "llm_cache.sqlite")
+
+
+def _load_generations(value: str) -> Sequence[Generation]:
+    # Entries are written by this process family only; silence the beta notices
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return loads(value)
+
+
+class LLMResponseCache(BaseCache):
+    """
+    Two-level LangChain cache for chat model responses.
+
+    An in-memory LRU sits in front of an on-disk SQLite store. Entries are
+    keyed on a SHA-256 of the model configuration string (model name,
+    temperature and other parameters) and the serialized prompt. Both levels
+    honour a TTL; the LRU is bounded by `max_memory_entries` and the SQLite
+    store by `max_disk_entries` (least recently used rows are evicted first).
+    Only deterministic models use it (see utils.llm.get_llm).
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = DEFAULT_CACHE_PATH,
+        ttl_seconds: Optional[float] = 24 * 3600,
+        max_memory_entries: int = 1024,
+        max_disk_entries: int = 100_000,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+
+        self._lock = threading.Lock()
+        # key -> (created_at, serialized generations)
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+        self._conn: Optional[sqlite3.Connection] = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)")
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, created_at: float, value: str):
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _evict_disk(self):
+        """
+        Deletes the least recently used rows beyond max_disk_entries. Counted in
+        the database, since other processes write to it too.
+        """
+        cursor = self._conn.execute(
+            "DELETE FROM llm_cache WHERE accessed_at < "
+            "(SELECT accessed_at FROM llm_cache ORDER BY accessed_at DESC LIMIT 1 OFFSET ?)",
+            (self.max_disk_entries - 1,),
+        )
+        self._stats["evictions"] += max(cursor.rowcount, 0)
+
+    # BaseCache interface
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        key = self.make_key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[0], now):
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    annotate(cache="memory")
+                    return _load_generations(entry[1])
+                del self._memory[key]
+                self._stats["expired"] += 1
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value, created_at = row
+                    if not self._expired(created_at, now):
+                        self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+                        self._conn.commit()
+                        self._remember(key, created_at, value)
+                        self._stats["disk_hits"] += 1
+                        annotate(cache="disk")
+                        return _load_generations(value)
+                    self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    self._conn.commit()
+                    self._stats["expired"] += 1
+
+            self._stats["misses"] += 1
+            annotate(cache="miss")
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        key = self.make_key(prompt, llm_string)
+        value = dumps(list(return_val))
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, value, now, now),
+                )
+                self._evict_disk()
+                self._conn.commit()
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM llm_cache")
+                self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current sizes"""
+        with self._lock:
+            stats = dict(self._stats)
+            lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+            stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_entries"] = (
+                self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] if self._conn is not None else 0
+            )
+            return stats
+
+
+_cache: Optional[LLMResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """
+    Returns the process-wide response cache, or None when LLM_CACHE_DISABLED is set.
+
+    Configured through LLM_CACHE_PATH (empty for memory only), LLM_CACHE_TTL
+    (seconds, 0 for no expiry), LLM_CACHE_MEMORY_ENTRIES and LLM_CACHE_DISK_ENTRIES.
+    """
+    global _cache
+    if os.getenv("LLM_CACHE_DISABLED", "").lower() in ("1", "true", "yes"):
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                ttl = float(os.getenv("LLM_CACHE_TTL", str(24 * 3600)))
+                _cache = LLMResponseCache(
+                    path=os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH) or None,
+                    ttl_seconds=ttl or None,
+                    max_memory_entries=int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "1024")),
+                    max_disk_entries=int(os.getenv("LLM_CACHE_DISK_ENTRIES", "100000")),
+                )
+    return _cache
@@ -0,0 +1,206 @@
+"""
+Cache of researcher matches, keyed on normalized preferences and catalog version.
+
+Conversation turns often leave the preferences unchanged, so the researcher
+would score the catalog (and ask the LLM to refine the result) again for the
+same input. Entries hold the matcher's packages and, once the LLM reply
+parsed, its selection. They are keyed on the preference fields the matcher
+reads, normalized the way it compares them (package type, destination,
+budget, duration, price tier, sorted activities), the result limit and the
+catalog version, so a catalog update never serves stale matches: old
+versions simply stop being looked up and age out of the LRU.
+
+Like the LLM response cache, an in-memory LRU sits in front of an SQLite
+store, which worker processes on the same host share.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from utils.activity_index import preference_activities
+from utils.catalog import BASE_DIR, normalize_text, resolve_price_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MATCH_CACHE_PATH = os.path.join(BASE_DIR, ".cache", "match_cache.sqlite")
+
+
+def _budget(preferences: Dict[str, Any]) -> Optional[float]:
+    budget = preferences.get('budget')
+    try:
+        return float(budget) if budget is not None else None
+    except (ValueError, TypeError):
+        return None
+
+
+def _duration(preferences: Dict[str, Any]) -> Optional[int]:
+    duration = preferences.get('duration_days')
+    if duration is None:
+        duration = preferences.get('duration')
+    try:
+        return int(duration) if duration is not None else None
+    except (ValueError, TypeError, OverflowError):
+        return None
+
+
+def preference_key(preferences: Dict[str, Any]) -> Tuple:
+    """
+    The preferences as the matcher sees them: states with the same key get the
+    same matches. The budget stays exact (as a number), since the budget points
+    are relative to it and any coarser bucket could change the ranking.
+    """
+    return (
+        normalize_text(preferences.get('package_type')),
+        normalize_text(preferences.get('destination')),
+        _budget(preferences),
+        _duration(preferences),
+        resolve_price_key(preferences.get('traveler_type')),
+        tuple(sorted(preference_activities(preferences))),
+    )
+
+
+def match_key(preferences: Dict[str, Any], version: int, limit: int) -> str:
+    """Cache key of a match of `limit` packages against catalog `version`"""
+    payload = json.dumps([version, limit, *preference_key(preferences)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MatchCache:
+    """
+    Two-level cache of match results: an in-memory LRU bounded by
+    `max_memory_entries` in front of an SQLite store bounded by
+    `max_disk_entries` (least recently used rows are evicted first).
+    Entries are JSON objects, stored serialized so callers get their own copy.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = DEFAULT_MATCH_CACHE_PATH,
+        max_memory_entries: int = 256,
+        max_disk_entries: int = 10_000,
+    ):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        self._conn: Optional[sqlite3.Connection] = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS match_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS match_cache_accessed ON match_cache (accessed_at)")
+            self._conn.commit()
+
+    def _remember(self, key: str, value: str):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _evict_disk(self):
+        """
+        Deletes the least recently used rows beyond max_disk_entries. Counted in
+        the database, since other processes write to it too.
+        """
+        cursor = self._conn.execute(
+            "DELETE FROM match_cache WHERE accessed_at < "
+            "(SELECT accessed_at FROM match_cache ORDER BY accessed_at DESC LIMIT 1 OFFSET ?)",
+            (self.max_disk_entries - 1,),
+        )
+        self._stats["evictions"] += max(cursor.rowcount, 0)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return json.loads(value)
+
+            if self._conn is not None:
+                row = self._conn.execute("SELECT value FROM match_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._conn.execute("UPDATE match_cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+                    self._conn.commit()
+                    self._remember(key, row[0])
+                    self._stats["disk_hits"] += 1
+                    return json.loads(row[0])
+
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        try:
+            value = json.dumps(entry)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Not caching match {key[:12]}: {e}")
+            return
+        with self._lock:
+            self._remember(key, value)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO match_cache (key, value, accessed_at) VALUES (?, ?, ?)",
+                    (key, value, time.time()),
+                )
+                self._evict_disk()
+                self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM match_cache")
+                self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current sizes"""
+        with self._lock:
+            stats = dict(self._stats)
+            lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+            stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_entries"] = (
+                self._conn.execute("SELECT COUNT(*) FROM match_cache").fetchone()[0] if self._conn is not None else 0
+            )
+            return stats
+
+
+_cache: Optional[MatchCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_match_cache() -> Optional[MatchCache]:
+    """
+    Returns the process-wide match cache, or None when MATCH_CACHE_DISABLED is set.
+
+    Configured through MATCH_CACHE_PATH (empty for memory only),
+    MATCH_CACHE_MEMORY_ENTRIES and MATCH_CACHE_DISK_ENTRIES.
+    """
+    global _cache
+    if os.getenv("MATCH_CACHE_DISABLED", "").lower() in ("1", "true", "yes"):
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = MatchCache(
+                    path=os.getenv("MATCH_CACHE_PATH", DEFAULT_MATCH_CACHE_PATH) or None,
+                    max_memory_entries=int(os.getenv("MATCH_CACHE_MEMORY_ENTRIES", "256")),
+                    max_disk_entries=int(os.getenv("MATCH_CACHE_DISK_ENTRIES", "10000")),
+                )
+    return _cache
+
@@ -1,47 +1,44 @@
+import heapq
 import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, NamedTuple, Optional, Tuple, Union
 
-def calculate_similarity_score(preferences: Dict[str, Any], package: Dict[str, Any]) -> float:
+from models import Package
+from utils.catalog import PackageCatalog, normalize_text, package_activity_text, resolve_price_key
+from utils.activity_index import preference_activities
+from utils.activity_vectors import activity_similarity
+from utils.fuzzy_match import destination_similarity, package_type_similarity, points
+from utils.tracing import get_tracer
+
+def score_breakdown(preferences: Dict[str, Any], package: Dict[str, Any]) -> Dict[str, float]:
     """
-    Calculates a similarity score between user preferences and a travel package.
+    Calculates the per-feature points between user preferences and a travel package.
     
-    Scores are based on:
-    - Destination match: 100 points
-    - Package type match: 50 points
+    Points are based on:
+    - Destination match: 100 points, scaled by similarity for close spellings
+    - Package type match: 50 points exact / 25 partial, scaled by similarity for close spellings
     - Budget match: up to 40 points
     - Duration match: up to 30 points
-    - Activity match: 15 points per matching activity
+    - Activity match: 15 points per matching activity, scaled by similarity for related plans
     """
-    score = 0.0
+    breakdown = {'destination': 0.0, 'package_type': 0.0, 'budget': 0.0, 'duration': 0.0, 'activities': 0.0}
     
-    # 1. Destination match (High priority)
+    # 1. Destination match (High priority): substring or alias, else trigram similarity
     pref_dest = str(preferences.get('destination') or '').lower().strip()
     pkg_dest = str(package.get('destination') or '').lower().strip()
-    if pref_dest and pref_dest in pkg_dest:
-        score += 100
+    breakdown['destination'] = points(100, destination_similarity(pref_dest, pkg_dest))
     
-    # 2. Package type match
+    # 2. Package type match: exact (or alias) 50, partial 25, else trigram similarity
     pref_type = str(preferences.get('package_type') or '').lower().strip()
     pkg_type = str(package.get('package_type') or '').lower().strip()
-    if pref_type and pref_type == pkg_type:
-        score += 50
-    elif pref_type and (pref_type in pkg_type or pkg_type in pref_type):
-        score += 25
+    breakdown['package_type'] = points(50, package_type_similarity(pref_type, pkg_type))
         
     # 3. Budget match
     # budget is usually a total or per person limit. 
     # Packages.json has prices for solo, couple, family_4
-    traveler_type = str(preferences.get('traveler_type') or 'solo').lower()
     budget = preferences.get('budget')
     
-    # Normalize traveler type for price lookup
-    price_key = traveler_type
-    if 'couple' in traveler_type:
-        price_key = 'couple'
-    elif 'family' in traveler_type:
-        price_key = 'family_4'
-    elif 'solo' in traveler_type:
-        price_key = 'solo'
+    # Normalize traveler type for price lookup (PRICE_TIER_POLICY)
+    price_key = resolve_price_key(preferences.get('traveler_type'))
         
     pkg_prices = package.get('price', {})
     if isinstance(pkg_prices, (int, float)):
@@ -60,11 +57,11 @@ def calculate_similarity_score(preferences: Dict[str, Any], package: Dict[str, A
             budget_val = float(budget)
             pkg_price_val = float(pkg_price)
             if pkg_price_val <= budget_val:
-                score += 40
+                breakdown['budget'] = 40
             elif pkg_price_val <= budget_val * 1.2: # within 20%
-                score += 20
+                breakdown['budget'] = 20
             elif pkg_price_val <= budget_val * 1.5: # within 50%
-                score += 10
+                breakdown['budget'] = 10
         except (ValueError, TypeError):
             pass
             
@@ -82,50 +79,188 @@ def calculate_similarity_score(preferences: Dict[str, Any], package: Dict[str, A
             pkg_dur_val = int(pkg_duration)
             diff = abs(pref_dur_val - pkg_dur_val)
             if diff == 0:
-                score += 30
+                breakdown['duration'] = 30
             elif diff == 1:
-                score += 15
+                breakdown['duration'] = 15
             elif diff == 2:
-                score += 5
+                breakdown['duration'] = 5
         except (ValueError, TypeError):
             pass
             
-    # 5. Activity match
-    pref_activities = preferences.get('activity', [])
-    if isinstance(pref_activities, str):
-        pref_activities = [pref_activities]
-        
+    # 5. Activity match (accepts both `activity` and `activities`)
+    pref_activities = preference_activities(preferences)
     if pref_activities:
-        pkg_days = package.get('day_plans', [])
-        pkg_activities_text = ""
-        for day in pkg_days:
-            pkg_activities_text += " " + day.get('primary_plan', '').lower()
-            pkg_activities_text += " " + " ".join([a.lower() for a in day.get('alternative_plans', [])])
-            
+        pkg_activities_text = package_activity_text(package)
         for act in pref_activities:
-            if str(act).lower() in pkg_activities_text:
-                score += 15
+            if act in pkg_activities_text:
+                breakdown['activities'] += 15
+            else:
+                # Semantically similar plans ("hiking" ~ "short trek") earn partial points
+                breakdown['activities'] += points(15, activity_similarity(act, package))
             
-    return score
+    return breakdown
+
+
+def calculate_similarity_score(preferences: Dict[str, Any], package: Dict[str, Any]) -> float:
+    """
+    Calculates a similarity score between user preferences and a travel package.
+
+    The score is the sum of `score_breakdown`:
+    - Destination match: 100 points (fewer for a close spelling)
+    - Package type match: 50 points
+    - Budget match: up to 40 points
+    - Duration match: up to 30 points
+    - Activity match: 15 points per matching activity (fewer for a related plan)
+    """
+    return sum(score_breakdown(preferences, package).values())
+
+
+class PreparedPreferences(NamedTuple):
+    """Preferences resolved once per query against a catalog, for scoring typed packages"""
+    destination_points: Dict[str, float]
+    type_points: Dict[str, float]
+    budget: Optional[float]
+    price_key: str
+    duration: Optional[int]
 
-def get_most_similar_packages(preferences: Dict[str, Any], all_packages: List[Dict[str, Any]], limit: int = 5) -> List[Dict[str, Any]]:
+
+def prepare_preferences(preferences: Dict[str, Any], catalog: PackageCatalog) -> PreparedPreferences:
+    """Destination and type points per normalized catalog value, budget and duration as numbers"""
+    budget = preferences.get('budget')
+    try:
+        budget = float(budget) if budget is not None else None
+    except (ValueError, TypeError):
+        budget = None
+    duration = preferences.get('duration_days')
+    if duration is None:
+        duration = preferences.get('duration')
+    try:
+        duration = int(duration) if duration is not None else None
+    except (ValueError, TypeError):
+        duration = None
+    destination_scores = catalog.destination_scores(normalize_text(preferences.get('destination')))
+    type_scores = catalog.type_scores(normalize_text(preferences.get('package_type')))
+    return PreparedPreferences(
+        {key: points(100, score) for key, score in destination_scores.items()},
+        {key: points(50, score) for key, score in type_scores.items()},
+        budget,
+        resolve_price_key(preferences.get('traveler_type')),
+        duration,
+    )
+
+
+def package_points(prefs: PreparedPreferences, package: Package) -> float:
+    """
+    calculate_similarity_score without the activity points, for a typed
+    package: destination and type points are looked up by the package's
+    normalized values, the rest are comparisons.
+    """
+    total = prefs.destination_points.get(package.destination_key, 0.0)
+    total += prefs.type_points.get(package.type_key, 0.0)
+    if prefs.budget is not None:
+        price = package.price.get(prefs.price_key)
+        if price is not None:
+            if price <= prefs.budget:
+                total += 40
+            elif price <= prefs.budget * 1.2:
+                total += 20
+            elif price <= prefs.budget * 1.5:
+                total += 10
+    if prefs.duration is not None and package.duration_days is not None:
+        diff = abs(prefs.duration - package.duration_days)
+        if diff == 0:
+            total += 30
+        elif diff == 1:
+            total += 15
+        elif diff == 2:
+            total += 5
+    return total
+
+
+class MatchResult(NamedTuple):
+    """A scored package. Refers to the catalog dict instead of copying it."""
+    score: float
+    package: Dict[str, Any]
+    position: int
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Copy of the package with `match_score` attached"""
+        pkg_copy = self.package.copy()
+        pkg_copy['match_score'] = self.score
+        return pkg_copy
+
+
+def _select_top_k(scored: Iterable[Tuple[float, int, Dict[str, Any]]], limit: int) -> List[MatchResult]:
+    """Keeps the best `limit` (score, position, package) triples with score > 0"""
+    if limit <= 0:
+        return []
+
+    # Heap entries are (score, -position, package): the root is the weakest
+    # match, and on equal scores the one seen last. Positions are unique, so
+    # package dicts are never compared.
+    heap = []
+    for score, position, pkg in scored:
+        if score <= 0:
+            continue
+        entry = (score, -position, pkg)
+        if len(heap) < limit:
+            heapq.heappush(heap, entry)
+        elif entry[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, entry)
+
+    heap.sort(reverse=True, key=lambda e: e[:2])
+    return [MatchResult(score, pkg, -neg_position) for score, neg_position, pkg in heap]
+
+
+def top_k_matches(preferences: Dict[str, Any], packages: Iterable[Dict[str, Any]], limit: int = 5) -> List[MatchResult]:
+    """
+    Streams any iterable of packages (generators included) through a bounded
+    min-heap and returns the best `limit` matches with score > 0.
+
+    Uses O(limit) memory and O(n log limit) time. Ties go to the package seen
+    first, the same order a stable sort of the full list gives.
+    """
+    scored = (
+        (calculate_similarity_score(preferences, pkg), position, pkg)
+        for position, pkg in enumerate(packages)
+    )
+    return _select_top_k(scored, limit)
+
+
+def catalog_top_k_matches(preferences: Dict[str, Any], catalog: PackageCatalog, limit: int = 5) -> List[MatchResult]:
+    """
+    top_k_matches over a PackageCatalog: only index candidates are scored, on
+    the typed records with preferences normalized once, and activities come
+    from the catalog's activity index and matrix instead of rebuilding each
+    package's plan text. Only the winners are turned into dicts.
+    """
+    activity_points = catalog.activity_points(preference_activities(preferences))
+    prefs = prepare_preferences(preferences, catalog)
+    records = catalog.records
+
+    scored = (
+        (package_points(prefs, records[pos]) + activity_points.get(pos, 0), pos, records[pos])
+        for pos in catalog.candidate_positions(preferences)
+    )
+    return [MatchResult(match.score, match.package.to_dict(), match.position) for match in _select_top_k(scored, limit)]
+
+
+def get_most_similar_packages(preferences: Dict[str, Any], all_packages: Union[PackageCatalog, Iterable[Dict[str, Any]]], limit: int = 5) -> List[Dict[str, Any]]:
     """
     Returns the top N packages that match the user preferences based on similarity scoring.
+
+    When given a PackageCatalog, only the candidates from its indexes are scored
+    instead of the whole package list. A compiled catalog (utils.packed_catalog)
+    scores its own columns and only materializes the winners. Only the winners
+    are copied.
     """
-    scored_packages = []
-    for pkg in all_packages:
-        score = calculate_similarity_score(preferences, pkg)
-        scored_packages.append((score, pkg))
-    
-    # Sort by score descending
-    scored_packages.sort(key=lambda x: x[0], reverse=True)
-    
-    # Return top N packages with score > 0
-    results = []
-    for score, pkg in scored_packages[:limit]:
-        if score > 0:
-            pkg_copy = pkg.copy()
-            pkg_copy['match_score'] = score
-            results.append(pkg_copy)
-            
-    return results
+    source = type(all_packages).__name__
+    with get_tracer().span("matcher.top_k", "matcher", source=source, limit=limit) as span:
+        if hasattr(all_packages, 'top_k'):
+            results = all_packages.top_k(preferences, limit)
+        elif isinstance(all_packages, PackageCatalog):
+            results = [match.as_dict() for match in catalog_top_k_matches(preferences, all_packages, limit)]
+        else:
+            results = [match.as_dict() for match in top_k_matches(preferences, all_packages, limit)]
+        span.set("results", len(results))
+        return results
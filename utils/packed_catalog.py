@@ -0,0 +1,508 @@
+"""
+Compiled, memory-mapped columnar package catalog.
+
+`compile_catalog` turns a JSON catalog into one binary file:
+- fixed-width columns for what the matcher reads: destination / type /
+  season codes, durations, one price column per price key
+- interned string tables for destinations, package types and seasons
+- package ids as a string table
+- day plans stored once each and referenced per package through offsets
+- a per-package override blob for values the columns can't reproduce exactly
+  (usually empty), so materialized packages equal the JSON ones
+
+`PackedCatalog.open` memory-maps the file: columns are NumPy views on the map,
+so worker processes share one copy through the page cache. Scoring runs on the
+columns (`ScoringEngine.from_columns`); package dicts are only built for the
+final top-k.
+
+Usage: python -m utils.packed_catalog [SOURCE.json] [-o OUTPUT.pcat]
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from models import _same
+from utils.catalog import DEFAULT_PACKAGE_FILE, PackageCatalog, normalize_text, package_activity_text, resolve_price_key
+from utils.catalog_manager import file_version, get_catalog, get_catalog_manager
+from utils.activity_index import ActivityIndex
+from utils.activity_vectors import ActivityMatrix, load_or_build, plan_texts
+from utils.fuzzy_match import lookup_destination, ranked
+from utils.price_index import PriceIndex, budget_hint
+from utils.scoring import ScoringEngine
+
+MAGIC = b"PKGCAT\x00\x01"
+FORMAT_VERSION = 1
+_ALIGN = 64
+_MISSING = -1
+
+# Compiled catalog used by get_search_catalog; defaults to the JSON path with .pcat
+PACKED_CATALOG_FILE = os.getenv("PACKED_CATALOG_FILE", os.path.splitext(DEFAULT_PACKAGE_FILE)[0] + ".pcat")
+
+# Materialized key order (the order of dataset/Packages.json)
+_FIELDS = ("package_id", "package_type", "destination", "duration_days", "price", "best_season", "day_plans")
+
+
+class StringTable:
+    """Strings stored as one UTF-8 blob plus an offsets array (n + 1 entries)"""
+
+    def __init__(self, offsets: np.ndarray, blob: Union[memoryview, bytes]):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return bytes(self.blob[int(self.offsets[i]):int(self.offsets[i + 1])]).decode("utf-8")
+
+    def all(self) -> List[str]:
+        data = bytes(self.blob[:int(self.offsets[-1])]).decode("utf-8") if len(self) else ""
+        # Offsets are in bytes; only slice the decoded text directly when it is ASCII
+        if len(data) == int(self.offsets[-1]):
+            bounds = self.offsets.tolist()
+            return [data[bounds[i]:bounds[i + 1]] for i in range(len(self))]
+        return [self[i] for i in range(len(self))]
+
+
+def _string_table(values: Sequence[str]) -> Tuple[np.ndarray, bytes]:
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+    if encoded:
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return offsets, b"".join(encoded)
+
+
+def _intern(values: Sequence[Any]) -> Tuple[List[str], np.ndarray]:
+    """Codes into a table of distinct strings; None -> -1"""
+    table: Dict[str, int] = {}
+    codes = np.full(len(values), _MISSING, dtype="<i4")
+    for i, value in enumerate(values):
+        if value is not None:
+            codes[i] = table.setdefault(str(value), len(table))
+    return list(table), codes
+
+
+def _data_start(header_len: int) -> int:
+    """Sections start at the first aligned offset after the header"""
+    return -(-(len(MAGIC) + 8 + header_len) // _ALIGN) * _ALIGN
+
+
+def _number(value: float) -> Union[int, float]:
+    return int(value) if float(value).is_integer() else float(value)
+
+
+def _reconstruct(
+    package_id: str,
+    package_type: Optional[str],
+    destination: Optional[str],
+    duration: Optional[int],
+    prices: Dict[str, Any],
+    season: Optional[str],
+    day_plans: List[Any],
+) -> Dict[str, Any]:
+    """A package as rebuilt from the columns alone"""
+    pkg: Dict[str, Any] = {"package_id": package_id}
+    if package_type is not None:
+        pkg["package_type"] = package_type
+    if destination is not None:
+        pkg["destination"] = destination
+    if duration is not None:
+        pkg["duration_days"] = duration
+    pkg["price"] = prices
+    if season is not None:
+        pkg["best_season"] = season
+    pkg["day_plans"] = day_plans
+    return pkg
+
+
+def _price_columns(packages: Sequence[Dict[str, Any]]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """Same price layout as ScoringEngine: NaN for unusable values, scalars in every column"""
+    keys = {'solo'}
+    for pkg in packages:
+        prices = pkg.get('price', {})
+        if isinstance(prices, dict):
+            keys.update(str(key) for key in prices.keys())
+    price_keys = sorted(keys)
+    column = {key: i for i, key in enumerate(price_keys)}
+    values = np.full((len(packages), len(price_keys)), np.nan, dtype="<f8")
+    present = np.zeros((len(packages), len(price_keys)), dtype="u1")
+    for row, pkg in enumerate(packages):
+        prices = pkg.get('price', {})
+        if isinstance(prices, (int, float)):
+            prices = {key: prices for key in price_keys}
+        elif not isinstance(prices, dict):
+            continue
+        for key, value in prices.items():
+            col = column[str(key)]
+            present[row, col] = value is not None
+            try:
+                values[row, col] = float(value)
+            except (ValueError, TypeError):
+                pass
+    return price_keys, values, present
+
+
+def _row_prices(price_keys: Sequence[str], values: np.ndarray, present: np.ndarray) -> Dict[str, Any]:
+    return {key: _number(values[i]) for i, key in enumerate(price_keys) if present[i] and not np.isnan(values[i])}
+
+
+def compile_catalog(packages: Union[str, Sequence[Dict[str, Any]]], output_path: str) -> int:
+    """
+    Writes the compiled catalog for `packages` (a list, or a JSON file path)
+    to `output_path`, atomically. Returns the number of packages.
+    """
+    if isinstance(packages, str):
+        with open(packages, "r", encoding="utf-8") as f:
+            packages = json.load(f)
+    n = len(packages)
+
+    destinations, destination_codes = _intern([pkg.get('destination') for pkg in packages])
+    package_types, type_codes = _intern([pkg.get('package_type') for pkg in packages])
+    seasons, season_codes = _intern([pkg.get('best_season') for pkg in packages])
+
+    durations = np.zeros(n, dtype="<i8")
+    duration_valid = np.zeros(n, dtype="u1")
+    for row, pkg in enumerate(packages):
+        try:
+            durations[row] = int(pkg.get('duration_days'))
+            duration_valid[row] = 1
+        except (ValueError, TypeError, OverflowError):
+            pass
+
+    price_keys, prices, price_present = _price_columns(packages)
+
+    # Day plans: each distinct day once, packages reference them by index
+    day_table: Dict[str, int] = {}
+    day_ids: Dict[int, Tuple[Any, int]] = {}
+    day_refs: List[int] = []
+    day_offsets = np.zeros(n + 1, dtype="<u8")
+    extras: List[str] = []
+    for row, pkg in enumerate(packages):
+        day_plans = pkg.get('day_plans', [])
+        day_plans = day_plans if isinstance(day_plans, list) else []
+        for day in day_plans:
+            # Catalogs often share day dicts between packages; serialize each once
+            ref = day_ids.get(id(day))
+            if ref is None or ref[0] is not day:
+                key = json.dumps(day, ensure_ascii=False, separators=(",", ":"))
+                ref = day_ids[id(day)] = (day, day_table.setdefault(key, len(day_table)))
+            day_refs.append(ref[1])
+        day_offsets[row + 1] = len(day_refs)
+
+        # Whatever the columns don't reproduce exactly goes into the override blob
+        rebuilt = _reconstruct(
+            str(pkg.get('package_id')),
+            package_types[type_codes[row]] if type_codes[row] != _MISSING else None,
+            destinations[destination_codes[row]] if destination_codes[row] != _MISSING else None,
+            int(durations[row]) if duration_valid[row] else None,
+            _row_prices(price_keys, prices[row], price_present[row]),
+            seasons[season_codes[row]] if season_codes[row] != _MISSING else None,
+            day_plans,
+        )
+        overrides = {key: value for key, value in pkg.items() if key not in rebuilt or not _same(rebuilt[key], value)}
+        absent = [key for key in rebuilt if key not in pkg]
+        extras.append(json.dumps([overrides, absent], ensure_ascii=False) if overrides or absent else "")
+
+    sections: Dict[str, np.ndarray] = {}
+
+    def add_table(name: str, values: Sequence[str]):
+        offsets, blob = _string_table(values)
+        sections[f"{name}_offsets"] = offsets
+        sections[f"{name}_blob"] = np.frombuffer(blob, dtype="u1")
+
+    add_table("ids", [str(pkg.get('package_id')) for pkg in packages])
+    add_table("destinations", destinations)
+    add_table("package_types", package_types)
+    add_table("seasons", seasons)
+    add_table("days", list(day_table))
+    add_table("extras", extras)
+    sections.update({
+        "destination_codes": destination_codes,
+        "package_type_codes": type_codes,
+        "season_codes": season_codes,
+        "durations": durations,
+        "duration_valid": duration_valid,
+        "prices": prices,
+        "price_present": price_present,
+        "day_offsets": day_offsets,
+        "day_refs": np.asarray(day_refs, dtype="<u4"),
+    })
+
+    # Header (JSON directory of sections), then 64-byte aligned sections
+    directory: Dict[str, Dict[str, Any]] = {}
+    header: Dict[str, Any] = {"version": FORMAT_VERSION, "count": n, "price_keys": price_keys, "sections": directory}
+    offset = 0
+    for name, array in sections.items():
+        directory[name] = {"offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+        offset += -(-array.nbytes // _ALIGN) * _ALIGN
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = _data_start(len(header_bytes))
+
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in sections.items():
+            f.seek(data_start + directory[name]["offset"])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, output_path)
+    return n
+
+
+class _LazyActivityIndex:
+    """Builds the activity phrase index from the day plans on the first lookup"""
+
+    def __init__(self, catalog: "PackedCatalog"):
+        self._catalog = catalog
+        self._index: Optional[ActivityIndex] = None
+        self._lock = threading.Lock()
+
+    def _get(self) -> ActivityIndex:
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = ActivityIndex(self._catalog.activity_texts())
+        return self._index
+
+    def lookup(self, phrase: str) -> frozenset:
+        return self._get().lookup(phrase)
+
+    def match_counts(self, activities) -> Dict[int, int]:
+        return self._get().match_counts(activities)
+
+
+class PackedCatalog:
+    """
+    Read-only view of a compiled catalog file.
+
+    Offers the parts of PackageCatalog the agents use (len, iteration, get,
+    destination_names, activity_index, activity_matrix, the budget suggestions) plus `top_k`,
+    which scores on the memory-mapped columns and only materializes the
+    returned packages.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        # Identifies the compiled file for caches (see utils.catalog_manager)
+        self.version = file_version(path)
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a compiled package catalog")
+        (header_len,) = struct.unpack_from("<Q", self._map, len(MAGIC))
+        header = json.loads(bytes(self._map[len(MAGIC) + 8:len(MAGIC) + 8 + header_len]))
+        if header.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compiled catalog version {header.get('version')} in {path}")
+        self._count: int = header["count"]
+        self.price_keys: List[str] = header["price_keys"]
+
+        data_start = _data_start(header_len)
+        self._columns: Dict[str, np.ndarray] = {}
+        for name, spec in header["sections"].items():
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"])) if spec["shape"] else 1
+            array = np.frombuffer(self._map, dtype=dtype, count=count, offset=data_start + spec["offset"])
+            self._columns[name] = array.reshape(spec["shape"])
+
+        self.ids = self._table("ids")
+        self.destinations = self._table("destinations").all()
+        self.package_types = self._table("package_types").all()
+        self.seasons = self._table("seasons").all()
+        self._days = self._table("days")
+        self._extras = self._table("extras")
+        self._id_rows: Optional[Dict[str, int]] = None
+        self._lock = threading.Lock()
+
+        self.destination_names: Dict[str, str] = {}
+        for destination in self.destinations:
+            key = normalize_text(destination)
+            if key:
+                self.destination_names.setdefault(key, destination.strip())
+
+        self.activity_index = _LazyActivityIndex(self)
+        self._activity_matrix: Optional[ActivityMatrix] = None
+        self.engine = ScoringEngine.from_columns(
+            destinations=[normalize_text(d) for d in self.destinations] + [""],   # code -1 -> ""
+            destination_codes=self._columns["destination_codes"],
+            package_types=[normalize_text(t) for t in self.package_types] + [""],
+            package_type_codes=self._columns["package_type_codes"],
+            price_keys=self.price_keys,
+            prices=self._columns["prices"],
+            price_present=self._columns["price_present"].view(bool),
+            durations=self._columns["durations"],
+            duration_valid=self._columns["duration_valid"].view(bool),
+            activity_index=self.activity_index,
+            activity_matrix=lambda: self.activity_matrix,
+            materialize=self.package,
+        )
+        # Sorted per price key on first use, from the resolved price columns
+        self.price_index = PriceIndex(self.engine._resolved_prices, self.price_keys)
+
+    @classmethod
+    def open(cls, path: str = PACKED_CATALOG_FILE) -> "PackedCatalog":
+        return cls(path)
+
+    def _table(self, name: str) -> StringTable:
+        return StringTable(self._columns[f"{name}_offsets"], memoryview(self._columns[f"{name}_blob"]))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return (self.package(row) for row in range(self._count))
+
+    def package(self, row: int) -> Dict[str, Any]:
+        """Materializes the package at `row`"""
+        c = self._columns
+        start, end = int(c["day_offsets"][row]), int(c["day_offsets"][row + 1])
+        day_plans = [json.loads(self._days[int(ref)]) for ref in c["day_refs"][start:end]]
+        type_code, dest_code, season_code = (int(c["package_type_codes"][row]), int(c["destination_codes"][row]),
+                                             int(c["season_codes"][row]))
+        pkg = _reconstruct(
+            self.ids[row],
+            self.package_types[type_code] if type_code != _MISSING else None,
+            self.destinations[dest_code] if dest_code != _MISSING else None,
+            int(c["durations"][row]) if c["duration_valid"][row] else None,
+            _row_prices(self.price_keys, c["prices"][row], c["price_present"][row]),
+            self.seasons[season_code] if season_code != _MISSING else None,
+            day_plans,
+        )
+        extra = self._extras[row]
+        if extra:
+            overrides, absent = json.loads(extra)
+            for key in absent:
+                pkg.pop(key, None)
+            pkg.update(overrides)
+        return pkg
+
+    def get(self, package_id: Any) -> Optional[Dict[str, Any]]:
+        """The package with this package_id, if any (first one, like PackageCatalog)"""
+        if self._id_rows is None:
+            with self._lock:
+                if self._id_rows is None:
+                    rows: Dict[str, int] = {}
+                    for row, value in enumerate(self.ids.all()):
+                        rows.setdefault(value, row)
+                    self._id_rows = rows
+        row = self._id_rows.get(str(package_id))
+        return self.package(row) if row is not None else None
+
+    def activity_texts(self) -> Iterator[str]:
+        """package_activity_text of every package, computed once per distinct day"""
+        day_text = [package_activity_text({"day_plans": [json.loads(day)]}) for day in self._days.all()]
+        offsets = self._columns["day_offsets"].tolist()
+        refs = self._columns["day_refs"].tolist()
+        for row in range(self._count):
+            yield "".join(day_text[ref] for ref in refs[offsets[row]:offsets[row + 1]])
+
+    @property
+    def activity_matrix(self) -> ActivityMatrix:
+        """Semantic activity matrix over the stored days, loaded from next to the file or built on first use"""
+        if self._activity_matrix is None:
+            with self._lock:
+                if self._activity_matrix is None:
+                    self._activity_matrix = load_or_build(self.path, self._build_activity_matrix)
+        return self._activity_matrix
+
+    def _build_activity_matrix(self) -> ActivityMatrix:
+        day_plans = [plan_texts({"day_plans": [json.loads(day)]}) for day in self._days.all()]
+        offsets = self._columns["day_offsets"].tolist()
+        refs = self._columns["day_refs"].tolist()
+        return ActivityMatrix.from_days((refs[offsets[row]:offsets[row + 1]] for row in range(self._count)), day_plans)
+
+    def top_k(self, preferences: Dict[str, Any], limit: int = 5) -> List[Dict[str, Any]]:
+        """Same result as get_most_similar_packages over the source JSON"""
+        return self.engine.top_k(preferences, limit)
+
+    def match_destination(self, text: str, spans: bool = True) -> List[Tuple[str, float]]:
+        """Catalog destinations (as written) ranked by similarity to free text, best first"""
+        scores = lookup_destination(normalize_text(text), self.engine.destination_index, spans)
+        return [(self.destination_names[key], score) for key, score in ranked(scores)]
+
+    # Budget suggestions (same results as PackageCatalog's)
+
+    def budget_scope(self, preferences: Dict[str, Any]) -> Optional[np.ndarray]:
+        """Rows matching the chosen destination and package type, None when neither is chosen"""
+        engine = self.engine
+        has_destination = bool(normalize_text(preferences.get('destination')))
+        has_type = bool(normalize_text(preferences.get('package_type')))
+        if not has_destination and not has_type:
+            return None
+        mask = np.ones(self._count, dtype=bool)
+        if has_destination:
+            mask &= (engine._destination_points(preferences) > 0)[engine.destination_codes]
+        if has_type:
+            mask &= (engine._type_points(preferences) > 0)[engine.package_type_codes]
+        return np.flatnonzero(mask)
+
+    def cheapest_k(self, preferences: Dict[str, Any], k: int = 3) -> List[Dict[str, Any]]:
+        price_key = resolve_price_key(preferences.get('traveler_type'))
+        return [self.package(row) for _, row in self.price_index.cheapest_k(price_key, k, self.budget_scope(preferences))]
+
+    def price_histogram(self, preferences: Dict[str, Any], bins: int = 5) -> List[Tuple[float, float, int]]:
+        price_key = resolve_price_key(preferences.get('traveler_type'))
+        return self.price_index.price_histogram(price_key, bins, self.budget_scope(preferences))
+
+    def budget_hint(self, preferences: Dict[str, Any]) -> str:
+        price_key = resolve_price_key(preferences.get('traveler_type'))
+        return budget_hint(self.price_index, price_key, preferences.get('budget'), self.budget_scope(preferences))
+
+
+_packed: Dict[str, PackedCatalog] = {}
+_packed_lock = threading.Lock()
+
+
+def get_packed_catalog(path: str = PACKED_CATALOG_FILE) -> PackedCatalog:
+    """
+    Returns the process-wide memory-mapped catalog for `path`, reopened when
+    the file is replaced (compile_catalog swaps it in atomically; readers of
+    the old one keep their map).
+    """
+    catalog = _packed.get(path)
+    if catalog is None or catalog.version != file_version(path):
+        with _packed_lock:
+            catalog = _packed.get(path)
+            if catalog is None or catalog.version != file_version(path):
+                catalog = _packed[path] = PackedCatalog.open(path)
+    return catalog
+
+
+def get_search_catalog() -> Union[PackedCatalog, PackageCatalog]:
+    """
+    The catalog to match against: the compiled one when PACKED_CATALOG_FILE
+    exists, is not older than the JSON catalog and no updates are waiting in
+    the update feed (utils.catalog_manager), otherwise the current JSON one.
+    """
+    try:
+        if os.path.getmtime(PACKED_CATALOG_FILE) >= os.path.getmtime(DEFAULT_PACKAGE_FILE):
+            feed_path = get_catalog_manager().feed_path
+            if not feed_path or not os.path.exists(feed_path) or not os.path.getsize(feed_path):
+                return get_packed_catalog(PACKED_CATALOG_FILE)
+    except OSError:
+        pass
+    return get_catalog()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile a JSON package catalog into the memory-mapped format")
+    parser.add_argument("source", nargs="?", default=DEFAULT_PACKAGE_FILE)
+    parser.add_argument("-o", "--output", default=None, help="default: SOURCE with a .pcat extension")
+    args = parser.parse_args()
+    output = args.output or os.path.splitext(args.source)[0] + ".pcat"
+    count = compile_catalog(args.source, output)
+    print(f"Compiled {count} packages into {output} ({os.path.getsize(output)} bytes)")
+    # Saves the activity matrix next to it, so workers don't build it
+    matrix = PackedCatalog.open(output).activity_matrix
+    print(f"Activity matrix: {matrix.n_plans} distinct plans ({matrix.vectorizer})")
+
+
+if __name__ == "__main__":
+    main()
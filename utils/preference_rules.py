@@ -0,0 +1,287 @@
+import re
+from typing import List, Dict, Any, Callable, Iterable, Optional, Tuple
+
+from models import ExtractedPreferences
+
+# Normalization tables mirror prompts/info_collector_prompt.py
+
+PACKAGE_TYPE_SYNONYMS: Dict[str, List[str]] = {
+    "beach": ["beach", "beaches", "seaside", "coastal", "ocean", "sea"],
+    "hills": ["hills", "hill", "mountains", "mountain", "hill stations", "hill station", "highlands"],
+    "heritage": ["heritage", "historical", "historic", "cultural", "monuments", "forts"],
+    "honeymoon": ["honeymoon", "romantic", "couple getaway"],
+    "adventure": ["adventure", "adventurous", "thrilling"],
+    "pilgrimage": ["pilgrimage", "religious", "spiritual", "holy places"],
+}
+
+ACTIVITY_LEXICON: List[str] = [
+    "sightseeing", "beach activities", "water sports", "scuba diving", "snorkeling", "parasailing",
+    "jet skiing", "surfing", "trekking", "hiking", "camping", "rock climbing", "paragliding",
+    "rafting", "kayaking", "temple visits", "cultural tours", "heritage walks", "photography",
+    "shopping", "spa", "nightlife", "adventure sports", "wildlife safari", "bird watching",
+    "cycling", "food tours",
+]
+
+ACTIVITY_SPELLINGS: Dict[str, str] = {
+    "snorkelling": "snorkeling",
+    "scuba": "scuba diving",
+    "watersports": "water sports",
+    "sight seeing": "sightseeing",
+    "birdwatching": "bird watching",
+    "local food": "food tours",
+}
+
+WORD_NUMBERS: Dict[str, int] = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+    "fourteen": 14, "fifteen": 15,
+}
+
+# Words that carry no preference on their own
+FILLER_WORDS = {
+    "i", "im", "i'm", "we", "we're", "me", "my", "our", "us", "you", "it", "its", "that", "this",
+    "is", "are", "am", "be", "was", "will", "would", "could", "can", "should", "do", "does",
+    "want", "wants", "wanna", "like", "love", "prefer", "need", "looking", "look", "planning",
+    "plan", "thinking", "go", "going", "travel", "traveling", "travelling", "trip", "vacation",
+    "holiday", "tour", "package", "packages", "stay", "visit", "make", "change", "set", "keep",
+    "update", "instead", "actually", "please", "pls", "ok", "okay", "yes", "yeah", "sure",
+    "just", "only", "also", "and", "or", "but", "so", "then", "now", "maybe", "for", "of", "to",
+    "in", "on", "at", "a", "an", "the", "with", "around", "about", "approx", "approximately",
+    "roughly", "budget", "max", "maximum", "upto", "up", "under", "below", "within", "less",
+    "than", "between", "total", "per", "person", "days", "day", "duration", "long", "trip's",
+    "rs", "inr", "rupees", "₹", "spend", "spending", "cost", "costing", "lets", "let's", "try", "some", "something", "doing",
+}
+
+# Longest trip a message is read as; longer ("100 days") is left to the LLM
+MAX_DURATION_DAYS = 30
+
+# Fuzzy destination fallback: smallest similarity accepted, and longest leftover it is tried on
+FUZZY_DESTINATION_THRESHOLD = 0.6
+FUZZY_DESTINATION_MAX_WORDS = 3
+
+_NUMBER = r"(\d+(?:\.\d+)?)"
+_CURRENCY = r"(?:₹|(?<![a-z])(?:rs\.?|inr))"
+_COUNT = r"(\d+|" + "|".join(WORD_NUMBERS) + r")"
+
+# Words that make a bare number a budget ("budget 30000", "under 45,000")
+_BUDGET_CUE = (r"(?:budget|spend|spending|under|below|within|upto|up to|max|maximum|around|about|"
+               r"approx|approximately|roughly|less than|cost|costing)")
+
+
+def _to_count(token: str) -> int:
+    token = token.lower()
+    return WORD_NUMBERS[token] if token in WORD_NUMBERS else int(token)
+
+
+def _amount(value: str, unit: Optional[str]) -> float:
+    amount = float(value.replace(",", ""))
+    unit = (unit or "").lower()
+    if unit == "k":
+        amount *= 1000
+    elif unit.startswith("la") or unit == "l":
+        amount *= 100000
+    return amount
+
+
+class _Message:
+    """Lowercased message whose matched spans are blanked out as rules consume them"""
+
+    def __init__(self, text: str):
+        self.text = " " + text.lower() + " "
+        # Set when a rule matched but could not pick a single value
+        self.ambiguous = False
+
+    def take(self, pattern: str) -> List[re.Match]:
+        matches = list(re.finditer(pattern, self.text))
+        for m in reversed(matches):
+            self.text = self.text[:m.start()] + " " * (m.end() - m.start()) + self.text[m.end():]
+        return matches
+
+    def leftover_words(self) -> List[str]:
+        words = re.findall(r"[a-z0-9₹'][a-z0-9']*|₹", self.text)
+        return [w for w in words if w not in FILLER_WORDS]
+
+
+def _party(msg: _Message, count: int) -> Optional[str]:
+    if count < 1:
+        msg.ambiguous = True
+        return None
+    if count == 1:
+        return "solo"
+    return f"family_{count}" if count <= 5 else "group"
+
+
+def _traveler_type(msg: _Message) -> Optional[str]:
+    m = msg.take(r"\bfamily of " + _COUNT + r"\b")
+    if m:
+        return _party(msg, _to_count(m[0].group(1)))
+    m = msg.take(r"\b" + _COUNT + r" (?:people|persons|adults|of us)\b")
+    if m:
+        count = _to_count(m[0].group(1))
+        if count == 2 and "of us" in m[0].group(0):
+            return "couple"
+        return _party(msg, count)
+    if msg.take(r"\b(?:solo|alone|by myself|on my own|just me)\b"):
+        return "solo"
+    # "a couple of days" is a duration, not a traveler type
+    if msg.take(r"\b(?:couple(?! of\b)|my wife|my husband|my partner|my girlfriend|my boyfriend|wife|husband|partner)\b"):
+        return "couple"
+    if msg.take(r"\b(?:group|friends|colleagues|large group)\b"):
+        return "group"
+    return None
+
+
+def _days(msg: _Message, days: int) -> Optional[int]:
+    if not 1 <= days <= MAX_DURATION_DAYS:
+        msg.ambiguous = True
+        return None
+    return days
+
+
+def _duration(msg: _Message) -> Optional[int]:
+    m = msg.take(r"\b" + _COUNT + r"\s*(?:-|to)\s*" + _COUNT + r"\s*(?:days?|nights?)\b")
+    if m:
+        return _days(msg, min(_to_count(m[0].group(1)), _to_count(m[0].group(2))))
+    m = msg.take(r"\b" + _COUNT + r"\s*(?:days?|nights?)\b")
+    if m:
+        return _days(msg, _to_count(m[0].group(1)))
+    m = msg.take(r"\b" + _COUNT + r"\s*weeks?\b")
+    if m:
+        return _days(msg, 7 * _to_count(m[0].group(1)))
+    if msg.take(r"\bweek\b"):
+        return 7
+    if msg.take(r"\b(?:long )?weekend\b"):
+        return 2
+    return None
+
+
+def _budget_cue(text: str, start: int, end: int) -> bool:
+    """A budget cue word within two words before the number, or "budget" right after it"""
+    before = re.search(r"\b" + _BUDGET_CUE + r"\b\W*(?:[a-z]+\W+){0,2}$", text[:start])
+    return bool(before or re.match(r"\s*(?:budget|total)\b", text[end:]))
+
+
+def _budget(msg: _Message) -> Optional[float]:
+    unit = r"\s*(k|lakhs?|lacs?|l)?\b"
+    currency = r"(" + _CURRENCY + r")?\s*"
+    m = msg.take(currency + _NUMBER + unit + r"\s*(?:-|to)\s*" + currency + _NUMBER + unit)
+    if m:
+        low_unit = m[0].group(3) or m[0].group(6)
+        low = _amount(m[0].group(2), low_unit)
+        high = _amount(m[0].group(5), m[0].group(6))
+        if not low_unit and (high < 1000 or not (m[0].group(1) or m[0].group(4)
+                                                 or _budget_cue(msg.text, m[0].start(), m[0].end()))):
+            # "2-3" or "2025-2026" on its own is not clearly money
+            msg.ambiguous = True
+            return None
+        return (low + high) / 2
+    m = msg.take(_CURRENCY + r"?\s*" + _NUMBER + r"\s*(k|lakhs?|lacs?)\b")
+    if m:
+        return _amount(m[0].group(1), m[0].group(2))
+    # Currency-prefixed amounts
+    m = msg.take(_CURRENCY + r"\s*(\d[\d,]*(?:\.\d+)?)")
+    if m:
+        return _amount(m[0].group(1), None)
+    # Bare amounts only next to a budget cue: "2025 trip to goa" is a year, not money
+    m = list(re.finditer(r"\b(\d{1,3}(?:,\d{2,3})+|\d{4,})\b", msg.text))
+    if m:
+        if not _budget_cue(msg.text, m[0].start(), m[0].end()):
+            msg.ambiguous = True
+            return None
+        msg.take(r"\b" + re.escape(m[0].group(0)) + r"\b")
+        return _amount(m[0].group(1), None)
+    return None
+
+
+def _package_type(msg: _Message) -> Optional[str]:
+    found = None
+    for package_type, synonyms in PACKAGE_TYPE_SYNONYMS.items():
+        pattern = r"\b(?:" + "|".join(re.escape(s) for s in sorted(synonyms, key=len, reverse=True)) + r")\b"
+        if msg.take(pattern):
+            if found is not None and found != package_type:
+                msg.ambiguous = True
+                return None
+            found = package_type
+    return found
+
+
+def _destination(msg: _Message, destinations: Iterable[str]) -> Optional[str]:
+    found = [
+        name for name in sorted(set(destinations), key=len, reverse=True)
+        if msg.take(r"\b" + re.escape(name.lower()) + r"\b")
+    ]
+    if len(found) > 1:
+        msg.ambiguous = True
+        return None
+    return found[0] if found else None
+
+
+def _fuzzy_destination(msg: _Message, match_destination: Callable[..., List[Tuple[str, float]]]) -> Optional[str]:
+    """
+    A misspelt or alternative destination name ("manalli", "pondy"), when it is
+    all the message has left: the leftover words as a whole must match one
+    destination better than any other.
+    """
+    words = msg.leftover_words()
+    if not words or len(words) > FUZZY_DESTINATION_MAX_WORDS:
+        return None
+    candidates = match_destination(" ".join(words), spans=False)
+    if not candidates or candidates[0][1] < FUZZY_DESTINATION_THRESHOLD:
+        return None
+    if len(candidates) > 1 and candidates[1][1] == candidates[0][1]:
+        msg.ambiguous = True
+        return None
+    msg.take(r"\b(?:" + "|".join(re.escape(word) for word in words) + r")\b")
+    return candidates[0][0]
+
+
+def _activities(msg: _Message) -> List[str]:
+    activities: List[str] = []
+    # Whole phrases first, so "scuba" is not taken out of "scuba diving"
+    for activity in sorted(ACTIVITY_LEXICON, key=len, reverse=True):
+        if msg.take(r"\b" + re.escape(activity) + r"\b") and activity not in activities:
+            activities.append(activity)
+    for spelling, canonical in ACTIVITY_SPELLINGS.items():
+        if msg.take(r"\b" + re.escape(spelling) + r"\b") and canonical not in activities:
+            activities.append(canonical)
+    return activities
+
+
+def extract_preferences_rules(
+    message: str,
+    destinations: Iterable[str] = (),
+    match_destination: Optional[Callable[..., List[Tuple[str, float]]]] = None,
+) -> Optional[ExtractedPreferences]:
+    """
+    Deterministic extraction for short, explicit messages ("7 days", "budget 30k",
+    "family of 4", "beach trip to Goa").
+
+    `match_destination` (a catalog's fuzzy lookup, see utils.fuzzy_match) lets
+    a misspelt destination ("trip to manalli") be resolved here instead of by
+    the LLM.
+
+    Returns ExtractedPreferences with confidence="high" when every meaningful
+    word of the message is explained by a rule, and None otherwise so the
+    caller falls back to the LLM.
+    """
+    if not message or not message.strip():
+        return None
+
+    msg = _Message(message)
+    fields: Dict[str, Any] = {
+        "traveler_type": _traveler_type(msg),
+        "duration_days": _duration(msg),
+        "budget": _budget(msg),
+        "destination": _destination(msg, destinations),
+        "activities": _activities(msg),
+        "package_type": _package_type(msg),
+    }
+    if fields["destination"] is None and match_destination is not None and not msg.ambiguous:
+        fields["destination"] = _fuzzy_destination(msg, match_destination)
+
+    if msg.ambiguous or msg.leftover_words():
+        return None
+    if not any(fields.values()):
+        return None
+
+    return ExtractedPreferences(confidence="high", **fields)
@@ -0,0 +1,196 @@
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import List, Dict, Any, Callable, Iterable, NamedTuple, Optional, Sequence, Tuple
+
+# The matcher's budget bands: 40 points within budget, 20 within +20%, 10 within +50%
+BUDGET_BANDS = ((1.0, 40), (1.2, 20), (1.5, 10))
+
+
+class PriceTier(NamedTuple):
+    """One price key's prices: by position, and sorted with the matching positions"""
+    column: Sequence[float]
+    prices: Sequence[float]
+    positions: Sequence[int]
+
+
+class PriceIndex:
+    """
+    Per-traveler-tier sorted price arrays, built lazily per price key.
+
+    `price_column(key)` returns the price every package is matched on for a
+    resolved price key (the tier, else the solo fare), NaN or None where there
+    is none. Keys not in `keys` price every package on its solo fare, so they
+    share the 'solo' arrays. Budget questions are then bisections and slices of
+    the sorted arrays instead of a scan over the catalog:
+    - within(key, max_price): positions priced <= max_price, cheapest first
+    - budget_bands(key, budget): how many packages are within budget, +20%, +50%
+    - cheapest_k / price_histogram: for suggesting realistic budgets
+    """
+
+    def __init__(self, price_column: Callable[[str], Sequence[Optional[float]]], keys: Iterable[str]):
+        self._price_column = price_column
+        self.keys = frozenset(keys) | {'solo'}
+        self._tiers: Dict[str, PriceTier] = {}
+
+    def tier(self, price_key: str) -> PriceTier:
+        if price_key not in self.keys:
+            price_key = 'solo'
+        tier = self._tiers.get(price_key)
+        if tier is None:
+            tier = self._tiers[price_key] = self._build(self._price_column(price_key))
+        return tier
+
+    @staticmethod
+    def _build(column: Sequence[Optional[float]]) -> PriceTier:
+        if hasattr(column, 'argsort'):
+            # NumPy column (compiled catalog): sort without a Python-level pass
+            order = column.argsort(kind='stable')
+            order = order[~(column[order] != column[order])]   # drop NaN
+            return PriceTier(column, column[order], order)
+        column = [math.nan if price is None else price for price in column]
+        order = sorted((pos for pos, price in enumerate(column) if price == price), key=column.__getitem__)
+        return PriceTier(column, array('d', (column[pos] for pos in order)), array('q', order))
+
+    def updated(self, price_column: Callable[[str], Sequence[Optional[float]]], keys: Iterable[str],
+                changed: Iterable[int], price_of: Callable[[int, str], Optional[float]]) -> "PriceIndex":
+        """
+        The index of a changed catalog whose packages kept their positions
+        (`changed` ones repriced or replaced, new ones appended). Tiers already
+        built are patched, entry by entry, instead of sorted again;
+        `price_of(position, key)` is a changed package's new price.
+        """
+        index = PriceIndex(price_column, keys)
+        if index.keys != self.keys:
+            return index   # tiers fall back to 'solo' differently: sort again on use
+        changed = sorted(changed)
+        for key, tier in self._tiers.items():
+            if not hasattr(tier.column, 'argsort'):
+                index._tiers[key] = _patched(tier, changed, lambda pos: price_of(pos, key))
+        return index
+
+    def __len__(self) -> int:
+        return len(self.tier('solo').column)
+
+    def within(self, price_key: str, max_price: float) -> Sequence[int]:
+        """Positions of the packages priced <= max_price for the key, cheapest first"""
+        tier = self.tier(price_key)
+        return tier.positions[:bisect_right(tier.prices, max_price)]
+
+    def sorted_prices(self, price_key: str, where: Optional[Iterable[int]] = None) -> Sequence[float]:
+        """Prices for the key in ascending order, only of the `where` positions if given"""
+        tier = self.tier(price_key)
+        if where is None:
+            return tier.prices
+        return [price for price, _ in self._selected(tier, where)]
+
+    def budget_bands(self, price_key: str, budget: float,
+                     where: Optional[Iterable[int]] = None) -> Tuple[int, int, int]:
+        """Packages within budget, within +20% and within +50% (each count includes the cheaper bands)"""
+        return _bands(self.sorted_prices(price_key, where), budget)
+
+    @staticmethod
+    def _selected(tier: PriceTier, where: Iterable[int]) -> List[Tuple[float, int]]:
+        """(price, position) of the priced packages among `where`, sorted"""
+        column = tier.column
+        pairs = [(float(column[pos]), int(pos)) for pos in where]
+        return sorted(pair for pair in pairs if pair[0] == pair[0])
+
+    def cheapest_k(self, price_key: str, k: int, where: Optional[Iterable[int]] = None) -> List[Tuple[float, int]]:
+        """
+        The `k` cheapest (price, position) pairs for the key, ties in catalog
+        order. `where` restricts them to some positions (e.g. a destination's).
+        """
+        if k <= 0:
+            return []
+        tier = self.tier(price_key)
+        if where is not None:
+            return self._selected(tier, where)[:k]
+        return [(float(price), int(pos)) for price, pos in zip(tier.prices[:k], tier.positions[:k])]
+
+    def price_histogram(self, price_key: str, bins: int = 5,
+                        where: Optional[Iterable[int]] = None) -> List[Tuple[float, float, int]]:
+        """
+        (low, high, count) for `bins` equal-width ranges between the cheapest
+        and the dearest price; each range includes its upper bound. Empty when
+        no package has a price.
+        """
+        return _histogram(self.sorted_prices(price_key, where), bins)
+
+
+def _patched(tier: PriceTier, changed: Sequence[int], price_of: Callable[[int], Optional[float]]) -> PriceTier:
+    """A copy of a tier with the `changed` positions taken out and put back at their new price"""
+    column = list(tier.column)
+    prices, positions = array('d', tier.prices), array('q', tier.positions)
+
+    def locate(price: float, pos: int) -> int:
+        # Equal prices are in position order, like the stable sort in _build
+        lo, hi = bisect_left(prices, price), bisect_right(prices, price)
+        return lo + bisect_left(positions[lo:hi], pos)
+
+    for pos in changed:
+        if pos < len(column):
+            old = column[pos]
+            if old == old:
+                i = locate(old, pos)
+                del prices[i]
+                del positions[i]
+        else:
+            column.extend([math.nan] * (pos + 1 - len(column)))
+        price = price_of(pos)
+        column[pos] = price = math.nan if price is None else price
+        if price == price:
+            i = locate(price, pos)
+            prices.insert(i, price)
+            positions.insert(i, pos)
+    return PriceTier(column, prices, positions)
+
+
+def _bands(prices: Sequence[float], budget: float) -> Tuple[int, int, int]:
+    return tuple(bisect_right(prices, budget * factor) for factor, _ in BUDGET_BANDS)
+
+
+def _histogram(prices: Sequence[float], bins: int) -> List[Tuple[float, float, int]]:
+    if not len(prices) or bins <= 0:
+        return []
+    low, high = float(prices[0]), float(prices[-1])
+    if low == high:
+        return [(low, high, len(prices))]
+    width = (high - low) / bins
+    histogram = []
+    start = 0
+    for i in range(bins):
+        upper = high if i == bins - 1 else low + width * (i + 1)
+        end = len(prices) if i == bins - 1 else bisect_right(prices, upper, start)
+        histogram.append((low + width * i, upper, end - start))
+        start = end
+    return histogram
+
+
+def format_price(price: float) -> str:
+    return f"₹{price:,.0f}"
+
+
+def budget_hint(index: PriceIndex, price_key: str, budget: Any = None,
+                where: Optional[Iterable[int]] = None) -> str:
+    """
+    One line on what packages cost for the price key (and the `where`
+    positions), for suggesting a realistic budget. Empty when nothing is priced.
+    """
+    prices = index.sorted_prices(price_key, where)
+    histogram = _histogram(prices, 5)
+    if not histogram:
+        return ""
+    low, high, _ = max(histogram, key=lambda b: b[2])
+    text = (f"{len(prices)} matching packages; the cheapest is {format_price(prices[0])}, "
+            f"most cost {format_price(low)}-{format_price(high)}")
+
+    try:
+        budget = float(budget) if budget is not None else None
+    except (ValueError, TypeError):
+        budget = None
+    if budget is not None and budget == budget:
+        fits, fits_20, fits_50 = _bands(prices, budget)
+        text += (f". For {format_price(budget)}: {fits} within budget, {fits_20 - fits} more within +20%, "
+                 f"{fits_50 - fits_20} more within +50%")
+    return text
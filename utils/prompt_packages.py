@@ -0,0 +1,141 @@
+import logging
+import os
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+from utils.catalog import resolve_price_key
+from utils.matcher import calculate_similarity_score
+from utils.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Approximate token budget for the package table in a prompt
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_PACKAGE_TOKEN_BUDGET", "1500"))
+
+# Columns each agent needs; day plans are reduced to the primary plans
+RESEARCHER_FIELDS = ("package_id", "package_type", "destination", "duration_days", "price", "best_season", "score", "plans")
+RANKING_FIELDS = ("package_id", "package_type", "destination", "duration_days", "price", "score", "plans")
+
+_HEADERS = {
+    "package_id": "id",
+    "package_type": "type",
+    "destination": "destination",
+    "duration_days": "days",
+    "price": "price",
+    "best_season": "season",
+    "score": "match",
+    "plans": "day plans",
+}
+
+
+class SerializedPackages(NamedTuple):
+    """A rendered package table and what it cost"""
+    text: str
+    included: int
+    dropped: int
+    tokens: int
+    baseline_tokens: int   # the same packages as repr() of the full dicts
+
+    @property
+    def saved_tokens(self) -> int:
+        return max(0, self.baseline_tokens - self.tokens)
+
+
+def _cell(value: Any) -> str:
+    return str(value).replace("|", "/").replace("\n", " ")
+
+
+def _price_cell(package: Dict[str, Any], preferences: Optional[Dict[str, Any]]) -> str:
+    prices = package.get("price")
+    if not isinstance(prices, dict):
+        return _cell(prices if prices is not None else "")
+    traveler_type = (preferences or {}).get("traveler_type")
+    if traveler_type:
+        price = prices.get(resolve_price_key(traveler_type))
+        if price is None:
+            price = prices.get("solo")
+        if price is not None:
+            return _cell(price)
+    return ", ".join(f"{key} {value}" for key, value in prices.items())
+
+
+def package_score(package: Dict[str, Any], preferences: Optional[Dict[str, Any]]) -> float:
+    """Matcher score of a package: its match_score if present, else computed"""
+    score = package.get("match_score")
+    if score is None and preferences:
+        score = calculate_similarity_score(preferences, package)
+    return score or 0
+
+
+def package_row(package: Dict[str, Any], fields: Sequence[str], preferences: Optional[Dict[str, Any]] = None) -> str:
+    """One table row for a package"""
+    cells = []
+    for field in fields:
+        if field == "price":
+            cells.append(_price_cell(package, preferences))
+        elif field == "score":
+            cells.append(_cell(round(package_score(package, preferences))))
+        elif field == "plans":
+            cells.append(_cell("; ".join(day.get("primary_plan", "") for day in package.get("day_plans", []))))
+        else:
+            cells.append(_cell(package.get(field, "")))
+    return "|".join(cells)
+
+
+def serialize_packages(
+    packages: Iterable[Dict[str, Any]],
+    fields: Sequence[str] = RANKING_FIELDS,
+    preferences: Optional[Dict[str, Any]] = None,
+    token_budget: int = PROMPT_TOKEN_BUDGET,
+) -> SerializedPackages:
+    """
+    Renders packages as a compact pipe-separated table with only `fields`.
+
+    Rows keep the input order. When the table exceeds `token_budget`, the
+    lowest-scored packages are dropped first (the best one is always kept).
+    """
+    packages = list(packages)
+    header = "|".join(_HEADERS.get(field, field) for field in fields)
+    rows = [package_row(pkg, fields, preferences) for pkg in packages]
+    row_tokens = [estimate_tokens(row) + 1 for row in rows]
+    tokens = estimate_tokens(header) + sum(row_tokens)
+
+    keep = [True] * len(rows)
+    if tokens > token_budget and len(rows) > 1:
+        # Stable: among equal scores the later package goes first
+        by_score = sorted(range(len(rows)), key=lambda i: (package_score(packages[i], preferences), -i))
+        for i in by_score[:-1]:
+            if tokens <= token_budget:
+                break
+            keep[i] = False
+            tokens -= row_tokens[i]
+
+    text = "\n".join([header] + [row for row, kept in zip(rows, keep) if kept])
+    included = sum(keep)
+    result = SerializedPackages(
+        text=text,
+        included=included,
+        dropped=len(rows) - included,
+        tokens=estimate_tokens(text),
+        baseline_tokens=estimate_tokens(repr(packages)),
+    )
+    logger.info(
+        f"Prompt packages: {result.included} rows ({result.dropped} dropped), "
+        f"~{result.tokens} tokens, ~{result.saved_tokens} saved vs repr()"
+    )
+    return result
+
+
+def merge_candidates(*groups: Optional[Iterable[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Concatenates package lists, keeping the first occurrence of each package_id"""
+    seen = set()
+    merged = []
+    for group in groups:
+        for pkg in group or []:
+            if not isinstance(pkg, dict):
+                continue
+            key = pkg.get("package_id", id(pkg))
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(pkg)
+    return merged
@@ -0,0 +1,132 @@
+import os
+from typing import List, Dict, Any
+
+from utils.activity_index import preference_activities
+from utils.catalog import normalize_text, package_activity_text, resolve_price_key
+from utils.matcher import score_breakdown
+
+# The LLM is only asked to rank when the best two local scores (0-100) are
+# closer than this
+RANKING_LLM_MARGIN = float(os.getenv("RANKING_LLM_MARGIN", "10"))
+
+
+def max_possible_score(preferences: Dict[str, Any]) -> float:
+    """Highest matcher score reachable for the preferences the user has given"""
+    total = 0.0
+    if normalize_text(preferences.get('destination')):
+        total += 100
+    if normalize_text(preferences.get('package_type')):
+        total += 50
+    if preferences.get('budget') is not None:
+        total += 40
+    if preferences.get('duration_days') is not None or preferences.get('duration') is not None:
+        total += 30
+    total += 15 * len(preference_activities(preferences))
+    return total
+
+
+def _price_for(preferences: Dict[str, Any], package: Dict[str, Any]):
+    prices = package.get('price', {})
+    if isinstance(prices, (int, float)):
+        return prices
+    if isinstance(prices, dict):
+        price = prices.get(resolve_price_key(preferences.get('traveler_type')))
+        return price if price is not None else prices.get('solo')
+    return None
+
+
+def explain_breakdown(preferences: Dict[str, Any], package: Dict[str, Any], breakdown: Dict[str, float]) -> str:
+    """Templated reasoning for a package from its matcher breakdown"""
+    reasons = []
+    destination = package.get('destination', 'this destination')
+    package_type = package.get('package_type', 'travel')
+
+    if breakdown['destination'] == 100:
+        reasons.append(f"matches your destination ({destination})")
+    elif breakdown['destination']:
+        reasons.append(f"is in {destination}, the closest match to {preferences.get('destination')}")
+    elif normalize_text(preferences.get('destination')):
+        reasons.append(f"is in {destination} rather than {preferences.get('destination')}")
+
+    if breakdown['package_type'] == 50:
+        reasons.append(f"is a {package_type} package")
+    elif breakdown['package_type']:
+        reasons.append(f"is a related {package_type} package")
+    elif normalize_text(preferences.get('package_type')):
+        reasons.append(f"is a {package_type} package, not {preferences.get('package_type')}")
+
+    if preferences.get('budget') is not None:
+        price = _price_for(preferences, package)
+        budget_text = {
+            40: "fits your budget",
+            20: "is up to 20% over your budget",
+            10: "is up to 50% over your budget",
+        }.get(breakdown['budget'], "is well over your budget")
+        reasons.append(f"{budget_text} (₹{price})" if price is not None else budget_text)
+
+    duration = package.get('duration_days')
+    requested_duration = preferences.get('duration_days')
+    if requested_duration is None:
+        requested_duration = preferences.get('duration')
+    if breakdown['duration'] == 30:
+        reasons.append(f"runs exactly {duration} days")
+    elif requested_duration is not None:
+        reasons.append(f"runs {duration} days (you asked for {requested_duration})")
+
+    requested = preference_activities(preferences)
+    if requested:
+        text = package_activity_text(package)
+        matched = sum(1 for act in requested if act in text)
+        activity_text = f"covers {matched} of your {len(requested)} requested activities"
+        if breakdown['activities'] > 15 * matched:
+            activity_text += " and has plans similar to the others"
+        reasons.append(activity_text)
+
+    if not reasons:
+        return f"A {package_type} package in {destination}."
+    text = ", ".join(reasons) + "."
+    return text[0].upper() + text[1:]
+
+
+def rank_packages_locally(preferences: Dict[str, Any], packages: List[Dict[str, Any]], top_n: int = 3) -> Dict[str, Any]:
+    """
+    Ranks packages from matcher scores, in the same structure the ranking LLM returns:
+    {"ranked_packages": [{package_id, score, reasoning}], "top_recommendations": [{package_id, explanation}]}
+
+    Scores are the matcher score normalized to 0-100 against the best score the
+    preferences allow. Ties keep the input order.
+    """
+    ceiling = max_possible_score(preferences) or 1.0
+    scored = []
+    for pkg in packages:
+        breakdown = score_breakdown(preferences, pkg)
+        score = round(100 * sum(breakdown.values()) / ceiling)
+        scored.append((score, pkg, breakdown))
+    scored.sort(key=lambda x: x[0], reverse=True)
+
+    ranked_packages = [
+        {
+            "package_id": pkg.get("package_id"),
+            "score": score,
+            "reasoning": explain_breakdown(preferences, pkg, breakdown),
+        }
+        for score, pkg, breakdown in scored
+    ]
+    top_recommendations = [
+        {
+            "package_id": ranked["package_id"],
+            "explanation": f"Scores {ranked['score']}/100 against your preferences: {ranked['reasoning']}",
+        }
+        for ranked in ranked_packages[:top_n]
+    ]
+    return {"ranked_packages": ranked_packages, "top_recommendations": top_recommendations}
+
+
+def is_decisive(ranking: Dict[str, Any], margin: float = RANKING_LLM_MARGIN) -> bool:
+    """True when the local top pick leads the runner-up by at least `margin` points"""
+    ranked = ranking.get("ranked_packages", [])
+    if not ranked:
+        return False
+    if len(ranked) == 1:
+        return True
+    return ranked[0]["score"] - ranked[1]["score"] >= margin
@@ -0,0 +1,287 @@
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Callable, Iterable, Optional, Sequence, Union
+
+import numpy as np
+
+from models import Package
+from utils.catalog import PackageCatalog, normalize_text, resolve_price_key
+from utils.activity_index import ActivityIndex, preference_activities
+from utils.activity_vectors import ActivityMatrix, activity_points
+from utils.fuzzy_match import FuzzyIndex, lookup_destination, lookup_package_type, points
+
+# Activities whose per-package points are kept (one float per package each;
+# least recently used dropped first)
+ACTIVITY_POINTS_CACHE_SIZE = 128
+
+
+class ScoringEngine:
+    """
+    Columnar, vectorized version of `utils.matcher.calculate_similarity_score`.
+
+    The catalog is held as NumPy columns (destination/type codes, one price
+    column per price key, durations) so one preference set, or a batch of them,
+    is scored against every package in a handful of array operations. Point
+    totals are identical to the per-package matcher:
+    - Destination: 100, scaled by trigram similarity for close spellings
+    - Package type: 50 exact / 25 partial, or scaled by trigram similarity
+    - Budget: 40 within / 20 within +20% / 10 within +50%
+    - Duration: 30 exact / 15 off by one / 5 off by two
+    - Activity: 15 per matching activity, scaled by similarity for related plans
+
+    Columns can also come from elsewhere (e.g. a memory-mapped compiled
+    catalog) through `from_columns`; packages are then only materialized for
+    the final top-k.
+    """
+
+    def __init__(self, packages: Union[PackageCatalog, Iterable[Dict[str, Any]]]):
+        # Columns are built from typed records (normalized once, see models.Package).
+        # A catalog already has them, and its view builds each dict on access.
+        if isinstance(packages, PackageCatalog):
+            self.packages = packages.packages
+            records = packages.records
+        else:
+            self.packages = list(packages)
+            records = [Package.from_dict(pkg) for pkg in self.packages]
+        n = len(records)
+        self._size = n
+        self._materialize: Optional[Callable[[int], Dict[str, Any]]] = None
+
+        # 1. Destination and package type as codes into small string tables
+        self.destinations, self.destination_codes = self._encode(record.destination_key for record in records)
+        self.package_types, self.package_type_codes = self._encode(record.type_key for record in records)
+        self._destination_index: Optional[FuzzyIndex] = None
+        self._type_index: Optional[FuzzyIndex] = None
+
+        # 2. One price column per price key. `price_present` tells a missing key
+        # (falls back to the solo fare) apart from an unusable value (NaN, no points).
+        keys = {'solo'}
+        for record in records:
+            if record.price.flat is None:
+                keys.update(key for key, _ in record.price.items())
+        self.price_keys = sorted(keys)
+        self._price_column = {key: i for i, key in enumerate(self.price_keys)}
+        self.prices = np.full((n, len(self.price_keys)), np.nan)
+        self.price_present = np.zeros((n, len(self.price_keys)), dtype=bool)
+        for row, record in enumerate(records):
+            if record.price.flat is not None:
+                self.prices[row, :] = record.price.flat
+                self.price_present[row, :] = True
+                continue
+            for key, value in record.price.items():
+                col = self._price_column[key]
+                self.price_present[row, col] = True
+                self.prices[row, col] = value
+
+        # 3. Durations, with a mask for packages that have none
+        self.durations = np.zeros(n, dtype=np.int64)
+        self.duration_valid = np.zeros(n, dtype=bool)
+        for row, record in enumerate(records):
+            if record.duration_days is not None:
+                try:
+                    self.durations[row] = record.duration_days
+                    self.duration_valid[row] = True
+                except OverflowError:
+                    pass
+
+        # 4. Activity phrase index and semantic matrix (on first use), with a per-activity points cache
+        if isinstance(packages, PackageCatalog):
+            self.activity_index = packages.activity_index
+            self._matrix_source: Callable[[], ActivityMatrix] = lambda: packages.activity_matrix
+        else:
+            self.activity_index = ActivityIndex(record.activity_text() for record in records)
+            self._matrix_source = lambda: ActivityMatrix.from_records(records)
+        self._activity_matrix: Optional[ActivityMatrix] = None
+        self._activity_points: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        # Engines are shared across threads; guards the LRU bookkeeping
+        self._activity_lock = threading.Lock()
+
+    @classmethod
+    def from_columns(
+        cls,
+        destinations: Sequence[str],
+        destination_codes: np.ndarray,
+        package_types: Sequence[str],
+        package_type_codes: np.ndarray,
+        price_keys: Sequence[str],
+        prices: np.ndarray,
+        price_present: np.ndarray,
+        durations: np.ndarray,
+        duration_valid: np.ndarray,
+        activity_index: Any,
+        activity_matrix: Callable[[], ActivityMatrix],
+        materialize: Callable[[int], Dict[str, Any]],
+    ) -> "ScoringEngine":
+        """
+        Builds an engine over existing columns without copying them.
+
+        `destinations` / `package_types` are normalized tables indexed by the
+        code arrays, `price_keys` must include 'solo', `activity_index` needs a
+        `lookup(phrase)` returning package rows, `activity_matrix()` returns the
+        semantic matrix (called on first use), and `materialize(row)` returns
+        a fresh package dict.
+        """
+        engine = cls.__new__(cls)
+        engine.packages = None
+        engine._size = len(destination_codes)
+        engine._materialize = materialize
+        engine.destinations = list(destinations)
+        engine.destination_codes = destination_codes
+        engine.package_types = list(package_types)
+        engine.package_type_codes = package_type_codes
+        engine._destination_index = None
+        engine._type_index = None
+        engine.price_keys = list(price_keys)
+        engine._price_column = {key: i for i, key in enumerate(engine.price_keys)}
+        engine.prices = prices
+        engine.price_present = price_present
+        engine.durations = durations
+        engine.duration_valid = duration_valid
+        engine.activity_index = activity_index
+        engine._matrix_source = activity_matrix
+        engine._activity_matrix = None
+        engine._activity_points = OrderedDict()
+        engine._activity_lock = threading.Lock()
+        return engine
+
+    @staticmethod
+    def _encode(values: Iterable[str]):
+        table: Dict[str, int] = {}
+        codes = [table.setdefault(value, len(table)) for value in values]
+        return list(table), np.asarray(codes, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return self._size
+
+    # Per-feature lookups
+
+    @property
+    def destination_index(self) -> FuzzyIndex:
+        """Trigram index over the destination table, built on first use"""
+        if self._destination_index is None:
+            self._destination_index = FuzzyIndex(self.destinations)
+        return self._destination_index
+
+    @property
+    def type_index(self) -> FuzzyIndex:
+        if self._type_index is None:
+            self._type_index = FuzzyIndex(self.package_types)
+        return self._type_index
+
+    def _destination_points(self, preferences: Dict[str, Any]) -> np.ndarray:
+        pref_dest = normalize_text(preferences.get('destination'))
+        if not pref_dest:
+            return np.zeros(len(self.destinations))
+        scores = lookup_destination(pref_dest, self.destination_index)
+        return np.array([points(100, scores.get(dest, 0.0)) for dest in self.destinations])
+
+    def _type_points(self, preferences: Dict[str, Any]) -> np.ndarray:
+        pref_type = normalize_text(preferences.get('package_type'))
+        if not pref_type:
+            return np.zeros(len(self.package_types))
+        scores = lookup_package_type(pref_type, self.type_index)
+        return np.array([points(50, scores.get(pkg_type, 0.0)) for pkg_type in self.package_types])
+
+    def _resolved_prices(self, price_key: str) -> np.ndarray:
+        """Package prices for a price key, falling back to the solo fare"""
+        solo = self.prices[:, self._price_column['solo']]
+        col = self._price_column.get(price_key)
+        if col is None:
+            return solo
+        return np.where(self.price_present[:, col], self.prices[:, col], solo)
+
+    @property
+    def activity_matrix(self) -> ActivityMatrix:
+        if self._activity_matrix is None:
+            self._activity_matrix = self._matrix_source()
+        return self._activity_matrix
+
+    def _activity_vector(self, activity: str) -> np.ndarray:
+        with self._activity_lock:
+            vector = self._activity_points.get(activity)
+            if vector is not None:
+                self._activity_points.move_to_end(activity)
+                return vector
+
+        vector = activity_points([activity], self.activity_index, self.activity_matrix, len(self))
+        with self._activity_lock:
+            self._activity_points[activity] = vector
+            if len(self._activity_points) > ACTIVITY_POINTS_CACHE_SIZE:
+                self._activity_points.popitem(last=False)
+        return vector
+
+    @staticmethod
+    def _budget(preferences: Dict[str, Any]) -> float:
+        try:
+            return float(preferences.get('budget'))
+        except (ValueError, TypeError):
+            return np.nan
+
+    @staticmethod
+    def _duration(preferences: Dict[str, Any]) -> Optional[int]:
+        duration = preferences.get('duration_days')
+        if duration is None:
+            duration = preferences.get('duration')
+        try:
+            return int(duration)
+        except (ValueError, TypeError, OverflowError):
+            return None
+
+    # Scoring
+
+    def score(self, preferences: Dict[str, Any]) -> np.ndarray:
+        """Scores one preference set against the whole catalog, shape (n_packages,)"""
+        return self.score_batch([preferences])[0]
+
+    def score_batch(self, preferences_list: List[Dict[str, Any]]) -> np.ndarray:
+        """Scores a batch of preference sets against the whole catalog, shape (n_prefs, n_packages)"""
+        m = len(preferences_list)
+        if m == 0 or len(self) == 0:
+            return np.zeros((m, len(self)))
+
+        # 1 & 2. Destination and type: small (m, n_codes) tables gathered by code
+        dest_table = np.stack([self._destination_points(p) for p in preferences_list])
+        type_table = np.stack([self._type_points(p) for p in preferences_list])
+        scores = dest_table[:, self.destination_codes] + type_table[:, self.package_type_codes]
+
+        # 3. Budget: broadcast each budget against its resolved price row
+        budgets = np.array([self._budget(p) for p in preferences_list])[:, None]
+        prices = np.stack([
+            self._resolved_prices(resolve_price_key(p.get('traveler_type'))) for p in preferences_list
+        ])
+        has_budget = np.array([p.get('budget') is not None for p in preferences_list])[:, None]
+        budget_points = np.select(
+            [prices <= budgets, prices <= budgets * 1.2, prices <= budgets * 1.5],
+            [40.0, 20.0, 10.0],
+            default=0.0,
+        )
+        scores += np.where(has_budget, budget_points, 0.0)
+
+        # 4. Duration: absolute difference against the duration column
+        durations = [self._duration(p) for p in preferences_list]
+        has_duration = np.array([d is not None for d in durations])[:, None] & self.duration_valid[None, :]
+        diff = np.abs(np.array([d or 0 for d in durations], dtype=np.int64)[:, None] - self.durations[None, :])
+        duration_points = np.select([diff == 0, diff == 1, diff == 2], [30.0, 15.0, 5.0], default=0.0)
+        scores += np.where(has_duration, duration_points, 0.0)
+
+        # 5. Activities: cached per-activity points from the phrase index and the matrix
+        for row, p in enumerate(preferences_list):
+            for act in preference_activities(p):
+                scores[row] += self._activity_vector(act)
+
+        return scores
+
+    def top_k(self, preferences: Dict[str, Any], limit: int = 5) -> List[Dict[str, Any]]:
+        """Same result as `get_most_similar_packages`, from one vectorized pass"""
+        scores = self.score(preferences)
+        order = np.argsort(-scores, kind='stable')[:limit]
+        results = []
+        for row in order:
+            if scores[row] > 0:
+                if self._materialize is not None:
+                    pkg_copy = self._materialize(int(row))
+                else:
+                    pkg_copy = self.packages[row].copy()
+                pkg_copy['match_score'] = float(scores[row])
+                results.append(pkg_copy)
+        return results
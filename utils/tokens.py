@@ -0,0 +1,3 @@
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English/JSON text)"""
+    return (len(text) + 3) // 4
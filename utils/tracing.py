@@ -0,0 +1,402 @@
+"""
+Lightweight tracing for agents, LLM calls, matcher queries and JSON parsing.
+
+A span records a name, a kind ("workflow", "agent", "llm", "matcher",
+"parse"), wall time, an error if one escaped, and a few attributes such as
+token counts or the response cache result. Finished spans are handed to the
+configured exporters:
+- ring: the last TRACE_RING_SIZE spans, kept in memory (the default)
+- jsonl: one JSON line per span, appended to TRACE_JSONL_PATH
+- prometheus: counters and latency histograms, rendered in the Prometheus text
+  format and served on TRACE_PROMETHEUS_PORT when that is set
+
+TRACE_EXPORTERS picks them (comma-separated, e.g. "ring,jsonl"); "none" turns
+tracing off. Parent links follow contextvars, so they carry over into asyncio
+tasks and asyncio.to_thread; work shipped to another process is traced (and
+exported) by that process.
+"""
+import atexit
+import functools
+import inspect
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+TRACE_EXPORTERS = os.getenv("TRACE_EXPORTERS", "ring")
+TRACE_RING_SIZE = int(os.getenv("TRACE_RING_SIZE", "2048"))
+TRACE_JSONL_PATH = os.getenv("TRACE_JSONL_PATH", "traces.jsonl")
+TRACE_PROMETHEUS_PORT = int(os.getenv("TRACE_PROMETHEUS_PORT", "0"))
+
+_current: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+_ids = itertools.count(1)
+
+
+class Span:
+    """One timed operation; attributes are free-form JSON-serializable values"""
+
+    __slots__ = ("name", "kind", "trace_id", "span_id", "parent_id", "start", "duration_ms", "attrs", "error",
+                 "_started", "_token")
+
+    def __init__(self, name: str, kind: str, parent: Optional["Span"], attrs: Dict[str, Any]):
+        self.name = name
+        self.kind = kind
+        self.span_id = f"{os.getpid():x}-{next(_ids):x}"
+        self.parent_id = parent.span_id if parent is not None else None
+        self.trace_id = parent.trace_id if parent is not None else self.span_id
+        self.start = time.time()
+        self.duration_ms: Optional[float] = None
+        self.attrs = attrs
+        self.error: Optional[str] = None
+        self._started = time.perf_counter()
+        self._token = None
+
+    def set(self, key: str, value: Any) -> None:
+        self.attrs[key] = value
+
+    def add(self, key: str, amount: float = 1) -> None:
+        self.attrs[key] = self.attrs.get(key, 0) + amount
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration_ms": self.duration_ms,
+            "error": self.error,
+            "attrs": self.attrs,
+        }
+
+
+class _NoopSpan:
+    """Stands in for a span when tracing is off"""
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def add(self, key: str, amount: float = 1) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class _SpanContext:
+    """`with` support for Tracer.span (cheaper than a generator-based context manager)"""
+
+    __slots__ = ("_tracer", "_args", "_attrs", "_span")
+
+    def __init__(self, tracer: "Tracer", name: str, kind: str, attrs: Dict[str, Any]):
+        self._tracer = tracer
+        self._args = (name, kind)
+        self._attrs = attrs
+        self._span: Optional[Span] = None
+
+    def __enter__(self) -> Span:
+        self._span = self._tracer.start(*self._args, **self._attrs)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._tracer.finish(self._span, exc)
+
+
+# Exporters
+
+class RingBufferExporter:
+    """Keeps the most recent `capacity` spans in memory"""
+
+    def __init__(self, capacity: int = TRACE_RING_SIZE):
+        self._spans: deque = deque(maxlen=capacity)
+
+    def export(self, span: Span) -> None:
+        self._spans.append(span)
+
+    def spans(self, name: Optional[str] = None, kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Recorded spans, oldest first, optionally filtered by name / kind"""
+        return [s.to_dict() for s in list(self._spans)
+                if (name is None or s.name == name) and (kind is None or s.kind == kind)]
+
+    def clear(self) -> None:
+        self._spans.clear()
+
+
+class JSONLExporter:
+    """
+    Appends spans to a JSONL file. Lines are buffered and written in batches
+    (every `flush_every` spans or `flush_interval` seconds, and at exit) with a
+    single append-mode write, so several processes can share one file.
+    """
+
+    def __init__(self, path: str = TRACE_JSONL_PATH, flush_every: int = 64, flush_interval: float = 1.0):
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._lines: List[str] = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._lines.append(line)
+            due = len(self._lines) >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            lines, self._lines = self._lines, []
+            self._last_flush = time.monotonic()
+        if not lines:
+            return
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, ("\n".join(lines) + "\n").encode("utf-8"))
+        finally:
+            os.close(fd)
+
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _labels(**labels: str) -> str:
+    body = ",".join(f'{key}="{str(value)}"'.replace("\n", " ") for key, value in labels.items())
+    return "{" + body + "}"
+
+
+class PrometheusExporter:
+    """
+    Aggregates spans into Prometheus metrics:
+    - travel_span_duration_seconds (histogram, by name and kind)
+    - travel_span_errors_total (by name and kind; json.extract errors are parse failures)
+    - travel_llm_tokens_total (by span name and prompt/completion)
+    - travel_llm_cache_total (by span name and cache result)
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._durations: Dict[Tuple[str, str], List[float]] = {}
+        self._errors: Dict[Tuple[str, str], int] = {}
+        self._tokens: Dict[Tuple[str, str], float] = {}
+        self._cache: Dict[Tuple[str, str], int] = {}
+        self._server = None
+
+    def export(self, span: Span) -> None:
+        seconds = (span.duration_ms or 0.0) / 1000
+        key = (span.name, span.kind)
+        with self._lock:
+            # Per-bucket counts, then sum and count
+            hist = self._durations.get(key)
+            if hist is None:
+                hist = self._durations[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    hist[i] += 1
+            hist[-2] += seconds
+            hist[-1] += 1
+            if span.error:
+                self._errors[key] = self._errors.get(key, 0) + 1
+            for kind in ("prompt", "completion"):
+                tokens = span.attrs.get(f"{kind}_tokens")
+                if tokens:
+                    self._tokens[(span.name, kind)] = self._tokens.get((span.name, kind), 0) + tokens
+            cache = span.attrs.get("cache")
+            if cache:
+                self._cache[(span.name, cache)] = self._cache.get((span.name, cache), 0) + 1
+
+    def render(self) -> str:
+        """Metrics in the Prometheus text exposition format"""
+        lines = ["# HELP travel_span_duration_seconds Span wall time",
+                 "# TYPE travel_span_duration_seconds histogram"]
+        with self._lock:
+            for (name, kind), hist in sorted(self._durations.items()):
+                for bound, count in zip(self.buckets, hist):
+                    lines.append(f"travel_span_duration_seconds_bucket{_labels(name=name, kind=kind, le=bound)} {count:g}")
+                lines.append(f"travel_span_duration_seconds_bucket{_labels(name=name, kind=kind, le='+Inf')} {hist[-1]:g}")
+                lines.append(f"travel_span_duration_seconds_sum{_labels(name=name, kind=kind)} {hist[-2]:.6f}")
+                lines.append(f"travel_span_duration_seconds_count{_labels(name=name, kind=kind)} {hist[-1]:g}")
+            lines += ["# HELP travel_span_errors_total Spans that ended with an error",
+                      "# TYPE travel_span_errors_total counter"]
+            for (name, kind), count in sorted(self._errors.items()):
+                lines.append(f"travel_span_errors_total{_labels(name=name, kind=kind)} {count}")
+            lines += ["# HELP travel_llm_tokens_total Prompt and completion tokens",
+                      "# TYPE travel_llm_tokens_total counter"]
+            for (name, kind), tokens in sorted(self._tokens.items()):
+                lines.append(f"travel_llm_tokens_total{_labels(name=name, type=kind)} {tokens:g}")
+            lines += ["# HELP travel_llm_cache_total LLM response cache lookups by result",
+                      "# TYPE travel_llm_cache_total counter"]
+            for (name, result), count in sorted(self._cache.items()):
+                lines.append(f"travel_llm_cache_total{_labels(name=name, result=result)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "") -> None:
+        """Serves render() at http://host:port/metrics from a daemon thread"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((host, port), Handler)
+        except OSError as e:
+            # e.g. a second worker process asking for the same port
+            logger.warning(f"Metrics endpoint not started on port {port}: {e}")
+            return
+        threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True).start()
+
+
+# Tracer
+
+class Tracer:
+    """Creates spans and hands finished ones to its exporters"""
+
+    def __init__(self, exporters: Sequence[Any] = ()):
+        self.exporters = list(exporters)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.exporters)
+
+    def exporter(self, exporter_type: type) -> Optional[Any]:
+        """The first exporter of `exporter_type`, if configured"""
+        return next((e for e in self.exporters if isinstance(e, exporter_type)), None)
+
+    def start(self, name: str, kind: str = "internal", activate: bool = True, **attrs: Any) -> Span:
+        """
+        Starts a span under the current one. With `activate`, it becomes the
+        current span until finish(); generators should pass activate=False.
+        """
+        span = Span(name, kind, _current.get(), attrs)
+        if activate:
+            span._token = _current.set(span)
+        return span
+
+    def finish(self, span: Span, error: Optional[BaseException] = None) -> None:
+        span.duration_ms = round((time.perf_counter() - span._started) * 1000, 3)
+        if error is not None:
+            span.error = f"{type(error).__name__}: {error}"
+        if span._token is not None:
+            try:
+                _current.reset(span._token)
+            except ValueError:
+                # Finished from another context (e.g. an abandoned generator)
+                pass
+            span._token = None
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception as e:
+                logger.warning(f"Span export to {type(exporter).__name__} failed: {e}")
+
+    def span(self, name: str, kind: str = "internal", **attrs: Any) -> Any:
+        """Context manager: a span that is current inside the `with` block"""
+        if not self.exporters:
+            return _NOOP
+        return _SpanContext(self, name, kind, attrs)
+
+
+def _exporters_from_env() -> List[Any]:
+    exporters: List[Any] = []
+    for name in (part.strip().lower() for part in TRACE_EXPORTERS.split(",")):
+        if name == "ring":
+            exporters.append(RingBufferExporter(TRACE_RING_SIZE))
+        elif name == "jsonl":
+            exporters.append(JSONLExporter(TRACE_JSONL_PATH))
+        elif name == "prometheus":
+            exporter = PrometheusExporter()
+            if TRACE_PROMETHEUS_PORT:
+                exporter.serve(TRACE_PROMETHEUS_PORT)
+            exporters.append(exporter)
+        elif name and name != "none":
+            logger.warning(f"Unknown trace exporter '{name}' in TRACE_EXPORTERS")
+    return exporters
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Returns the process-wide tracer, configured from TRACE_* on first use"""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = Tracer(_exporters_from_env())
+    return _tracer
+
+
+def set_exporters(exporters: Sequence[Any]) -> Tracer:
+    """Replaces the process-wide tracer's exporters (an empty list turns tracing off)"""
+    global _tracer
+    with _tracer_lock:
+        _tracer = Tracer(exporters)
+    return _tracer
+
+
+def span(name: str, kind: str = "internal", **attrs: Any):
+    """Context manager recording a span on the process-wide tracer"""
+    return get_tracer().span(name, kind, **attrs)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def annotate(**attrs: Any) -> None:
+    """Sets attributes on the current span, if there is one"""
+    current = _current.get()
+    if current is not None:
+        current.attrs.update(attrs)
+
+
+def traced(name: str, kind: str = "agent") -> Callable[[Callable], Callable]:
+    """Decorator recording a span around each call of a function or coroutine function"""
+
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name, kind):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, kind):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator